@@ -0,0 +1,346 @@
+import multiprocessing as mp
+import queue
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.buffers import DictReplayBuffer
+from stable_baselines3.common.logger import configure
+
+
+def build_without_env(model_fn: Callable, observation_space, action_space):
+    """
+    Builds the model of model_fn in a process that never steps an env, from the spaces alone.
+    """
+    model = model_fn(None, _init_setup_model=False)
+    model.observation_space = observation_space
+    model.action_space = action_space
+    model.n_envs = 1
+    model._setup_model()
+    return model
+
+
+def samples_to(samples, device):
+    """
+    Moves every tensor of a replay buffer sample, observation dicts included, to device.
+    """
+    return type(samples)(*(
+        {key: value.to(device) for key, value in field.items()} if isinstance(field, dict) else field.to(device)
+        for field in samples
+    ))
+
+
+class SharedWeights:
+    """
+    Actor network weights in a flat shared memory array with a version counter.
+
+    The learner publishes a new state dict by copying it into the array and bumping the version. Actors
+    compare the version with the one they last loaded and only copy the weights out when it changed.
+    """
+
+    def __init__(self, template: Dict[str, th.Tensor]):
+        self.layout = [(name, tuple(tensor.shape)) for name, tensor in template.items()]
+        self.size = sum(int(np.prod(shape)) for _, shape in self.layout)
+        self.buffer = mp.RawArray("f", self.size)
+        self.version = mp.Value("i", 0)
+
+    def publish(self, state_dict: Dict[str, th.Tensor]):
+        flat = np.frombuffer(self.buffer, dtype=np.float32)
+        with self.version.get_lock():
+            offset = 0
+            for name, shape in self.layout:
+                size = int(np.prod(shape))
+                flat[offset:offset + size] = state_dict[name].detach().cpu().numpy().ravel()
+                offset += size
+            self.version.value += 1
+
+    def read(self):
+        """
+        Returns:
+            tuple(int, dict[str, th.Tensor]): The current version and a copy of the weights.
+        """
+        with self.version.get_lock():
+            flat = np.frombuffer(self.buffer, dtype=np.float32).copy()
+            version = self.version.value
+
+        state_dict = {}
+        offset = 0
+        for name, shape in self.layout:
+            size = int(np.prod(shape))
+            state_dict[name] = th.as_tensor(flat[offset:offset + size].reshape(shape))
+            offset += size
+        return version, state_dict
+
+
+class LearnerStopped(Exception):
+    pass
+
+
+class RemoteReplayBuffer:
+    """
+    Stands in for model.replay_buffer inside the learner. Batches are sampled by the replay process.
+
+    One request is always kept in flight, so the replay process samples the next batch while the learner is
+    busy with the gradient step on the current one. The replay process samples on the cpu, batches are moved to
+    the learner model's device when they arrive.
+    """
+
+    def __init__(self, connection, replay_size, stop_event, device="cpu"):
+        self.connection = connection
+        self.replay_size = replay_size
+        self.stop_event = stop_event
+        self.device = device
+        self.requested = None
+
+    def size(self):
+        return self.replay_size.value
+
+    def sample(self, batch_size: int, env=None):
+        if self.requested != batch_size:
+            self.connection.send(batch_size)
+        while not self.connection.poll(0.1):
+            if self.stop_event.is_set():
+                raise LearnerStopped()
+        samples = self.connection.recv()
+        self.connection.send(batch_size)
+        self.requested = batch_size
+        return samples_to(samples, self.device)
+
+
+def run_replay(observation_space, action_space, buffer_size, transitions, connection, replay_size, stop_event):
+    """
+    Replay process. Adds transitions pushed by the actors and answers sample requests of the learner.
+    """
+    buffer = DictReplayBuffer(buffer_size, observation_space, action_space, device="cpu", n_envs=1)
+    while not stop_event.is_set():
+        # drain a bounded number of transitions so sample requests are never starved
+        for _ in range(64):
+            try:
+                batch = transitions.get_nowait()
+            except queue.Empty:
+                break
+            for obs, action, reward, next_obs, done in batch:
+                buffer.add(
+                    {key: value[np.newaxis] for key, value in obs.items()},
+                    {key: value[np.newaxis] for key, value in next_obs.items()},
+                    action[np.newaxis],
+                    np.array([reward]),
+                    np.array([done]),
+                    [{}],
+                )
+            replay_size.value = buffer.size()
+
+        if connection.poll(0.001):
+            batch_size = connection.recv()
+            connection.send(buffer.sample(batch_size))
+
+
+def run_actor(
+    actor_id: int,
+    env_fn: Callable,
+    model_fn: Callable,
+    weights: SharedWeights,
+    transitions,
+    env_steps,
+    stop_event,
+    learning_starts: int = 100,
+    send_every: int = 16,
+):
+    """
+    Actor process. Steps its own env with the latest published actor weights and pushes the transitions.
+    """
+    env = env_fn(actor_id)
+    model = model_fn(env)
+    loaded_version = -1
+    pending = []
+
+    obs = env.reset()
+    while not stop_event.is_set():
+        if weights.version.value != loaded_version:
+            loaded_version, state_dict = weights.read()
+            model.policy.actor.load_state_dict(state_dict)
+
+        # act randomly until the learner has had something to learn from
+        if env_steps.value < learning_starts:
+            action = env.action_space.sample()
+        else:
+            action, _ = model.predict(obs, deterministic=False)
+        next_obs, reward, done, info = env.step(action)
+
+        # the replay buffer stores actions scaled to [-1, 1] like SB3 does
+        pending.append((obs, model.policy.scale_action(np.asarray(action)), reward, next_obs, done))
+        obs = env.reset() if done else next_obs
+        with env_steps.get_lock():
+            env_steps.value += 1
+
+        if len(pending) >= send_every:
+            transitions.put(pending)
+            pending = []
+
+
+def run_learner(
+    model_fn: Callable,
+    observation_space,
+    action_space,
+    weights: SharedWeights,
+    connection,
+    replay_size,
+    gradient_steps,
+    stop_event,
+    learning_starts: int = 100,
+    publish_every: int = 50,
+    save_every: int = 5000,
+    save_path: str = None,
+):
+    """
+    Learner process. Trains continuously on batches from the replay process and publishes the actor weights
+    every publish_every gradient steps.
+    """
+    model = build_without_env(model_fn, observation_space, action_space)
+    model.set_logger(configure(None, ["stdout"]))
+    model.replay_buffer = RemoteReplayBuffer(connection, replay_size, stop_event, device=model.device)
+    weights.publish(model.policy.actor.state_dict())
+
+    while not stop_event.is_set():
+        if replay_size.value < max(learning_starts, model.batch_size):
+            time.sleep(0.1)
+            continue
+
+        try:
+            model.train(gradient_steps=publish_every, batch_size=model.batch_size)
+        except LearnerStopped:
+            break
+        weights.publish(model.policy.actor.state_dict())
+        with gradient_steps.get_lock():
+            gradient_steps.value += publish_every
+
+        if save_path is not None and gradient_steps.value % save_every < publish_every:
+            model.save(save_path)
+
+    if save_path is not None:
+        model.save(save_path)
+
+
+class ActorLearner:
+    """
+    Splits experience collection and optimization over processes so both run at the same time.
+
+    Every actor process drives its own env, for example a SingleAgentEnv bound to its own Minecraft client, and
+    pushes transitions to a single replay process. A learner process trains on batches sampled by the replay
+    process and publishes new actor weights through shared memory on a fixed cadence of gradient steps.
+    """
+
+    def __init__(
+        self,
+        env_fns: List[Callable],
+        model_fn: Callable,
+        observation_space,
+        action_space,
+        buffer_size: int = 100_000,
+        learning_starts: int = 100,
+        publish_every: int = 50,
+        save_path: str = None,
+    ):
+        """
+        Arguments:
+            env_fns (list[callable]):
+                One function per actor that takes the actor index and returns its env.
+            model_fn (callable):
+                Takes an env and keyword arguments for the model and returns an SB3 off-policy model, for example
+                lambda env, **kwargs: SAC("MultiInputPolicy", env, buffer_size=1, **kwargs). The learner passes
+                env=None with _init_setup_model=False and sets the spaces up itself, see build_without_env. Must
+                be a module level function when processes are spawned instead of forked.
+            observation_space (gym.spaces.Dict):
+                Observation space shared by every actor's env.
+            action_space (gym.spaces.Box):
+                Action space shared by every actor's env.
+            buffer_size (int):
+                Size of the central replay buffer.
+            learning_starts (int):
+                Number of collected steps before the learner starts training and actors stop acting randomly.
+            publish_every (int):
+                Number of gradient steps between weight broadcasts.
+            save_path (str):
+                Where the learner saves the model. None disables saving.
+        """
+        self.env_fns = env_fns
+        self.model_fn = model_fn
+        self.observation_space = observation_space
+        self.action_space = action_space
+        self.buffer_size = buffer_size
+        self.learning_starts = learning_starts
+        self.publish_every = publish_every
+        self.save_path = save_path
+
+        ### Shared State ###
+        template = build_without_env(model_fn, observation_space, action_space).policy.actor.state_dict()
+        self.weights = SharedWeights(template)
+        self.transitions = mp.Queue(maxsize=1024)
+        self.replay_size = mp.Value("i", 0)
+        self.env_steps = mp.Value("i", 0)
+        self.gradient_steps = mp.Value("i", 0)
+        self.stop_event = mp.Event()
+        self.processes = []
+
+    def start(self):
+        learner_connection, replay_connection = mp.Pipe()
+        self.processes.append(mp.Process(
+            target=run_replay,
+            args=(self.observation_space, self.action_space, self.buffer_size, self.transitions,
+                  replay_connection, self.replay_size, self.stop_event),
+            name="replay",
+        ))
+        self.processes.append(mp.Process(
+            target=run_learner,
+            args=(self.model_fn, self.observation_space, self.action_space, self.weights, learner_connection,
+                  self.replay_size, self.gradient_steps, self.stop_event),
+            kwargs={"learning_starts": self.learning_starts, "publish_every": self.publish_every, "save_path": self.save_path},
+            name="learner",
+        ))
+        for actor_id, env_fn in enumerate(self.env_fns):
+            self.processes.append(mp.Process(
+                target=run_actor,
+                args=(actor_id, env_fn, self.model_fn, self.weights, self.transitions, self.env_steps, self.stop_event),
+                kwargs={"learning_starts": self.learning_starts},
+                name=f"actor_{actor_id}",
+            ))
+        for process in self.processes:
+            process.start()
+        return self
+
+    def stats(self):
+        return {
+            "env_steps": self.env_steps.value,
+            "gradient_steps": self.gradient_steps.value,
+            "replay_size": self.replay_size.value,
+            "weight_version": self.weights.version.value,
+        }
+
+    def run(self, total_env_steps: int, report_every: float = 30.0):
+        """
+        Starts every process and blocks until the actors collected total_env_steps steps.
+        """
+        self.start()
+        last_report = time.time()
+        while self.env_steps.value < total_env_steps:
+            time.sleep(0.5)
+            if time.time() - last_report >= report_every:
+                print(self.stats())
+                last_report = time.time()
+        self.stop()
+
+    def stop(self, timeout: float = 30.0):
+        self.stop_event.set()
+        # actors can be blocked on a full transition queue, empty it so they see the stop event
+        deadline = time.time() + timeout
+        for process in self.processes:
+            while process.is_alive() and time.time() < deadline:
+                try:
+                    self.transitions.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+                process.join(0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
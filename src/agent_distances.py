@@ -0,0 +1,142 @@
+import numpy as np
+
+
+def distance_matrix(from_pos, to_pos):
+    """
+    Euclidean distances between every pair of points on the x-z plane.
+
+    Arguments:
+        from_pos (np.ndarray):
+            (x, z) positions of shape (S, 2).
+        to_pos (np.ndarray):
+            (x, z) positions of shape (H, 2).
+
+    Returns:
+        np.ndarray: Distances of shape (S, H).
+    """
+    offsets = np.asarray(to_pos, dtype=np.float64)[np.newaxis] - np.asarray(from_pos, dtype=np.float64)[:, np.newaxis]
+    return np.hypot(offsets[..., 0], offsets[..., 1])
+
+
+def k_nearest(distances, k: int):
+    """
+    Finds the k closest columns of every row of a distance matrix.
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): Column indices and distances of shape (S, min(k, H)), closest first.
+    """
+    k = min(k, distances.shape[1])
+    if k < distances.shape[1]:
+        index = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        index = np.broadcast_to(np.arange(k), (distances.shape[0], k))
+    nearest = np.take_along_axis(distances, index, axis=1)
+    order = np.argsort(nearest, axis=1)
+    return np.take_along_axis(index, order, axis=1), np.take_along_axis(nearest, order, axis=1)
+
+
+class HiderDistanceTable:
+    """
+    Seeker x hider distance matrix shared by every seeker of a mission.
+
+    The first seeker to ask for distances on a tick builds the whole matrix from its ObservationFromNearbyEntities
+    list, which already contains the positions of every agent. Every other seeker asking on the same tick reads
+    its row from the cached matrix. Distances are euclidean until the table is given the DistanceField of its
+    arena, then they are walking distances around walls and blocks.
+    """
+
+    def __init__(self, seeker_prefix: str = "seeker", hider_prefix: str = "hider", names=None):
+        """
+        Arguments:
+            names (iterable[str]):
+                Only agents with these names are part of the table, for example the agents of one arena when
+                several arenas share a world. Defaults to every agent matching the prefixes.
+        """
+        self.seeker_prefix = seeker_prefix
+        self.hider_prefix = hider_prefix
+        self.names = set(names) if names is not None else None
+        self.distance_field = None
+        self.origin = (0, 0)
+
+        ### Table State ###
+        self.tick = None
+        self.seekers = {}
+        self.hiders = []
+        self.hider_pos = {}
+        self.distances = np.zeros((0, 0))
+
+    def set_arena(self, distance_field, origin=(0, 0)):
+        """
+        Switches to walking distances on the arena of the current mission.
+
+        Arguments:
+            distance_field (DistanceField):
+                Field of the arena, None goes back to euclidean distances.
+            origin (tuple(int, int)):
+                World (x, z) of the arena's corner, for arenas tiled away from the origin.
+        """
+        self.distance_field = distance_field
+        self.origin = origin
+        self.tick = None
+
+    def pair_distances(self, from_pos, to_pos):
+        """
+        Distances between every pair of world (x, z) positions of shape (S, 2) and (H, 2).
+        """
+        if self.distance_field is None:
+            return distance_matrix(from_pos, to_pos)
+        origin = np.asarray(self.origin, dtype=np.float64)
+        return self.distance_field.distances(
+            self.distance_field.cells(np.asarray(from_pos, dtype=np.float64).reshape(-1, 2) - origin),
+            self.distance_field.cells(np.asarray(to_pos, dtype=np.float64).reshape(-1, 2) - origin),
+        )
+
+    def update(self, entities, tick=None):
+        """
+        Rebuilds the matrix from a Malmo entities observation, unless it was already built for this tick.
+
+        Arguments:
+            entities (list[dict]):
+                malmo_obs["entities"] of any seeker.
+            tick (hashable):
+                Identifier of the current step. None always rebuilds.
+        """
+        if tick is not None and tick == self.tick:
+            return
+        self.tick = tick
+
+        if self.names is not None:
+            entities = [e for e in entities if e["name"] in self.names]
+        seekers = [e for e in entities if e["name"].startswith(self.seeker_prefix)]
+        hiders = [e for e in entities if e["name"].startswith(self.hider_prefix)]
+        self.seekers = {e["name"]: i for i, e in enumerate(seekers)}
+        self.hiders = [e["name"] for e in hiders]
+        self.hider_pos = {e["name"]: (e["x"], e["z"]) for e in hiders}
+        self.distances = self.pair_distances(
+            np.array([(e["x"], e["z"]) for e in seekers], dtype=np.float64).reshape(-1, 2),
+            np.array([(e["x"], e["z"]) for e in hiders], dtype=np.float64).reshape(-1, 2),
+        )
+
+    def closest(self, seeker: str, pos=None):
+        """
+        Returns the distance from a seeker to its closest hider, inf if no hider is in range.
+
+        pos is the seeker's own (x, z), used when the entities observation didn't list the seeker itself.
+        """
+        if len(self.hiders) == 0:
+            return float("inf")
+        if seeker in self.seekers:
+            return float(self.distances[self.seekers[seeker]].min())
+        if pos is not None:
+            hider_pos = np.array([self.hider_pos[name] for name in self.hiders])
+            return float(self.pair_distances([pos], hider_pos).min())
+        return float("inf")
+
+    def k_nearest(self, seeker: str, k: int):
+        """
+        Returns the names and distances of the k hiders closest to a seeker, closest first.
+        """
+        if seeker not in self.seekers or len(self.hiders) == 0:
+            return [], np.zeros((0,))
+        index, distances = k_nearest(self.distances[self.seekers[seeker]][np.newaxis], k)
+        return [self.hiders[i] for i in index[0]], distances[0]
@@ -0,0 +1,122 @@
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from artifact_cache import content_hash, shared_cache
+from distance_field import BLOCKED_CELLS
+
+# (row, col) of play_arena, which is (z, x) in the world
+Cell = Tuple[int, int]
+
+
+class ArenaLayout(NamedTuple):
+    """
+    Structure of a generated arena, recorded while the generator builds it so nothing has to scan play_arena
+    to recover it later.
+    """
+    # inclusive (top left, bottom right) cells of the inside of every room
+    rooms: Tuple[Tuple[Cell, Cell], ...]
+    # wall cells the generator opened up again
+    doors: Tuple[Cell, ...]
+    # first and last cell of every straight wall segment
+    walls: Tuple[Tuple[Cell, Cell], ...]
+    # (arena_size, arena_size) masks of the walkable cells inside a room and outside every room
+    # walkable cells are the ones DistanceField walks through, dirt blocks agents like walls do
+    inside: np.ndarray
+    outside: np.ndarray
+    # walkable cells that split the walkable area in two when blocked, like doors and narrow corridors
+    chokepoints: Tuple[Cell, ...]
+
+    def room_of(self, cell: Cell):
+        """
+        Index of the room the cell lies in, None outside every room.
+        """
+        for index, ((row1, col1), (row2, col2)) in enumerate(self.rooms):
+            if row1 <= cell[0] <= row2 and col1 <= cell[1] <= col2:
+                return index
+        return None
+
+
+def find_chokepoints(walkable: np.ndarray):
+    """
+    Articulation points of the 4-connected walkable cells, found with an iterative Tarjan DFS.
+    """
+    height, width = walkable.shape
+    discovery = np.full(walkable.shape, -1, dtype=np.int32)
+    low = np.zeros(walkable.shape, dtype=np.int32)
+    chokepoints = set()
+    time = 0
+
+    def neighbours(row, col):
+        for d_row, d_col in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            r, c = row + d_row, col + d_col
+            if 0 <= r < height and 0 <= c < width and walkable[r, c]:
+                yield r, c
+
+    for root in zip(*np.nonzero(walkable)):
+        if discovery[root] >= 0:
+            continue
+        discovery[root] = low[root] = time
+        time += 1
+        root_children = 0
+        stack = [(root, None, neighbours(*root))]
+        while stack:
+            cell, parent, remaining = stack[-1]
+            child = next(remaining, None)
+            if child is None:
+                stack.pop()
+                if parent is not None:
+                    low[parent] = min(low[parent], low[cell])
+                    if parent != root and low[cell] >= discovery[parent]:
+                        chokepoints.add(parent)
+                continue
+            if child == parent:
+                continue
+            if discovery[child] >= 0:
+                low[cell] = min(low[cell], discovery[child])
+                continue
+            discovery[child] = low[child] = time
+            time += 1
+            if cell == root:
+                root_children += 1
+            stack.append((child, cell, neighbours(*child)))
+        if root_children > 1:
+            chokepoints.add(root)
+
+    return tuple(sorted((int(row), int(col)) for row, col in chokepoints))
+
+
+def describe_layout(
+    play_arena: List[List[int]],
+    rooms: List[Tuple[Cell, Cell]] = (),
+    doors: List[Cell] = (),
+    walls: List[Tuple[Cell, Cell]] = (),
+):
+    """
+    Builds the layout of an arena from what its generator recorded, deriving the masks and chokepoints once.
+
+    Arguments:
+        play_arena (list[list[int]]):
+            2D map of the arena with its blocks and stairs placed. Walls and dirt aren't walkable.
+        rooms, doors, walls:
+            See ArenaLayout. Arenas given as a finished play_arena have no record of them.
+    """
+    grid = np.asarray(play_arena)
+    walkable = ~np.isin(grid, BLOCKED_CELLS)
+    key = content_hash(walkable, list(rooms), list(doors), list(walls))
+    return shared_cache.get_or_build("layout", key, lambda: _build_layout(walkable, rooms, doors, walls))
+
+
+def _build_layout(walkable, rooms, doors, walls):
+    inside = np.zeros(walkable.shape, dtype=bool)
+    for (row1, col1), (row2, col2) in rooms:
+        inside[row1:row2 + 1, col1:col2 + 1] = True
+
+    return ArenaLayout(
+        rooms=tuple(rooms),
+        doors=tuple(doors),
+        walls=tuple(walls),
+        inside=inside & walkable,
+        outside=~inside & walkable,
+        chokepoints=find_chokepoints(walkable),
+    )
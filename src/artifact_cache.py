@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+
+
+def content_hash(*parts):
+    """
+    Stable hash of arrays, strings and JSON serializable values, equal for equal content in any process.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(f"{part.dtype}{part.shape}".encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=repr).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def arena_hash(play_arena, spawns=(), config=None):
+    """
+    Identity of an arena: its grid, the agents' spawn cells and whatever config the artifact depends on.
+
+    Agent markers (4) are left out of the grid, the spawns already say where the agents are.
+    """
+    grid = np.asarray(play_arena, dtype=np.int8)
+    grid = np.where(grid == 4, 0, grid).astype(np.int8)
+    return content_hash(grid, [list(spawn) for spawn in spawns], config)
+
+
+class ArtifactCache:
+    """
+    Memoizes artifacts derived from an arena, such as visibility indexes or validated mission specs, under the
+    arena's content hash.
+
+    Artifacts are kept in memory up to max_entries, evicting the least recently used one. With a cache_dir,
+    picklable artifacts are also written to disk, so other processes and later runs load them instead of
+    building them again. Lookups are thread safe, an artifact built by two threads at once is simply built twice.
+    """
+
+    def __init__(self, max_entries: int = 256, cache_dir: str = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+
+        ### Cache State ###
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_or_build(self, kind: str, key: str, build: Callable[[], object], persist: bool = True):
+        """
+        Returns the artifact of the given kind for the key, calling build() only if no tier has it.
+
+        Arguments:
+            kind (str):
+                Name of the artifact, keeps artifacts of different kinds for the same arena apart.
+            key (str):
+                Content hash of everything the artifact depends on, see arena_hash.
+            build (callable):
+                Builds the artifact.
+            persist (bool):
+                Whether the artifact may go to the disk tier. Objects that can't be pickled, like a MissionSpec,
+                stay in memory.
+        """
+        entry = (kind, key)
+        with self.lock:
+            if entry in self.entries:
+                self.entries.move_to_end(entry)
+                self.hits += 1
+                return self.entries[entry]
+
+        artifact = self._load(kind, key) if persist else None
+        if artifact is not None:
+            self.disk_hits += 1
+        else:
+            artifact = build()
+            self.misses += 1
+            if persist:
+                self._store(kind, key, artifact)
+
+        with self.lock:
+            self.entries[entry] = artifact
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return artifact
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        return {
+            "artifact_hits": self.hits,
+            "artifact_disk_hits": self.disk_hits,
+            "artifact_misses": self.misses,
+            "artifact_entries": len(self.entries),
+        }
+
+    def _path(self, kind: str, key: str):
+        return os.path.join(self.cache_dir, kind, key[:2], key + ".pkl")
+
+    def _load(self, kind: str, key: str):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(kind, key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store(self, kind: str, key: str, artifact):
+        if self.cache_dir is None:
+            return
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written next to the target and renamed, so readers in other processes never see half a file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+
+# shared by the arena generator, the mission builder and the simulator of a process
+shared_cache = ArtifactCache()
+
+
+def configure(max_entries: int = None, cache_dir: str = None):
+    """
+    Resizes the shared cache or gives it a disk tier.
+    """
+    if max_entries is not None:
+        shared_cache.max_entries = max_entries
+    if cache_dir is not None:
+        shared_cache.cache_dir = cache_dir
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+try:
+    from malmo import MalmoPython
+except:
+    import MalmoPython
+
+from malmo_commands import interact_command, move_commands, stop_commands
+from mission_supervisor import ClientHungError
+from multi_agent_helper import MissionStartError, MissionStartTimeout
+
+# how often pending agent hosts are polled, every poll is a cheap non blocking call into Malmo
+POLL_INTERVAL = 0.02
+
+
+class AsyncAgentHost:
+    """
+    Awaitable front-end of a MalmoPython.AgentHost.
+
+    Waiting is done with asyncio.sleep instead of time.sleep, so a single event loop can drive the agents of
+    many missions at once. startMission, the only call that can block for a while, runs in the loop's executor.
+    """
+
+    def __init__(self, agent_host, name: str, poll_interval: float = POLL_INTERVAL):
+        self.agent_host = agent_host
+        self.name = name
+        self.poll_interval = poll_interval
+
+    async def start_mission(self, mission, client_pool, record_spec, role: int, experiment_id: str, max_attempts: int = 5, retry_delay: float = 2.0):
+        """
+        Async version of safeStartMission. Retries while the server warms up or clients are still starting.
+        """
+        loop = asyncio.get_running_loop()
+        used_attempts = 0
+        while True:
+            try:
+                await loop.run_in_executor(
+                    None, self.agent_host.startMission, mission, client_pool, record_spec, role, experiment_id
+                )
+                return
+            except MalmoPython.MissionException as e:
+                error_code = e.details.errorCode
+                if error_code == MalmoPython.MissionErrorCode.MISSION_SERVER_WARMING_UP:
+                    pass
+                elif error_code in (
+                    MalmoPython.MissionErrorCode.MISSION_INSUFFICIENT_CLIENTS_AVAILABLE,
+                    MalmoPython.MissionErrorCode.MISSION_SERVER_NOT_FOUND,
+                ):
+                    used_attempts += 1
+                    if used_attempts >= max_attempts:
+                        raise MissionStartError(f"startMission failed for role {role} after {max_attempts} attempts") from e
+                else:
+                    raise MissionStartError(f"startMission failed for role {role}: {e.message}") from e
+            await asyncio.sleep(retry_delay)
+
+    async def wait_for_start(self, timeout: float = 120.0):
+        """
+        Waits until the mission of this agent has begun.
+        """
+        deadline = time.time() + timeout
+        while True:
+            world_state = self.agent_host.peekWorldState()
+            if len(world_state.errors) > 0:
+                raise MissionStartError("Errors waiting for mission start: " + "; ".join(e.text for e in world_state.errors))
+            if world_state.has_mission_begun:
+                return
+            if time.time() >= deadline:
+                raise MissionStartTimeout(f"Mission of {self.name} didn't start within {timeout} seconds")
+            await asyncio.sleep(self.poll_interval)
+
+    async def send_commands(self, commands: List[str]):
+        for command in commands:
+            self.agent_host.sendCommand(command)
+
+    async def next_observation(self, timeout: float = 30.0):
+        """
+        Waits for the agent's next observation.
+
+        Returns:
+            tuple(dict, WorldState): The parsed observation and the world state it came with. The observation is
+            None when the mission ended.
+
+        Raises:
+            ClientHungError: If the client reported errors or sent nothing for timeout seconds.
+        """
+        deadline = time.time() + timeout
+        while True:
+            world_state = self.agent_host.getWorldState()
+            if len(world_state.errors) > 0:
+                raise ClientHungError(self.name, "; ".join(error.text for error in world_state.errors))
+            if world_state.number_of_observations_since_last_state > 0:
+                return json.loads(world_state.observations[-1].text), world_state
+            if not world_state.is_mission_running:
+                return None, world_state
+            if time.time() >= deadline:
+                raise ClientHungError(self.name, f"no observation for {timeout} seconds")
+            await asyncio.sleep(self.poll_interval)
+
+    async def quit(self):
+        self.agent_host.sendCommand("quit")
+
+
+async def start_mission(agent_hosts: Dict[str, AsyncAgentHost], mission, client_pool, record_specs: Dict[str, object], experiment_id: str, timeout: float = 120.0):
+    """
+    Starts a mission for every agent host, in order of their role, then waits for all of them at once.
+    """
+    for role, (name, agent_host) in enumerate(agent_hosts.items()):
+        await agent_host.start_mission(mission, client_pool, record_specs[name], role, experiment_id)
+    await asyncio.gather(*(agent_host.wait_for_start(timeout) for agent_host in agent_hosts.values()))
+
+
+async def step(agent_hosts: List[AsyncAgentHost], actions, hiders: List[bool], window: float = 0.5, timeout: float = 30.0):
+    """
+    Async version of step_agents: every agent moves for the same window, stops, interacts if its action asks for
+    it and then all observations are awaited together.
+
+    Arguments:
+        agent_hosts (list[AsyncAgentHost]):
+            Agents to step, they can belong to different missions.
+        actions (array-like):
+            (move, turn, pitch, interact) of every agent.
+        hiders (list[bool]):
+            Whether every agent hides, hiders place dirt when they interact and seekers dig.
+
+    Returns:
+        list[tuple(dict, WorldState)]: Result of next_observation of every agent.
+    """
+    await asyncio.gather(*(
+        agent_host.send_commands(move_commands(action)) for agent_host, action in zip(agent_hosts, actions)
+    ))
+    await asyncio.sleep(window)
+    await asyncio.gather(*(agent_host.send_commands(stop_commands()) for agent_host in agent_hosts))
+
+    interacting = [i for i, action in enumerate(actions) if action[3] > 0]
+    if len(interacting) > 0:
+        await asyncio.sleep(window)
+        await asyncio.gather(*(agent_hosts[i].send_commands([interact_command(hiders[i])]) for i in interacting))
+        if any(not hiders[i] for i in interacting):
+            await asyncio.sleep(0.2)
+
+    return await asyncio.gather(*(agent_host.next_observation(timeout) for agent_host in agent_hosts))
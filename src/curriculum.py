@@ -0,0 +1,145 @@
+import queue
+import threading
+from collections import deque
+from typing import Dict, List
+
+from env import create_env
+
+# arena settings of every curriculum level, from easiest to hardest for the seekers
+# item_density is the fraction of arena cells that get a block or a stair
+DEFAULT_LEVELS = [
+    {"arena_size": 6, "quadrant_size": (3, 3), "quadrant_num_doors": 2, "item_density": 0.0},
+    {"arena_size": 8, "quadrant_size": (3, 4), "quadrant_num_doors": 2, "item_density": 0.02},
+    {"arena_size": 10, "quadrant_size": (3, 5), "quadrant_num_doors": 1, "item_density": 0.04},
+    {"arena_size": 12, "quadrant_size": (4, 6), "quadrant_num_doors": 1, "item_density": 0.06},
+    {"arena_size": 14, "quadrant_size": (4, 7), "quadrant_num_doors": 1, "item_density": 0.08},
+]
+
+
+class CurriculumScheduler:
+    """
+    Moves between curriculum levels based on the seekers' rolling win rate.
+
+    The level goes up once the seekers win at least promote_at of the last window episodes and down once they
+    win at most demote_at of them. The window is cleared on every level change, so a new level always gets a
+    full window of episodes before it is judged.
+    """
+
+    def __init__(self, levels: List[Dict] = None, window: int = 20, promote_at: float = 0.6, demote_at: float = 0.05, start_level: int = 0):
+        self.levels = levels if levels is not None else DEFAULT_LEVELS
+        self.window = window
+        self.promote_at = promote_at
+        self.demote_at = demote_at
+        self.level = start_level
+        self.results = deque(maxlen=window)
+
+    @property
+    def params(self):
+        return self.levels[self.level]
+
+    @property
+    def win_rate(self):
+        if len(self.results) == 0:
+            return 0.0
+        return sum(self.results) / len(self.results)
+
+    def record(self, seeker_won: bool):
+        """
+        Adds the outcome of an episode.
+
+        Returns:
+            bool: True if the level changed.
+        """
+        self.results.append(bool(seeker_won))
+        if len(self.results) < self.window:
+            return False
+
+        if self.win_rate >= self.promote_at and self.level < len(self.levels) - 1:
+            self.level += 1
+        elif self.win_rate <= self.demote_at and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+
+        print(f"curriculum moved to level {self.level}: {self.params}")
+        self.results.clear()
+        return True
+
+
+def generate_level_arena(level: Dict, is_closed_arena: bool, env_type: str, item_gen: Dict[str, bool]):
+    """
+    Generates an arena with the settings of a curriculum level.
+
+    Returns:
+        tuple(str, list[list[int]], ArenaLayout): Same as create_env.
+    """
+    arena_size = level["arena_size"]
+    num_items = int(level.get("item_density", 0.0) * arena_size ** 2)
+    kwargs = {key: level[key] for key in ("quadrant_size", "quadrant_loc", "quadrant_num_doors", "item_mode") if key in level}
+    try:
+        return create_env(arena_size, is_closed_arena, env_type, item_gen, num_items - num_items // 2, num_items // 2, **kwargs)
+    except ValueError:
+        # the rolled room left too little space for the items, an empty arena is still a valid arena
+        return create_env(arena_size, is_closed_arena, env_type, item_gen, 0, 0, **kwargs)
+
+
+class ArenaCache:
+    """
+    Keeps a stock of pre-generated arenas for the current curriculum level and its neighbours.
+
+    A background thread tops the stock of every warm level back up to per_level arenas, so changing level never
+    waits on arena generation. Arenas are handed out once and then replaced with fresh ones.
+    """
+
+    def __init__(self, levels: List[Dict], is_closed_arena: bool, env_type: str, item_gen: Dict[str, bool], per_level: int = 8):
+        self.levels = levels
+        self.is_closed_arena = is_closed_arena
+        self.env_type = env_type
+        self.item_gen = item_gen
+        self.per_level = per_level
+
+        ### Cache State ###
+        self.stock = [queue.Queue() for _ in levels]
+        self.warm_levels = set()
+        self.num_hits = 0
+        self.num_misses = 0
+
+        ### Generator Thread ###
+        self.wake = threading.Event()
+        self.stopped = False
+        self.generator = threading.Thread(target=self._generator_loop, name="arena-generator", daemon=True)
+        self.generator.start()
+
+    def warm(self, level: int):
+        """
+        Keeps the given level and the levels next to it stocked.
+        """
+        self.warm_levels = {i for i in (level - 1, level, level + 1) if 0 <= i < len(self.levels)}
+        self.wake.set()
+
+    def get(self, level: int):
+        """
+        Returns a pre-generated arena of the level, generating one on the spot if the stock ran out.
+        """
+        self.warm(level)
+        try:
+            arena = self.stock[level].get_nowait()
+            self.num_hits += 1
+        except queue.Empty:
+            arena = generate_level_arena(self.levels[level], self.is_closed_arena, self.env_type, self.item_gen)
+            self.num_misses += 1
+        self.wake.set()
+        return arena
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
+        self.generator.join()
+
+    def _generator_loop(self):
+        while not self.stopped:
+            self.wake.wait()
+            self.wake.clear()
+            for level in sorted(self.warm_levels):
+                while not self.stopped and level in self.warm_levels and self.stock[level].qsize() < self.per_level:
+                    self.stock[level].put(generate_level_arena(self.levels[level], self.is_closed_arena, self.env_type, self.item_gen))
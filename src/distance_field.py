@@ -0,0 +1,254 @@
+import numpy as np
+
+from artifact_cache import arena_hash, shared_cache
+
+# play_arena values agents can't walk through
+# walls = 1
+# blocks = 2, agents don't jump so a single dirt block already blocks them, stairs can be walked up
+BLOCKED_CELLS = (1, 2)
+
+UNREACHABLE = np.inf
+
+
+def shift_min(fields):
+    """
+    Smallest value among the 4 neighbours of every cell of a stack of fields of shape (S, H, W).
+    """
+    neighbours = np.full(fields.shape, UNREACHABLE, dtype=fields.dtype)
+    np.minimum(neighbours[:, 1:], fields[:, :-1], out=neighbours[:, 1:])
+    np.minimum(neighbours[:, :-1], fields[:, 1:], out=neighbours[:, :-1])
+    np.minimum(neighbours[:, :, 1:], fields[:, :, :-1], out=neighbours[:, :, 1:])
+    np.minimum(neighbours[:, :, :-1], fields[:, :, 1:], out=neighbours[:, :, :-1])
+    return neighbours
+
+
+def dilate(masks):
+    """
+    Grows a stack of boolean masks of shape (S, H, W) by one cell in the 4 directions.
+    """
+    grown = masks.copy()
+    grown[:, 1:] |= masks[:, :-1]
+    grown[:, :-1] |= masks[:, 1:]
+    grown[:, :, 1:] |= masks[:, :, :-1]
+    grown[:, :, :-1] |= masks[:, :, 1:]
+    return grown
+
+
+def bfs(passable, sources, multi_source: bool = False):
+    """
+    Breadth first search from many sources at once, one frontier per source advanced in lockstep.
+
+    Arguments:
+        passable (np.ndarray):
+            Boolean mask of shape (H, W) of the cells agents can walk through. Indexed as [z][x].
+        sources (array-like):
+            (x, z) cells of shape (S, 2).
+        multi_source (bool):
+            Whether to return a single field holding the distance to the closest source instead of one per source.
+
+    Returns:
+        np.ndarray: float32 distances of shape (S, H, W), or (1, H, W) for multi_source. Unreachable cells and
+        blocked cells are inf.
+    """
+    sources = np.asarray(sources, dtype=np.intp).reshape(-1, 2)
+    num_fields = 1 if multi_source else len(sources)
+    fields = np.full((num_fields, *passable.shape), UNREACHABLE, dtype=np.float32)
+    frontier = np.zeros(fields.shape, dtype=bool)
+    field_index = np.zeros(len(sources), dtype=np.intp) if multi_source else np.arange(len(sources))
+    frontier[field_index, sources[:, 1], sources[:, 0]] = True
+    frontier &= passable
+
+    distance = 0
+    while frontier.any():
+        fields[frontier] = distance
+        distance += 1
+        frontier = dilate(frontier) & passable & (fields == UNREACHABLE)
+    return fields
+
+
+def relax(fields, passable):
+    """
+    Lowers the distances of fields that got too high after a cell became passable, until they are consistent.
+    """
+    while True:
+        lowered = np.where(passable, np.minimum(fields, shift_min(fields) + 1), UNREACHABLE).astype(fields.dtype)
+        if np.array_equal(lowered, fields):
+            return fields
+        fields = lowered
+
+
+class DistanceField:
+    """
+    Walking distances between the cells of a play_arena, 4-connected around walls and blocks.
+
+    The field of a source cell is built the first time it is asked for and kept, so distance queries between
+    agents only run a search when an agent stands on a cell no one asked about before. Every new field of a
+    query is searched in the same batch. When a block is placed only the fields that could have walked through
+    its cell are searched again, and when one is dug up the kept fields are relaxed in place.
+    """
+
+    def __init__(self, play_arena, blocked=BLOCKED_CELLS):
+        """
+        Arguments:
+            play_arena (list[list[int]]):
+                2D map of the arena as returned by gen_quadrant_env.
+            blocked (tuple[int]):
+                play_arena values agents can't walk through.
+        """
+        self.blocked = blocked
+        self.grid = np.asarray(play_arena, dtype=np.int8).copy()
+        self.height, self.width = self.grid.shape
+        self.passable = ~np.isin(self.grid, blocked)
+
+        ### Field Cache ###
+        # (x, z) of every source with a field, and the fields stacked in the same order
+        self.sources = {}
+        self.fields = np.zeros((0, self.height, self.width), dtype=np.float32)
+        self._labels = None
+
+    def copy(self):
+        """
+        Returns an independent copy that can be patched without touching the cached fields.
+        """
+        field = DistanceField.__new__(DistanceField)
+        field.__dict__.update(self.__dict__)
+        field.grid = self.grid.copy()
+        field.passable = self.passable.copy()
+        field.sources = dict(self.sources)
+        field.fields = self.fields.copy()
+        return field
+
+    def __getstate__(self):
+        # kept fields are cheap to rebuild and would bloat the disk cache
+        state = dict(self.__dict__)
+        state["sources"] = {}
+        state["fields"] = np.zeros((0, self.height, self.width), dtype=np.float32)
+        state["_labels"] = None
+        return state
+
+    def cells(self, positions):
+        """
+        Cells of (x, z) positions of shape (..., 2), clipped to the arena.
+        """
+        positions = np.floor(np.asarray(positions, dtype=np.float64)).astype(np.intp)
+        return np.stack([
+            np.clip(positions[..., 0], 0, self.width - 1),
+            np.clip(positions[..., 1], 0, self.height - 1),
+        ], axis=-1)
+
+    def field_index(self, cells):
+        """
+        Rows of self.fields of (x, z) cells of shape (N, 2), searching every missing field in one batch.
+        """
+        cells = [tuple(int(v) for v in cell) for cell in np.asarray(cells).reshape(-1, 2)]
+        missing = list(dict.fromkeys(cell for cell in cells if cell not in self.sources))
+        if missing:
+            for cell in missing:
+                self.sources[cell] = len(self.sources)
+            self.fields = np.concatenate([self.fields, bfs(self.passable, missing)])
+        return np.array([self.sources[cell] for cell in cells], dtype=np.intp)
+
+    def field(self, x: int, z: int):
+        """
+        Distances of every cell from (x, z), shape (H, W).
+        """
+        index = self.field_index([(x, z)])[0]
+        return self.fields[index]
+
+    def distance(self, a, b):
+        """
+        Walking distance between cells a = (x, z) and b = (x, z), inf if b can't be reached.
+        """
+        return float(self.field(*a)[b[1], b[0]])
+
+    def distances(self, from_cells, to_cells):
+        """
+        Walking distances between every pair of (x, z) cells of shape (S, 2) and (H, 2).
+
+        Returns:
+            np.ndarray: Distances of shape (S, H).
+        """
+        from_cells = np.asarray(from_cells, dtype=np.intp).reshape(-1, 2)
+        to_cells = np.asarray(to_cells, dtype=np.intp).reshape(-1, 2)
+        # walking distances are symmetric, fields of the targets also serve every source
+        index = self.field_index(to_cells)
+        fields = self.fields[index]
+        return fields[:, from_cells[:, 1], from_cells[:, 0]].T
+
+    def nearest(self, sources):
+        """
+        Distance of every cell to the closest of the (x, z) source cells, shape (H, W). Not kept.
+        """
+        return bfs(self.passable, sources, multi_source=True)[0]
+
+    def labels(self):
+        """
+        Connected component of every cell, shape (H, W). Cells reachable from each other share a label, blocked
+        cells are -1.
+        """
+        if self._labels is None:
+            # every cell starts as its own label and takes over the smallest label next to it until none changes
+            labels = np.where(self.passable, np.arange(self.grid.size).reshape(self.grid.shape), UNREACHABLE)[np.newaxis]
+            while True:
+                spread = np.where(self.passable, np.minimum(labels, shift_min(labels)), UNREACHABLE)
+                if np.array_equal(spread, labels):
+                    break
+                labels = spread
+            self._labels = np.where(self.passable, labels[0], -1).astype(np.int32)
+        return self._labels
+
+    def connected(self, a, b):
+        labels = self.labels()
+        return labels[a[1], a[0]] >= 0 and labels[a[1], a[0]] == labels[b[1], b[0]]
+
+    def place_block(self, x: int, z: int, value: int = 2):
+        """
+        Marks a cell as filled, by default with a dirt block, and updates the kept fields.
+        """
+        self.set_cell(x, z, value)
+
+    def remove_block(self, x: int, z: int):
+        """
+        Marks a cell as empty and updates the kept fields.
+        """
+        self.set_cell(x, z, 0)
+
+    def set_cell(self, x: int, z: int, value: int):
+        """
+        Changes a single cell and updates only what it can change.
+
+        Blocking a cell can only lengthen paths of fields that reached it, those are searched again in one batch.
+        Opening a cell can only shorten paths, so the kept fields are relaxed from their current distances.
+        """
+        was_passable = self.passable[z, x]
+        self.grid[z, x] = value
+        self.passable[z, x] = value not in self.blocked
+        if was_passable == self.passable[z, x]:
+            return
+        self._labels = None
+        if len(self.sources) == 0:
+            return
+
+        if was_passable:
+            stale = np.nonzero(self.fields[:, z, x] != UNREACHABLE)[0]
+            sources = list(self.sources)
+            self.fields = self.fields.copy()
+            self.fields[stale] = bfs(self.passable, [sources[i] for i in stale])
+        else:
+            fields = self.fields.copy()
+            # a source standing on the cell that just opened up is distance 0 from itself again
+            if (x, z) in self.sources:
+                fields[self.sources[(x, z)], z, x] = 0
+            self.fields = relax(fields, self.passable)
+
+
+def get_distance_field(play_arena, blocked=BLOCKED_CELLS):
+    """
+    Returns the DistanceField of a play_arena, shared by everything asking about the same arena.
+
+    Agent markers (4) don't block walking, so they are ignored when looking up an arena. The returned field is
+    shared, copy() it before placing or removing blocks.
+    """
+    grid = np.asarray(play_arena, dtype=np.int8)
+    key = arena_hash(grid, config={"blocked": list(blocked)})
+    return shared_cache.get_or_build("distance_field", key, lambda: DistanceField(np.where(grid == 4, 0, grid), blocked))
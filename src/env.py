@@ -1,5 +1,125 @@
+import re
 from random import randint, choice
-from typing import Dict
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from arena_layout import describe_layout
+from visibility_index import get_visibility_index
+
+# blocks cleared around the arena walls, covers blocks agents place or dig while standing next to the walls
+RESET_MARGIN = 2
+# how far agents reach when placing or digging blocks
+INTERACT_REACH = 5
+# empty blocks between the reset regions of neighbouring arenas tiled into one world
+ARENA_GAP = 4
+
+# how blocks and stairs of the arena are placed
+# "block" - placed blocks, part of the world like the walls
+# "item"  - dropped item entities, which the server ticks and every agent observes as nearby entities
+ITEM_MODES = ("block", "item")
+# play_arena values of the items and the Minecraft block drawn for them
+ITEM_TYPES = {2: "dirt", 3: "oak_stairs"}
+# facing of a stair and the (row, col) step to the cell it is climbed from, a stair rises towards its facing
+STAIR_FACINGS = (("NORTH", (1, 0)), ("SOUTH", (-1, 0)), ("EAST", (0, -1)), ("WEST", (0, 1)))
+
+
+class ResetRegion(NamedTuple):
+    """
+    Inclusive x and z bounds of the area that gets redrawn when a mission starts.
+    """
+    x1: int
+    x2: int
+    z1: int
+    z2: int
+
+    def union(self, other: "ResetRegion"):
+        if other is None:
+            return self
+        return ResetRegion(min(self.x1, other.x1), max(self.x2, other.x2), min(self.z1, other.z1), max(self.z2, other.z2))
+
+    def shift(self, dx: int, dz: int):
+        return ResetRegion(self.x1 + dx, self.x2 + dx, self.z1 + dz, self.z2 + dz)
+
+    def num_blocks(self):
+        # grass layer plus three air layers
+        return 4 * (self.x2 - self.x1 + 1) * (self.z2 - self.z1 + 1)
+
+
+# the area every mission used to clear, still used when nothing is known about the state of the world
+FULL_RESET_REGION = ResetRegion(-1000, 1000, -1000, 1000)
+
+
+def arena_region(arena_size: int, margin: int = RESET_MARGIN):
+    """
+    Bounds of the arena and its walls plus a margin.
+    """
+    return ResetRegion(-1 - margin, arena_size + margin, -1 - margin, arena_size + margin)
+
+
+def plan_reset_region(arena_size: int, dirty_region: ResetRegion = None, margin: int = RESET_MARGIN):
+    """
+    Smallest region that has to be redrawn for a new arena: the new arena with its walls and margin plus
+    everything the previous mission dirtied.
+    """
+    return arena_region(arena_size, margin).union(dirty_region)
+
+
+def reset_cuboids(region: ResetRegion):
+    return f"""
+                    <DrawCuboid x1='{region.x1}' x2='{region.x2}' y1='1' y2='1' z1='{region.z1}' z2='{region.z2}' type='grass'/>
+                    <DrawCuboid x1='{region.x1}' x2='{region.x2}' y1='2' y2='4' z1='{region.z1}' z2='{region.z2}' type='air'/>"""
+
+
+def with_reset_region(env: str, arena_size: int, region: ResetRegion):
+    """
+    Swaps the default reset of an environment generated by create_env for a reset of another region, for
+    example when an arena was generated ahead of time before the previous mission's dirty region was known.
+    """
+    default = reset_cuboids(arena_region(arena_size))
+    if default not in env:
+        raise ValueError("Environment doesn't contain the default reset region of an arena of this size")
+    return env.replace(default, reset_cuboids(region), 1)
+
+
+def stair_facing(play_arena: List[List[int]], row: int, col: int):
+    """
+    Facing of the stair at (row, col), the first one in STAIR_FACINGS that is climbed from an open cell.
+    """
+    for facing, (d_row, d_col) in STAIR_FACINGS:
+        r, c = row + d_row, col + d_col
+        if 0 <= r < len(play_arena) and 0 <= c < len(play_arena[r]) and play_arena[r][c] not in (1, 2, 3):
+            return facing
+    return STAIR_FACINGS[0][0]
+
+
+def draw_items(play_arena: List[List[int]], item_mode: str = "block"):
+    """
+    Drawing commands of every block and stair marked in play_arena.
+
+    Arguments:
+        item_mode (str):
+            "block" places them as blocks with stairs facing an open cell, "item" drops them as item entities.
+    """
+    if item_mode not in ITEM_MODES:
+        raise ValueError(f"item_mode: {item_mode} is not supported, expected one of {list(ITEM_MODES)}.")
+
+    drawing = ""
+    for row_index in range(len(play_arena)):
+        for col_index in range(len(play_arena[row_index])):
+            item = ITEM_TYPES.get(play_arena[row_index][col_index])
+            if item is None:
+                continue
+            if item_mode == "item":
+                drawing += f"""
+                    <DrawItem x="{col_index}" y="2" z="{row_index}" type="{item}"/>"""
+            elif item == "oak_stairs":
+                drawing += f"""
+                    <DrawBlock x="{col_index}" y="2" z="{row_index}" type="{item}" face="{stair_facing(play_arena, row_index, col_index)}"/>"""
+            else:
+                drawing += f"""
+                    <DrawBlock x="{col_index}" y="2" z="{row_index}" type="{item}"/>"""
+    return drawing
 
 
 def gen_quadrant_env(
@@ -42,10 +162,13 @@ def gen_quadrant_env(
             Specify how many doors the quadrant room should have. Defaults to randint(1, 2).
             1 - A door will be randomly placed one of the walls
             2 - A door will be placed on both walls
+        item_mode (str):
+            Specify how blocks and stairs are placed, see ITEM_MODES. Defaults to "block".
     """
 
     quadrant_env = ""
-    
+    item_mode = kwargs.get("item_mode", "block")
+
     # check if map has been provided
     if "play_arena" in kwargs:
         play_arena = kwargs["play_arena"]
@@ -57,8 +180,9 @@ def gen_quadrant_env(
                     quadrant_env += f"""
                         <DrawBlock x='{col_index}'  y='{2}' z='{row_index}' type='cobblestone'/>
                         <DrawBlock x='{col_index}'  y='{3}' z='{row_index}' type='cobblestone'/>"""
-        
-        return (quadrant_env, play_arena)
+        quadrant_env += draw_items(play_arena, item_mode)
+
+        return (quadrant_env, play_arena, describe_layout(play_arena))
 
     # determine size of quadrant room
     if "quadrant_size" in kwargs:
@@ -162,6 +286,9 @@ def gen_quadrant_env(
     # stairs = 3
     # agents = 4
     play_arena = [[0 for _ in range(arena_size)] for _ in range(arena_size)]
+    # recorded for the arena's layout while the room is built
+    walls = []
+    doors = []
 
     # generate quadrant room
     if quadrant_loc == 0:
@@ -169,9 +296,11 @@ def gen_quadrant_env(
         # place horizontal wall
         for i in range(quadrant_size + 1):
             play_arena[quadrant_size][i] = 1
+        walls.append(((quadrant_size, 0), (quadrant_size, quadrant_size)))
         # place vertical wall
         for i in range(quadrant_size + 1):
             play_arena[i][quadrant_size] = 1
+        walls.append(((0, quadrant_size), (quadrant_size, quadrant_size)))
 
         # top left, bottom right
         quadrant_coords = ((0, 0), (quadrant_size - 1, quadrant_size - 1))
@@ -183,27 +312,33 @@ def gen_quadrant_env(
             if randint(-1, 0) < 0:
                 door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
                 play_arena[quadrant_size][door_index] = 0
+                doors.append((quadrant_size, door_index))
             # place door on vertical wall
             else:
                 door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
                 play_arena[door_index][quadrant_size] = 0
+                doors.append((door_index, quadrant_size))
         # create doors on both walls
         else:
             # place door on horizontal wall
             door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
             play_arena[quadrant_size][door_index] = 0
+            doors.append((quadrant_size, door_index))
 
             # place door on vertical wall
             door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
             play_arena[door_index][quadrant_size] = 0
+            doors.append((door_index, quadrant_size))
     elif quadrant_loc == 1:
         # create top right quadrant room
         # place horizontal wall
         for i in range(arena_size - 1, arena_size - quadrant_size - 1, -1):
             play_arena[quadrant_size][i] = 1
+        walls.append(((quadrant_size, arena_size - quadrant_size), (quadrant_size, arena_size - 1)))
         # place vertical wall
         for i in range(quadrant_size + 1):
             play_arena[i][arena_size - quadrant_size - 1] = 1
+        walls.append(((0, arena_size - quadrant_size - 1), (quadrant_size, arena_size - quadrant_size - 1)))
 
         # top left, bottom right
         quadrant_coords = (
@@ -218,28 +353,34 @@ def gen_quadrant_env(
             if randint(-1, 0) < 0:
                 door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
                 play_arena[quadrant_size][door_index] = 0
+                doors.append((quadrant_size, door_index))
             # place door on vertical wall
             else:
                 door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
                 play_arena[door_index][arena_size - quadrant_size - 1] = 0
+                doors.append((door_index, arena_size - quadrant_size - 1))
 
         # create doors on both walls
         else:
             # place door on horizontal wall
             door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
             play_arena[quadrant_size][door_index] = 0
+            doors.append((quadrant_size, door_index))
 
             # place door on vertical wall
             door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
             play_arena[door_index][arena_size - quadrant_size - 1] = 0
+            doors.append((door_index, arena_size - quadrant_size - 1))
     elif quadrant_loc == 2:
         # create top right quadrant room
         # place horizontal wall
         for i in range(quadrant_size + 1):
             play_arena[arena_size - quadrant_size - 1][i] = 1
+        walls.append(((arena_size - quadrant_size - 1, 0), (arena_size - quadrant_size - 1, quadrant_size)))
         # place vertical wall
         for i in range(arena_size - 1, arena_size - quadrant_size - 1, -1):
             play_arena[i][quadrant_size] = 1
+        walls.append(((arena_size - quadrant_size, quadrant_size), (arena_size - 1, quadrant_size)))
 
         # top left, bottom right
         quadrant_coords = (
@@ -254,28 +395,34 @@ def gen_quadrant_env(
             if randint(-1, 0) < 0:
                 door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
                 play_arena[arena_size - quadrant_size - 1][door_index] = 0
+                doors.append((arena_size - quadrant_size - 1, door_index))
             # place door on vertical wall
             else:
                 door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
                 play_arena[door_index][quadrant_size] = 0
+                doors.append((door_index, quadrant_size))
 
         # create doors on both walls
         else:
             # place door on horizontal wall
             door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
             play_arena[arena_size - quadrant_size - 1][door_index] = 0
+            doors.append((arena_size - quadrant_size - 1, door_index))
 
             # place door on vertical wall
             door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
             play_arena[door_index][quadrant_size] = 0
+            doors.append((door_index, quadrant_size))
     elif quadrant_loc == 3:
         # create top right quadrant room
         # place horizontal wall
         for i in range(arena_size - 1, quadrant_size - 2, -1):
             play_arena[quadrant_size - 1][i] = 1
+        walls.append(((quadrant_size - 1, quadrant_size - 1), (quadrant_size - 1, arena_size - 1)))
         # place vertical wall
         for i in range(arena_size - 1, quadrant_size - 2, -1):
             play_arena[i][quadrant_size - 1] = 1
+        walls.append(((quadrant_size - 1, quadrant_size - 1), (arena_size - 1, quadrant_size - 1)))
 
         # top left, bottom right
         quadrant_coords = (
@@ -290,20 +437,24 @@ def gen_quadrant_env(
             if randint(-1, 0) < 0:
                 door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
                 play_arena[quadrant_size - 1][door_index] = 0
+                doors.append((quadrant_size - 1, door_index))
             # place door on vertical wall
             else:
                 door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
                 play_arena[door_index][quadrant_size - 1] = 0
+                doors.append((door_index, quadrant_size - 1))
 
         # create doors on both walls
         else:
             # place door on horizontal wall
             door_index = randint(quadrant_coords[0][1], quadrant_coords[1][1])
             play_arena[quadrant_size - 1][door_index] = 0
+            doors.append((quadrant_size - 1, door_index))
 
             # place door on vertical wall
             door_index = randint(quadrant_coords[0][0], quadrant_coords[1][0])
             play_arena[door_index][quadrant_size - 1] = 0
+            doors.append((door_index, quadrant_size - 1))
 
     # place blocks based on 2D map
     for row_index in range(len(play_arena)):
@@ -333,10 +484,6 @@ def gen_quadrant_env(
                     # mark where blocks have been placed
                     play_arena[block_index[0]][block_index[1]] = 2
 
-                    # place block
-                    quadrant_env += f"""
-                    <DrawItem x="{block_index[1]}" y="2" z="{block_index[0]}" type="dirt"/>"""
-
             # generate blocks only INSIDE quadrant
             elif item_gen["blocks_inside"]:
                 # check if block would've generate in a wall or existing block
@@ -375,10 +522,6 @@ def gen_quadrant_env(
                     # mark where blocks have been placed
                     play_arena[block_index[0]][block_index[1]] = 2
 
-                    # place blocks
-                    quadrant_env += f"""
-                    <DrawItem x="{block_index[1]}" y="2" z="{block_index[0]}" type="dirt"/>"""
-
             # generate blocks only OUTSIDE quadrant
             elif item_gen["blocks_outside"]:
                 # check if block would've generate in a wall or existing block
@@ -417,10 +560,6 @@ def gen_quadrant_env(
                     # mark where blocks have been placed
                     play_arena[block_index[0]][block_index[1]] = 2
 
-                    # place blocks
-                    quadrant_env += f"""
-                    <DrawItem x="{block_index[1]}" y="2" z="{block_index[0]}" type="dirt"/>"""
-
             block_counter += 1
 
     # generate stairs
@@ -444,10 +583,6 @@ def gen_quadrant_env(
                     # mark where stairs have been placed
                     play_arena[stair_index[0]][stair_index[1]] = 3
 
-                    # place stair
-                    quadrant_env += f"""
-                    <DrawItem x="{stair_index[1]}" y="2" z="{stair_index[0]}" type="oak_stairs"/>"""
-
             # generate stairs only INSIDE quadrant
             elif item_gen["stairs_inside"]:
                 # check if stair would've generate in a wall or existing stair
@@ -487,10 +622,6 @@ def gen_quadrant_env(
                     # mark where stairs have been placed
                     play_arena[stair_index[0]][stair_index[1]] = 3
 
-                    # place stairs
-                    quadrant_env += f"""
-                    <DrawItem x="{stair_index[1]}" y="2" z="{stair_index[0]}" type="oak_stairs"/>"""
-
             # generate stairs only OUTSIDE quadrant
             elif item_gen["stairs_outside"]:
                 # check if stair would've generate in a wall or existing stair
@@ -530,13 +661,167 @@ def gen_quadrant_env(
                     # mark where stairs have been placed
                     play_arena[stair_index[0]][stair_index[1]] = 3
 
-                    # place stairs
-                    quadrant_env += f"""
-                    <DrawItem x="{stair_index[1]}" y="2" z="{stair_index[0]}" type="oak_stairs"/>"""
-
             stair_counter += 1
 
-    return (quadrant_env, play_arena)
+    # draw blocks and stairs once all are placed, so stairs can face a cell that stayed open
+    quadrant_env += draw_items(play_arena, item_mode)
+
+    # blocks change what is walkable, so the layout is described from the finished map
+    layout = describe_layout(play_arena, [quadrant_coords], doors, walls)
+
+    return (quadrant_env, play_arena, layout)
+
+
+def tile_offsets(num_arenas: int, arena_size: int, gap: int = ARENA_GAP):
+    """
+    World (x, z) offsets of num_arenas arenas laid out on a square grid, far enough apart that their reset
+    regions never overlap.
+
+    Returns:
+        list[tuple(int, int)]: Offset of every arena, the first arena stays at the origin.
+    """
+    region = arena_region(arena_size)
+    stride = region.x2 - region.x1 + 1 + gap
+    columns = 1
+    while columns * columns < num_arenas:
+        columns += 1
+    return [((index % columns) * stride, (index // columns) * stride) for index in range(num_arenas)]
+
+
+def tiled_region(arena_size: int, offsets: List[Tuple[int, int]]):
+    """
+    Region covering every tiled arena with its walls and margin.
+    """
+    region = None
+    for dx, dz in offsets:
+        region = arena_region(arena_size).shift(dx, dz).union(region)
+    return region
+
+
+def offset_drawing(drawing: str, dx: int, dz: int):
+    """
+    Moves every x and z coordinate of Malmo drawing commands by (dx, dz).
+    """
+    def shift(match):
+        offset = dx if match.group(1).startswith("x") else dz
+        return f"{match.group(1)}={match.group(2)}{int(match.group(3)) + offset}{match.group(2)}"
+    return re.sub(r"\b([xz][12]?)=(['\"])(-?\d+)\2", shift, drawing)
+
+
+def create_tiled_env(envs: List[str], offsets: List[Tuple[int, int]], reset_region: ResetRegion = None):
+    """
+    Combines environments generated by create_env into a single world, each moved by its offset.
+
+    Arguments:
+        envs (list[str]):
+            Environment XML strings returned by create_env.
+        offsets (list[tuple(int, int)]):
+            World (x, z) offset of every environment, see tile_offsets.
+        reset_region (ResetRegion):
+            Extra world area to clear first, for example what the previous mission dirtied. Every environment
+            still clears its own arena.
+
+    Returns:
+        str: A formated Malmo mission XML string of all environments.
+    """
+    env = f"""
+            <ServerHandlers>
+                <FlatWorldGenerator generatorString="3;7,2;1;"/>
+                <DrawingDecorator>"""
+    if reset_region is not None:
+        env += reset_cuboids(reset_region)
+
+    for arena_env, (dx, dz) in zip(envs, offsets):
+        drawing = arena_env.split("<DrawingDecorator>", 1)[1].rsplit("</DrawingDecorator>", 1)[0]
+        env += offset_drawing(drawing, dx, dz)
+
+    env += """
+                </DrawingDecorator>"""
+    return env
+
+
+def gen_agent_positions(
+    env_map: List[List[int]],
+    arena_size: int,
+    num_agents: int,
+    num_hiders: int,
+    min_agent_spawn_dist: int,
+    layout=None,
+):
+    """
+    Picks random spawn cells for the agents of one arena and marks them in env_map. Agents don't spawn on the
+    chokepoints of the arena's layout, where they would block a door or corridor from the start. The first
+    num_hiders agents are hiders, seekers don't spawn in a cell a hider can be seen from as long as the arena
+    has open cells out of every hider's sight.
+
+    Returns:
+        list[tuple(int, int)]: Spawn (x, z) of every agent, indexing env_map[z][x]. See agent_placement.
+    """
+    agent_pos = []
+    attempt_counter = 0
+    max_attempts = 5
+    chokepoints = set(layout.chokepoints) if layout is not None else set()
+    visibility = get_visibility_index(env_map)
+    open_cells = np.array(env_map) != 1
+    while len(agent_pos) != num_agents:
+        while True:
+            # reset all generated agent positions to prevent situations where in initial generated
+            # agent positions prevents generation of the remaining agents
+            attempt_counter += 1
+            if attempt_counter == max_attempts:
+                for pos in agent_pos:
+                    env_map[pos[1]][pos[0]] = 0
+                agent_pos = []
+
+                continue
+
+            x_pos = randint(0, arena_size - 1)
+            z_pos = randint(0, arena_size - 1)
+
+            # prevent agents from spawning in walls, blocks, stairs and other agents
+            if env_map[z_pos][x_pos] != 0:
+                continue
+
+            # prevent agents from spawning in doors and corridors, chokepoints are (row, col)
+            if (z_pos, x_pos) in chokepoints:
+                continue
+
+            # prevent seekers from spawning with a hider in plain sight
+            if len(agent_pos) >= num_hiders:
+                in_sight = np.zeros(open_cells.shape, dtype=bool)
+                for hider_x, hider_z in agent_pos[:num_hiders]:
+                    in_sight |= visibility.visible_from(hider_x, hider_z)
+                if in_sight[z_pos, x_pos] and not in_sight[open_cells].all():
+                    continue
+
+            # prevent agents from spawning too close to one another
+            adjacent_spots = []
+
+            # generate all spaces around potential spawn point, up to min_agent_spawn_dist inclusive
+            for row_index in range(-(min_agent_spawn_dist), min_agent_spawn_dist + 1):
+                for col_index in range(-(min_agent_spawn_dist), min_agent_spawn_dist + 1):
+                    # only consider VALID spots
+                    if 0 <= (z_pos + col_index) < len(env_map) and 0 <= (x_pos + row_index) < len(env_map[0]):
+                        adjacent_spots.append((z_pos + col_index, x_pos + row_index))
+
+            # an agent was found within min_agent_spawn_dist
+            if any([True for i in adjacent_spots if env_map[i[0]][i[1]] == 4]):
+                continue
+
+            # valid position for agent
+            agent_pos.append((x_pos, z_pos))
+            env_map[z_pos][x_pos] = 4
+            attempt_counter = 0
+            break
+    return agent_pos
+
+
+def agent_placement(pos: Tuple[int, int], offset: Tuple[int, int] = (0, 0)):
+    """
+    Malmo Placement of an agent spawning at the (x, z) cell of gen_agent_positions in an arena moved by offset.
+    Arenas are drawn with x as the column and z as the row of play_arena.
+    """
+    return f"""<Placement x="{pos[0] + offset[0]}" y="2" z="{pos[1] + offset[1]}"/>"""
 
 
 def create_env(
@@ -546,6 +831,7 @@ def create_env(
     item_gen: Dict[str, bool],
     num_blocks: int,
     num_stairs: int,
+    reset_region: ResetRegion = None,
     **kwargs,
 ):
     """
@@ -572,11 +858,13 @@ def create_env(
             Specify the number of blocks that should be generated.
         num_stairs (int):
             Specify the number of stairs that should be generated.
+        reset_region (ResetRegion):
+            Specify the area to clear before drawing the arena, see plan_reset_region. Defaults to the arena, its walls and a small margin.
         **kwargs:
             Arbitrary keyword arguments. Each environment type has additional settings that can be tweaked. Refer to those individual functions to find out more.
 
     Returns:
-        str: A formated Malmo mission XML string of the environment.
+        tuple(str, list[list[int]], ArenaLayout): A formated Malmo mission XML string of the environment, the 2D map of the play area and the layout of its rooms, doors, walls and chokepoints.
     """
 
     env = ""
@@ -587,10 +875,8 @@ def create_env(
                 <FlatWorldGenerator generatorString="3;7,2;1;"/>
                 <DrawingDecorator>"""
 
-    # reset blocks at arena
-    env += f"""
-                    <DrawCuboid x1='-1000' x2='1000' y1='1' y2='1' z1='-1000' z2='1000' type='grass'/>
-                    <DrawCuboid x1='-1000' x2='1000' y1='2' y2='4' z1='-1000' z2='1000' type='air'/>"""
+    # reset blocks at arena, only the area the arena and the previous mission could have touched
+    env += reset_cuboids(reset_region if reset_region is not None else arena_region(arena_size))
 
     # generate floor
     env += f"""
@@ -604,7 +890,7 @@ def create_env(
 
     # generate environment
     if env_type == "quadrant":
-        quadrant_env, env_map = gen_quadrant_env(
+        quadrant_env, env_map, layout = gen_quadrant_env(
             arena_size=arena_size,
             item_gen=item_gen,
             num_blocks=num_blocks,
@@ -622,7 +908,7 @@ def create_env(
     env += """
                 </DrawingDecorator>"""
 
-    return (env, env_map)
+    return (env, env_map, layout)
 
 
 if __name__ == "__main__":
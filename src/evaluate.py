@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from env import create_env
+from sweep import make_mission, pin_threads, read_json, write_json
+
+
+class ArenaCorpus:
+    """
+    Fixed set of arenas generated from consecutive seeds, so every checkpoint is evaluated on the same layouts.
+    """
+
+    def __init__(
+        self,
+        num_arenas: int = 20,
+        seed: int = 0,
+        arena_size: int = 10,
+        is_closed_arena: bool = True,
+        env_type: str = "quadrant",
+        item_gen: Dict[str, bool] = None,
+        num_blocks: int = 0,
+        num_stairs: int = 0,
+        **kwargs,
+    ):
+        self.num_arenas = num_arenas
+        self.seed = seed
+        self.arena_size = arena_size
+        self.is_closed_arena = is_closed_arena
+        self.env_type = env_type
+        self.item_gen = item_gen if item_gen is not None else {
+            "blocks_inside": False,
+            "blocks_outside": True,
+            "stairs_inside": False,
+            "stairs_outside": True,
+        }
+        self.num_blocks = num_blocks
+        self.num_stairs = num_stairs
+        self.kwargs = kwargs
+
+        self.arenas = []
+        for index in range(num_arenas):
+            random.seed(self.arena_seed(index))
+            self.arenas.append(create_env(
+                arena_size, is_closed_arena, env_type, self.item_gen, num_blocks, num_stairs, **kwargs
+            ))
+
+    def arena_seed(self, index: int):
+        return self.seed + index
+
+    def content_hash(self):
+        """
+        Hash of the generated arenas themselves, so a change to the generator also invalidates cached results.
+        """
+        digest = hashlib.sha256()
+        for env_xml, env_map, _ in self.arenas:
+            digest.update(env_xml.encode())
+            digest.update(json.dumps(env_map).encode())
+        return digest.hexdigest()
+
+
+def file_hash(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# checkpoint name that plays a team with the scripted agents instead of a model
+SCRIPTED = "scripted"
+
+
+# the scripted agents change with their source, so their results are cached per version of it
+SCRIPTED_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripted_agents.py")
+
+
+def checkpoint_hash(path: str):
+    return f"{SCRIPTED}:{file_hash(SCRIPTED_SOURCE)}" if path == SCRIPTED else file_hash(path)
+
+
+def checkpoint_path(path: str):
+    # SB3 appends .zip when saving, the mission loads either spelling
+    if path == SCRIPTED:
+        return path
+    if not os.path.exists(path) and os.path.exists(path + ".zip"):
+        return path + ".zip"
+    return path
+
+
+def stack_obs(obs_list: List[Dict[str, np.ndarray]]):
+    return {key: np.stack([obs[key] for obs in obs_list]) for key in obs_list[0]}
+
+
+def play_episode(mission, arena, seed: int, max_steps: int):
+    """
+    Plays one episode with both teams acting every step and their models predicting deterministically.
+
+    Returns:
+        dict: Whether a seeker found a hider, after how many steps, the seekers' coverage and the number of
+        agent steps taken.
+    """
+    from final import step_agents
+
+    random.seed(seed)
+    np.random.seed(seed)
+    mission.init_malmo(arenas=[arena])
+    hiders = list(mission.hider_agents.values())
+    seekers = list(mission.seeker_agents.values())
+    agents = hiders + seekers
+    obs = [agent.reset() for agent in agents]
+
+    found_at = None
+    num_steps = 0
+    for step in range(max_steps):
+        hider_actions, _ = mission.hider_model.predict(stack_obs(obs[:len(hiders)]), deterministic=True)
+        seeker_actions, _ = mission.seeker_model.predict(stack_obs(obs[len(hiders):]), deterministic=True)
+        results = step_agents(agents, list(hider_actions) + list(seeker_actions))
+        num_steps += 1
+        obs = [result[0] for result in results]
+        if any(referee.any_found() for referee in mission.referees):
+            found_at = step + 1
+            break
+        if any(result[2] for result in results):
+            break
+
+    return {
+        "found": found_at is not None,
+        "time_to_find": found_at,
+        "coverage": float(np.mean(mission.exploration.coverage())),
+        "agent_steps": num_steps * len(agents),
+    }
+
+
+_worker = {}
+
+
+def _init_worker(slots, backend, config, cores_per_worker, base_port, port_stride):
+    slot = slots.get()
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    pin_threads([cores[(slot * cores_per_worker + i) % len(cores)] for i in range(cores_per_worker)])
+    _worker["mission"] = make_mission(backend, {**config, "malmo_port": base_port + slot * port_stride})
+
+
+def _evaluate_arena(task):
+    index, arena, seed, max_steps = task
+    return index, play_episode(_worker["mission"], arena, seed, max_steps)
+
+
+class Evaluator:
+    """
+    Plays frozen hider and seeker checkpoints on a fixed arena corpus across worker processes.
+
+    Every worker builds one mission with its own cores and Malmo port range and plays the arenas it is handed.
+    Reports are cached on disk under the hash of the two checkpoints and the hash of the corpus, so evaluating
+    an unchanged pair again returns the cached report right away.
+    """
+
+    def __init__(
+        self,
+        corpus: ArenaCorpus,
+        num_workers: int = 1,
+        cores_per_worker: int = 1,
+        max_steps: int = 100,
+        backend: str = "malmo",
+        base_port: int = 10000,
+        port_stride: int = 10,
+        cache_dir: str = "evaluations",
+    ):
+        self.corpus = corpus
+        self.num_workers = num_workers
+        self.cores_per_worker = cores_per_worker
+        self.max_steps = max_steps
+        self.backend = backend
+        self.base_port = base_port
+        self.port_stride = port_stride
+        self.cache_dir = cache_dir
+
+    def cache_key(self, hider_path: str, seeker_path: str):
+        checkpoints = f"{checkpoint_hash(hider_path)}:{checkpoint_hash(seeker_path)}"
+        checkpoints_hash = hashlib.sha256(checkpoints.encode()).hexdigest()[:16]
+        key = f"{checkpoints_hash}_{self.corpus.content_hash()[:16]}_{self.max_steps}"
+        # results of the simulated clients must not be mistaken for Minecraft ones
+        return key if self.backend == "malmo" else f"{key}_{self.backend}"
+
+    def evaluate(self, hider_path: str = "sac_hider", seeker_path: str = "sac_seeker", use_cache: bool = True):
+        """
+        Either path can be "scripted" to play that team with the scripted agents, as a fixed reference opponent.
+
+        Returns:
+            dict: Win rate of the seekers, mean steps to find a hider, mean seeker coverage, agent steps per
+            second and the per arena results.
+        """
+        hider_path = checkpoint_path(hider_path)
+        seeker_path = checkpoint_path(seeker_path)
+        for path in (hider_path, seeker_path):
+            if path != SCRIPTED and not os.path.exists(path):
+                raise FileNotFoundError(f"No checkpoint at {path}")
+
+        cache_path = os.path.join(self.cache_dir, self.cache_key(hider_path, seeker_path) + ".json")
+        if use_cache:
+            cached = read_json(cache_path)
+            if cached is not None:
+                return cached
+
+        config = {
+            "arena_size": self.corpus.arena_size,
+            "closed_arena": self.corpus.is_closed_arena,
+            "env_type": self.corpus.env_type,
+            "num_arenas": 1,
+            "use_curriculum": False,
+            "record_trajectories": False,
+            "video_every_n_episodes": 0,
+        }
+        for team, path in (("hider", hider_path), ("seeker", seeker_path)):
+            if path == SCRIPTED:
+                config[f"{team}_policy"] = SCRIPTED
+            else:
+                config[f"{team}_model_path"] = os.path.abspath(path)
+        tasks = [
+            (index, arena, self.corpus.arena_seed(index), self.max_steps)
+            for index, arena in enumerate(self.corpus.arenas)
+        ]
+
+        ctx = mp.get_context("spawn")
+        slots = ctx.Queue()
+        for slot in range(self.num_workers):
+            slots.put(slot)
+        start_time = time.time()
+        with ctx.Pool(
+            self.num_workers,
+            initializer=_init_worker,
+            initargs=(slots, self.backend, config, self.cores_per_worker, self.base_port, self.port_stride),
+        ) as pool:
+            episodes = dict(pool.imap_unordered(_evaluate_arena, tasks))
+        wall_time = time.time() - start_time
+
+        episodes = [episodes[index] for index in range(len(tasks))]
+        times_to_find = [episode["time_to_find"] for episode in episodes if episode["found"]]
+        report = {
+            "hider": hider_path,
+            "seeker": seeker_path,
+            "num_arenas": len(episodes),
+            "win_rate": float(np.mean([episode["found"] for episode in episodes])),
+            "time_to_find": float(np.mean(times_to_find)) if times_to_find else None,
+            "coverage": float(np.mean([episode["coverage"] for episode in episodes])),
+            "steps_per_sec": sum(episode["agent_steps"] for episode in episodes) / wall_time,
+            "episodes": episodes,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_json(cache_path, report)
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate frozen hider and seeker checkpoints on a fixed arena corpus")
+    parser.add_argument("--hider", default="sac_hider")
+    parser.add_argument("--seeker", default="sac_seeker")
+    parser.add_argument("--arenas", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--arena-size", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-steps", type=int, default=100)
+    parser.add_argument("--backend", default="malmo")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    evaluator = Evaluator(
+        ArenaCorpus(args.arenas, args.seed, args.arena_size),
+        num_workers=args.workers,
+        max_steps=args.max_steps,
+        backend=args.backend,
+    )
+    report = evaluator.evaluate(args.hider, args.seeker, use_cache=not args.no_cache)
+    print(json.dumps({key: value for key, value in report.items() if key != "episodes"}, indent=2))
@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class ExplorationTracker:
+    """
+    Tracks which arena cells each seeker has visited, one flag per (x, z) cell.
+
+    All trackers live in a single array of shape (num_trackers, arena_size, arena_size) indexed as
+    [tracker][z][x], matching play_arena. A tracker is usually one seeker, but nothing stops trackers from
+    belonging to seekers of different arenas as long as the arenas are the same size. Resetting clears the
+    flags in place instead of allocating new storage.
+    """
+
+    def __init__(self, num_trackers: int, arena_size: int, walkable=None):
+        """
+        Arguments:
+            num_trackers (int):
+                Number of independent visit maps, usually one per seeker.
+            arena_size (int):
+                Size of the square play area.
+            walkable (array-like):
+                Boolean mask of shape (arena_size, arena_size) or (num_trackers, arena_size, arena_size) of the
+                cells that count towards coverage. Defaults to every cell.
+        """
+        self.num_trackers = num_trackers
+        self.arena_size = arena_size
+        self.visited = np.zeros((num_trackers, arena_size, arena_size), dtype=bool)
+        self.walkable = np.ones_like(self.visited)
+        if walkable is not None:
+            self.set_walkable(walkable)
+
+    def resize(self, arena_size: int):
+        """
+        Switches every tracker to a new arena size. Storage is only reallocated when the size actually changes.
+        """
+        if arena_size == self.arena_size:
+            return
+        self.arena_size = arena_size
+        self.visited = np.zeros((self.num_trackers, arena_size, arena_size), dtype=bool)
+        self.walkable = np.ones_like(self.visited)
+
+    def set_walkable(self, walkable, trackers=slice(None)):
+        self.walkable[trackers] = np.asarray(walkable, dtype=bool)
+
+    def reset(self, trackers=slice(None), walkable=None):
+        """
+        Clears the visit maps of the given trackers, optionally switching them to a new arena layout.
+        """
+        self.visited[trackers] = False
+        if walkable is not None:
+            self.set_walkable(walkable, trackers)
+
+    def visit(self, tracker: int, x: int, z: int):
+        """
+        Marks a cell as visited.
+
+        Returns:
+            bool: True if the cell hadn't been visited before. Cells outside the arena are never new.
+        """
+        if not (0 <= x < self.arena_size and 0 <= z < self.arena_size):
+            return False
+        if self.visited[tracker, z, x]:
+            return False
+        self.visited[tracker, z, x] = True
+        return True
+
+    def visit_many(self, trackers, x, z):
+        """
+        Vectorized visit for arrays of trackers and cells.
+
+        Returns:
+            np.ndarray: Boolean array, True where a cell was visited for the first time.
+        """
+        trackers, x, z = np.broadcast_arrays(np.asarray(trackers), np.asarray(x), np.asarray(z))
+        inside = (x >= 0) & (x < self.arena_size) & (z >= 0) & (z < self.arena_size)
+        new = np.zeros(trackers.shape, dtype=bool)
+        new[inside] = ~self.visited[trackers[inside], z[inside], x[inside]]
+        self.visited[trackers[inside], z[inside], x[inside]] = True
+        return new
+
+    def coverage(self, trackers=slice(None)):
+        """
+        Fraction of walkable cells visited by each tracker.
+
+        Returns:
+            np.ndarray: Array of shape (num_trackers,), or a float when a single tracker is passed.
+        """
+        visited = (self.visited[trackers] & self.walkable[trackers]).sum(axis=(-2, -1))
+        walkable = np.maximum(self.walkable[trackers].sum(axis=(-2, -1)), 1)
+        return visited / walkable
+
+    def frontier(self, trackers=slice(None)):
+        """
+        Unvisited walkable cells next to a visited cell, shape (..., arena_size, arena_size).
+        """
+        visited = self.visited[trackers]
+        near_visited = np.zeros_like(visited)
+        near_visited[..., 1:, :] |= visited[..., :-1, :]
+        near_visited[..., :-1, :] |= visited[..., 1:, :]
+        near_visited[..., :, 1:] |= visited[..., :, :-1]
+        near_visited[..., :, :-1] |= visited[..., :, 1:]
+        return near_visited & ~visited & self.walkable[trackers]
+
+    def frontier_distance(self, trackers, x, z):
+        """
+        Straight line distance from positions to the closest frontier cell of their tracker.
+
+        Arguments:
+            trackers (array-like):
+                Tracker index of every position, shape (N,).
+            x (array-like):
+                World x of every position, shape (N,).
+            z (array-like):
+                World z of every position, shape (N,).
+
+        Returns:
+            np.ndarray: Distances of shape (N,), inf for trackers without a frontier.
+        """
+        trackers = np.atleast_1d(np.asarray(trackers))
+        x = np.atleast_1d(np.asarray(x, dtype=np.float64))
+        z = np.atleast_1d(np.asarray(z, dtype=np.float64))
+        frontier = self.frontier(trackers)
+
+        cell_z, cell_x = np.mgrid[0:self.arena_size, 0:self.arena_size]
+        dist = np.hypot(cell_x + 0.5 - x[:, None, None], cell_z + 0.5 - z[:, None, None])
+        return np.where(frontier, dist, np.inf).min(axis=(-2, -1))
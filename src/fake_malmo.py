@@ -0,0 +1,712 @@
+import enum
+import heapq
+import json
+import math
+import sys
+import threading
+import time
+import types
+import xml.etree.ElementTree as ET
+from typing import NamedTuple
+
+import numpy as np
+
+from sim_kernels import EYE_HEIGHT, FLOOR_Y, HIT_AGENT, HIT_BLOCK, HIT_FLOOR
+from simulator import REACH, Simulator
+
+# Minecraft runs at 20 ticks per second and Malmo sends an observation every tick
+TICK_SECONDS = 0.05
+# the world is built from the floor layer up to the top of the walls, y = 1, 2 and 3
+LAYERS = (1, 2, 3)
+# blocks drawn outside the arenas are never reached, a few cells around them are enough to walk and look around
+WORLD_MARGIN = 2
+# FlatWorldGenerator's top layer, under everything no drawing command covered
+DEFAULT_FLOOR = "grass"
+
+
+class Faults(NamedTuple):
+    """
+    Latency and failures the simulated clients inject. Rates are expected events per client per second.
+    """
+    # seconds between the last agent joining a mission and the mission beginning
+    startup_delay: float = 0.0
+    # seconds before a sent command takes effect
+    command_latency: float = 0.0
+    # probability that an observation gets lost
+    drop_rate: float = 0.0
+    # startMission calls answered with MISSION_SERVER_WARMING_UP before the server accepts missions
+    warming_up: int = 0
+    # probability that a startMission call fails with MISSION_INSUFFICIENT_CLIENTS_AVAILABLE
+    start_failure_rate: float = 0.0
+    # world state errors reported by a running client
+    error_rate: float = 0.0
+    # running clients that stop sending observations for the rest of the mission
+    hang_rate: float = 0.0
+    seed: int = None
+
+
+### MalmoPython API ###
+
+class MissionErrorCode(enum.IntEnum):
+    MISSION_BAD_ROLE_REQUEST = 0
+    MISSION_BAD_VIDEO_REQUEST = 1
+    MISSION_ALREADY_RUNNING = 2
+    MISSION_INSUFFICIENT_CLIENTS_AVAILABLE = 3
+    MISSION_TRANSMISSION_ERROR = 4
+    MISSION_SERVER_WARMING_UP = 5
+    MISSION_SERVER_NOT_FOUND = 6
+    MISSION_NO_COMMAND_PORT = 7
+    MISSION_BAD_INSTALLATION = 8
+    MISSION_CAN_NOT_KILL_BUSY_CLIENT = 9
+    MISSION_CAN_NOT_KILL_IRREPLACEABLE_CLIENT = 10
+    MISSION_VERSION_MISMATCH = 11
+
+
+class FrameType(enum.IntEnum):
+    VIDEO = 0
+    DEPTH_MAP = 1
+    LUMINANCE = 2
+    COLOUR_MAP = 3
+
+
+class MissionErrorDetails(NamedTuple):
+    errorCode: MissionErrorCode
+    message: str
+
+
+class MissionException(Exception):
+
+    def __init__(self, message: str, error_code: MissionErrorCode):
+        super().__init__(message)
+        self.message = message
+        self.details = MissionErrorDetails(error_code, message)
+
+
+class TimestampedString(NamedTuple):
+    timestamp: float
+    text: str
+
+
+class TimestampedReward(NamedTuple):
+    timestamp: float
+    value: float
+
+    def getValue(self):
+        return self.value
+
+
+class WorldState:
+
+    def __init__(self, has_mission_begun=False, is_mission_running=False, observations=(), errors=(), num_observations=0):
+        self.has_mission_begun = has_mission_begun
+        self.is_mission_running = is_mission_running
+        self.observations = list(observations)
+        self.number_of_observations_since_last_state = num_observations
+        self.rewards = []
+        self.number_of_rewards_since_last_state = 0
+        self.video_frames = []
+        self.number_of_video_frames_since_last_state = 0
+        self.errors = list(errors)
+        self.mission_control_messages = []
+
+
+class ClientInfo:
+
+    def __init__(self, ip_address: str = "127.0.0.1", control_port: int = 10000, command_port: int = 0):
+        self.ip_address = ip_address
+        self.control_port = control_port
+        self.command_port = command_port
+
+
+class ClientPool:
+
+    def __init__(self):
+        self.clients = []
+
+    def add(self, client_info: ClientInfo):
+        self.clients.append(client_info)
+
+
+class MissionRecordSpec:
+    """
+    Accepted for compatibility, the simulated clients don't record anything.
+    """
+
+    def __init__(self, destination: str = ""):
+        self.destination = destination
+        self.mp4 = None
+
+    def setDestination(self, destination: str):
+        self.destination = destination
+
+    def recordMP4(self, *args):
+        self.mp4 = args
+
+    def isRecording(self):
+        return bool(self.destination)
+
+
+class MissionSpec:
+
+    def __init__(self, xml: str, validate: bool = True):
+        self.xml = xml
+        try:
+            self.root = ET.fromstring(xml.strip())
+        except ET.ParseError as e:
+            raise RuntimeError(f"Mission XML is not valid: {e}") from e
+        self.viewpoint = 0
+        self.video = None
+
+    def setViewpoint(self, viewpoint: int):
+        self.viewpoint = viewpoint
+
+    def requestVideo(self, width: int, height: int):
+        self.video = (width, height)
+
+    def getAsXML(self, pretty_print: bool = False):
+        return self.xml
+
+
+class AgentHost:
+    """
+    Simulated agent host. Missions run in a Simulator instead of Minecraft.
+
+    A host stays with the server it was created for, the one configure() set up last unless one is passed, so
+    the hosts of a mission keep finding it and its faults when configure() is called again later.
+    """
+
+    def __init__(self, server=None):
+        self.server = server if server is not None else _server
+        self.mission = None
+        self.role = None
+
+    def startMission(self, mission_spec, client_pool=None, record_spec=None, role: int = 0, experiment_id: str = ""):
+        # single agent missions pass only the mission and its record spec
+        if isinstance(client_pool, MissionRecordSpec):
+            client_pool, record_spec = None, client_pool
+        if self.mission is not None and self.mission.is_open():
+            raise MissionException("A mission is already running", MissionErrorCode.MISSION_ALREADY_RUNNING)
+        self.mission = self.server.join(self, mission_spec, client_pool, role, experiment_id)
+        self.role = role
+
+    def sendCommand(self, command: str):
+        if self.mission is not None:
+            self.mission.send(self.role, command)
+
+    def getWorldState(self):
+        if self.mission is None:
+            return WorldState()
+        return self.mission.world_state(self.role, consume=True)
+
+    def peekWorldState(self):
+        if self.mission is None:
+            return WorldState()
+        return self.mission.world_state(self.role, consume=False)
+
+    def parse(self, args):
+        pass
+
+    def getUsage(self):
+        return "Simulated MalmoPython.AgentHost"
+
+    def receivedArgument(self, name: str):
+        return False
+
+
+### Simulated Server ###
+
+class AgentSection(NamedTuple):
+    """
+    What the simulated mission needs to know of an <AgentSection>.
+    """
+    name: str
+    spectator: bool
+    placement: tuple
+    dirt: int
+    full_stats: bool
+    ray: bool
+    # (name, (min x, min y, min z), (max x, max y, max z)) of every ObservationFromGrid grid
+    grids: tuple
+    # (name, x range, y range, z range) of every ObservationFromNearbyEntities range
+    entity_ranges: tuple
+
+
+def _tag(element):
+    return element.tag.rsplit("}", 1)[-1]
+
+
+def _children(element, tag):
+    return [child for child in element.iter() if _tag(child) == tag]
+
+
+def parse_agent_sections(root):
+    sections = []
+    for section in _children(root, "AgentSection"):
+        name = next(child.text for child in _children(section, "Name")).strip()
+        placement = _children(section, "Placement")[0].attrib
+        dirt = sum(int(item.get("quantity", 1)) for item in _children(section, "InventoryItem") if item.get("type") == "dirt")
+        grids = tuple(
+            (grid.get("name"), *(tuple(int(_children(grid, end)[0].get(axis)) for axis in "xyz") for end in ("min", "max")))
+            for grid in _children(section, "Grid")
+        )
+        entity_ranges = tuple(
+            (entity_range.get("name"), *(float(entity_range.get(f"{axis}range")) for axis in "xyz"))
+            for entity_range in _children(section, "Range")
+        )
+        sections.append(AgentSection(
+            name=name,
+            spectator=section.get("mode") == "Spectator",
+            placement=tuple(float(placement.get(key, 0)) for key in ("x", "y", "z", "yaw", "pitch")),
+            dirt=dirt,
+            full_stats=len(_children(section, "ObservationFromFullStats")) > 0,
+            ray=len(_children(section, "ObservationFromRay")) > 0,
+            grids=grids,
+            entity_ranges=entity_ranges,
+        ))
+    return sections
+
+
+def parse_drawing(root):
+    """
+    Drawing commands of the mission as (x1, x2, y1, y2, z1, z2, type), in the order Malmo draws them. Items are
+    entities and not part of the block world.
+    """
+    commands = []
+    decorators = _children(root, "DrawingDecorator")
+    for command in (decorators[0] if decorators else []):
+        tag = _tag(command)
+        if tag == "DrawCuboid":
+            x1, x2, y1, y2, z1, z2 = (int(command.get(key)) for key in ("x1", "x2", "y1", "y2", "z1", "z2"))
+            commands.append((min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2), min(z1, z2), max(z1, z2), command.get("type")))
+        elif tag == "DrawBlock":
+            x, y, z = (int(command.get(key)) for key in ("x", "y", "z"))
+            commands.append((x, x, y, y, z, z, command.get("type")))
+    return commands
+
+
+def block_value(block_type: str):
+    """
+    play_arena value of a block type, what the Simulator treats it as.
+    """
+    if block_type == "air":
+        return 0
+    if block_type == "dirt":
+        return 2
+    if block_type.endswith("_stairs"):
+        return 3
+    return 1
+
+
+class SimulatedMission:
+    """
+    A mission of the simulated server: the agents that joined it, the block world drawn by its XML and the
+    Simulator the agents walk in. Every call brings the simulator up to the current time first, so agents move
+    for as long as their commands were actually in effect, like the continuous movement of Minecraft.
+    """
+
+    def __init__(self, server, mission_spec, experiment_id: str):
+        self.server = server
+        self.faults = server.faults
+        self.rng = server.rng
+        self.experiment_id = experiment_id
+        self.lock = threading.Lock()
+        self.sections = parse_agent_sections(mission_spec.root)
+        self.build_world(parse_drawing(mission_spec.root))
+
+        # spectators fly above the arenas, only the other agents walk in the simulator
+        self.agent_index = {}
+        for role, section in enumerate(self.sections):
+            if not section.spectator:
+                self.agent_index[role] = len(self.agent_index)
+        self.sim = Simulator(
+            self.type_values[self.layers[LAYERS.index(2)]],
+            len(self.agent_index),
+            origin=self.origin,
+            dirt=[self.sections[role].dirt for role in self.agent_index],
+        )
+        for role, agent in self.agent_index.items():
+            x, _, z, yaw, pitch = self.sections[role].placement
+            self.sim.place_agent(agent, x, z, yaw, pitch)
+            # Minecraft pushes an entity spawned inside a block out of it, the simulator would keep it stuck
+            if self.sim.stuck(agent):
+                self.sim.place_agent(agent, math.floor(x) + 0.5, math.floor(z) + 0.5, yaw, pitch)
+
+        ### Mission State ###
+        self.hosts = [None for _ in self.sections]
+        self.begin_time = None
+        self.clock = None
+        self.ended = False
+        # (due time, order, role, command) of the sent commands that didn't take effect yet
+        self.pending = []
+        self.num_sent = 0
+
+        ### Client State ###
+        self.last_ticks = [0 for _ in self.sections]
+        self.errors = [[] for _ in self.sections]
+        self.hung = [False for _ in self.sections]
+
+    def build_world(self, drawing):
+        """
+        Replays the drawing commands onto a stack of block type grids covering LAYERS, around every arena.
+        """
+        solid = [command for command in drawing if command[6] not in ("air", DEFAULT_FLOOR) and command[3] >= LAYERS[0] and command[2] <= LAYERS[-1]]
+        xs = [x for command in solid for x in command[:2]] + [section.placement[0] for section in self.sections if not section.spectator]
+        zs = [z for command in solid for z in command[4:6]] + [section.placement[2] for section in self.sections if not section.spectator]
+        x1, z1 = math.floor(min(xs, default=0)) - WORLD_MARGIN, math.floor(min(zs, default=0)) - WORLD_MARGIN
+        x2, z2 = math.floor(max(xs, default=0)) + WORLD_MARGIN, math.floor(max(zs, default=0)) + WORLD_MARGIN
+        self.origin = (x1, z1)
+
+        self.type_names = ["air", DEFAULT_FLOOR]
+        self.type_ids = {name: i for i, name in enumerate(self.type_names)}
+        self.layers = np.zeros((len(LAYERS), z2 - z1 + 1, x2 - x1 + 1), dtype=np.int16)
+        self.layers[0] = self.type_ids[DEFAULT_FLOOR]
+        for cx1, cx2, cy1, cy2, cz1, cz2, block_type in drawing:
+            layer1, layer2 = max(cy1, LAYERS[0]) - LAYERS[0], min(cy2, LAYERS[-1]) - LAYERS[0]
+            if layer1 > layer2:
+                continue
+            self.layers[
+                layer1:layer2 + 1,
+                max(cz1 - z1, 0):max(cz2 - z1 + 1, 0),
+                max(cx1 - x1, 0):max(cx2 - x1 + 1, 0),
+            ] = self.type_id(block_type)
+
+    def type_id(self, block_type: str):
+        if block_type not in self.type_ids:
+            self.type_ids[block_type] = len(self.type_names)
+            self.type_names.append(block_type)
+        return self.type_ids[block_type]
+
+    @property
+    def type_values(self):
+        return np.array([block_value(name) for name in self.type_names], dtype=np.int8)
+
+    def join(self, role: int, host: AgentHost, now: float):
+        if not 0 <= role < len(self.sections) or self.hosts[role] is not None:
+            raise MissionException(f"Role {role} can't join this mission", MissionErrorCode.MISSION_BAD_ROLE_REQUEST)
+        self.hosts[role] = host
+        if all(joined is not None for joined in self.hosts):
+            self.begin_time = now + self.faults.startup_delay
+
+    def is_open(self):
+        """
+        Whether the mission didn't end yet, after carrying out the commands that came due, like a quit.
+        """
+        with self.lock:
+            self.sync(time.time())
+            return not self.ended
+
+    def has_begun(self, now: float):
+        return self.begin_time is not None and now >= self.begin_time
+
+    def end(self):
+        self.ended = True
+        self.server.forget(self)
+
+    ### Commands ###
+
+    def send(self, role: int, command: str):
+        with self.lock:
+            now = time.time()
+            self.sync(now)
+            if self.ended:
+                return
+            if not self.has_begun(now):
+                # nothing runs yet that a command could take effect on, a quit just calls off the start
+                if command == "quit":
+                    self.end()
+                return
+            heapq.heappush(self.pending, (now + self.faults.command_latency, self.num_sent, role, command))
+            self.num_sent += 1
+
+    def apply(self, role: int, command: str):
+        verb, _, value = command.partition(" ")
+        if verb == "quit":
+            # ServerQuitWhenAnyAgentFinishes, one agent quitting ends everyone's mission
+            self.end()
+            return
+        if role not in self.agent_index:
+            return
+        agent = self.agent_index[role]
+        try:
+            value = float(value)
+        except ValueError:
+            return
+        if verb in ("move", "turn", "pitch"):
+            self.sim.set_commands(agent, **{verb: value})
+        elif verb in ("use", "attack") and value > 0:
+            cell = self.sim.interact(agent, use=verb == "use")
+            if cell is not None:
+                x, z = cell
+                self.layers[LAYERS.index(2), z, x] = self.type_id("dirt" if self.sim.grid[z, x] == 2 else "air")
+
+    def sync(self, now: float):
+        """
+        Advances the simulator to now, carrying out every command that came due on the way, and rolls the faults.
+        """
+        if self.ended or not self.has_begun(now):
+            return
+        if self.clock is None:
+            self.clock = self.begin_time
+        elapsed = now - self.clock
+        while self.pending and self.pending[0][0] <= now and not self.ended:
+            due, _, role, command = heapq.heappop(self.pending)
+            self.advance_to(due)
+            self.apply(role, command)
+        self.advance_to(now)
+
+        if elapsed > 0:
+            for role in range(len(self.sections)):
+                if self.rng.random() < 1.0 - math.exp(-self.faults.error_rate * elapsed):
+                    self.errors[role].append(TimestampedString(now, "Simulated client error"))
+                if self.rng.random() < 1.0 - math.exp(-self.faults.hang_rate * elapsed):
+                    self.hung[role] = True
+
+    def advance_to(self, when: float):
+        if when > self.clock:
+            self.sim.advance(when - self.clock)
+            self.clock = when
+
+    ### Observations ###
+
+    def world_state(self, role: int, consume: bool):
+        with self.lock:
+            now = time.time()
+            self.sync(now)
+            begun = self.has_begun(now)
+            running = begun and not self.ended
+            errors = list(self.errors[role])
+            observations = []
+            num_observations = 0
+            if running and not self.hung[role] and role in self.agent_index:
+                tick = int((now - self.begin_time) / TICK_SECONDS)
+                num_observations = int(self.rng.binomial(max(tick - self.last_ticks[role], 0), 1.0 - self.faults.drop_rate))
+                if num_observations > 0:
+                    # only the latest observation is built, it is the only one anybody reads
+                    observations.append(TimestampedString(now, json.dumps(self.observation(role))))
+                if consume:
+                    self.last_ticks[role] = tick
+            if consume:
+                self.errors[role] = []
+            return WorldState(begun, running, observations, errors, num_observations)
+
+    def observation(self, role: int):
+        section = self.sections[role]
+        agent = self.agent_index[role]
+        x, y, z, yaw, pitch = (float(v) for v in self.sim.world_pose(agent))
+        obs = {}
+        if section.full_stats:
+            obs.update({
+                "Name": section.name, "XPos": x, "YPos": y, "ZPos": z, "Yaw": yaw, "Pitch": pitch,
+                "Life": 20.0, "TimeAlive": int(self.sim.time / TICK_SECONDS),
+            })
+        if section.ray:
+            line_of_sight = self.line_of_sight(agent)
+            if line_of_sight is not None:
+                obs["LineOfSight"] = line_of_sight
+        for name, low, high in section.grids:
+            obs[name] = self.grid_observation(x, y, z, low, high)
+        for name, x_range, y_range, z_range in section.entity_ranges:
+            obs[name] = [
+                entity for entity in self.entities()
+                if abs(entity["x"] - x) <= x_range and abs(entity["y"] - y) <= y_range and abs(entity["z"] - z) <= z_range
+            ]
+        return obs
+
+    def line_of_sight(self, agent: int):
+        kinds, cells, agents, distances = self.sim.cursors()
+        kind = kinds[agent]
+        if kind not in (HIT_BLOCK, HIT_FLOOR, HIT_AGENT):
+            return None
+        x, _, z, yaw, pitch = self.sim.world_pose(agent)
+        heading, tilt = math.radians(yaw), math.radians(pitch)
+        distance = float(distances[agent])
+        hit = (
+            x - math.sin(heading) * math.cos(tilt) * distance,
+            FLOOR_Y + EYE_HEIGHT - math.sin(tilt) * distance,
+            z + math.cos(heading) * math.cos(tilt) * distance,
+        )
+        if kind == HIT_AGENT:
+            roles = list(self.agent_index)
+            hit_type, block_type = "entity", self.sections[roles[agents[agent]]].name
+        else:
+            cell_x, cell_z = cells[agent, :2]
+            layer = LAYERS.index(1 if kind == HIT_FLOOR else 2)
+            hit_type, block_type = "block", self.type_names[self.layers[layer, cell_z, cell_x]]
+        return {
+            "hitType": hit_type, "type": block_type, "x": hit[0], "y": hit[1], "z": hit[2],
+            "distance": distance, "inRange": distance <= REACH,
+        }
+
+    def grid_observation(self, x: float, y: float, z: float, low, high):
+        """
+        Block types of an ObservationFromGrid around the agent, x fastest, then z, then y like Malmo.
+        """
+        ys, zs, xs = np.meshgrid(
+            *(np.arange(low[axis], high[axis] + 1) + math.floor(centre) for axis, centre in ((1, y), (2, z), (0, x))),
+            indexing="ij",
+        )
+        layers = ys - LAYERS[0]
+        rows, cols = zs - self.origin[1], xs - self.origin[0]
+        inside = (layers >= 0) & (layers < len(LAYERS)) & (rows >= 0) & (rows < self.layers.shape[1]) & (cols >= 0) & (cols < self.layers.shape[2])
+        ids = np.full(ys.shape, self.type_ids["air"], dtype=np.int16)
+        ids[ys == LAYERS[0]] = self.type_ids[DEFAULT_FLOOR]
+        ids[inside] = self.layers[layers[inside], rows[inside], cols[inside]]
+        return [self.type_names[i] for i in ids.ravel()]
+
+    def entities(self):
+        entities = []
+        for role, agent in self.agent_index.items():
+            x, y, z, yaw, pitch = (float(v) for v in self.sim.world_pose(agent))
+            name = self.sections[role].name
+            entities.append({"name": name, "id": name, "x": x, "y": y, "z": z, "yaw": yaw, "pitch": pitch, "life": 20.0})
+        return entities
+
+
+class SimulatedServer:
+    """
+    Stands in for the Minecraft clients: hands out missions by experiment id and injects the start up faults.
+    """
+
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.rng = np.random.default_rng(faults.seed)
+        self.lock = threading.Lock()
+        self.missions = {}
+        self.warming_up = faults.warming_up
+
+    def join(self, host: AgentHost, mission_spec: MissionSpec, client_pool, role: int, experiment_id: str):
+        with self.lock:
+            if self.warming_up > 0:
+                self.warming_up -= 1
+                raise MissionException("Server is warming up", MissionErrorCode.MISSION_SERVER_WARMING_UP)
+            if self.rng.random() < self.faults.start_failure_rate:
+                raise MissionException("Simulated client unavailable", MissionErrorCode.MISSION_INSUFFICIENT_CLIENTS_AVAILABLE)
+            if role == 0:
+                mission = SimulatedMission(self, mission_spec, experiment_id)
+                if client_pool is not None and len(client_pool.clients) < len(mission.sections):
+                    raise MissionException(
+                        f"{len(mission.sections)} clients needed, the pool has {len(client_pool.clients)}",
+                        MissionErrorCode.MISSION_INSUFFICIENT_CLIENTS_AVAILABLE,
+                    )
+                self.missions[experiment_id] = mission
+            elif experiment_id in self.missions:
+                mission = self.missions[experiment_id]
+            else:
+                raise MissionException(f"No mission with experiment id {experiment_id}", MissionErrorCode.MISSION_SERVER_NOT_FOUND)
+        with mission.lock:
+            mission.join(role, host, time.time())
+        return mission
+
+    def forget(self, mission: SimulatedMission):
+        with self.lock:
+            if self.missions.get(mission.experiment_id) is mission:
+                del self.missions[mission.experiment_id]
+
+
+_server = SimulatedServer(Faults())
+
+
+def configure(**faults):
+    """
+    Replaces the simulated server with one injecting the given Faults for agent hosts created from now on. Hosts
+    created before keep their server, with its missions and faults.
+    """
+    global _server
+    _server = SimulatedServer(Faults(**faults))
+    return _server.faults
+
+
+def install():
+    """
+    Makes `from malmo import MalmoPython` and `import MalmoPython` load this module instead of Malmo. Has to run
+    before the modules talking to Malmo are imported, those keep the module they imported first.
+    """
+    this = sys.modules[__name__]
+    current = sys.modules.get("MalmoPython", getattr(sys.modules.get("malmo"), "MalmoPython", this))
+    if current is not this:
+        raise RuntimeError("MalmoPython was already imported, install the simulated clients before importing it")
+    package = types.ModuleType("malmo")
+    package.MalmoPython = this
+    sys.modules["malmo"] = package
+    sys.modules["MalmoPython"] = this
+    return this
+
+
+def example_mission_xml(num_agents: int, arena_size: int = 10, seed: int = 0):
+    """
+    Mission XML of a generated arena with num_agents agents on free cells, the first one holding dirt.
+    """
+    import random
+
+    from env import create_env
+
+    random.seed(seed)
+    item_gen = {"blocks_inside": False, "blocks_outside": True, "stairs_inside": False, "stairs_outside": True}
+    env, play_arena, _ = create_env(arena_size, True, "quadrant", item_gen, 4, 2)
+    free = np.argwhere(np.asarray(play_arena) == 0)
+    spawns = free[np.random.default_rng(seed).choice(len(free), num_agents, replace=False)]
+    sections = "".join(f"""
+            <AgentSection mode="Survival">
+                <Name>agent_{i}</Name>
+                <AgentStart>
+                    <Placement x="{x + 0.5}" y="2" z="{z + 0.5}"/>
+                    <Inventory>
+                        <InventoryItem slot="0" type="dirt" quantity="{8 if i == 0 else 0}"/>
+                    </Inventory>
+                </AgentStart>
+                <AgentHandlers>
+                    <ContinuousMovementCommands turnSpeedDegs="360"/>
+                    <ObservationFromFullStats/>
+                    <ObservationFromRay/>
+                </AgentHandlers>
+            </AgentSection>""" for i, (z, x) in enumerate(spawns))
+    return f"""<?xml version="1.0" encoding="UTF-8" standalone="no" ?>
+        <Mission xmlns="http://ProjectMalmo.microsoft.com">
+            <About>
+                <Summary>Simulated Hide and Seek</Summary>
+            </About>
+            <ServerSection>{env}
+                    <ServerQuitWhenAnyAgentFinishes/>
+                </ServerHandlers>
+            </ServerSection>{sections}
+        </Mission>"""
+
+
+def installed():
+    return sys.modules.get("MalmoPython") is sys.modules[__name__]
+
+
+def benchmark_start(num_missions: int = 5, num_agents: int = 3, **faults):
+    """
+    Starts missions through safeStartMission and safeWaitForStart on a server of their own with the given
+    Faults, the server configure() set up is left alone. The simulated clients have to be installed first.
+
+    Returns:
+        dict: Mean seconds per mission start and the number of starts that raised MissionStartError.
+    """
+    if not installed():
+        raise RuntimeError("benchmark_start needs the simulated clients, call install() before importing Malmo code")
+    from multi_agent_helper import MissionStartError, safeStartMission, safeWaitForStart
+
+    server = SimulatedServer(Faults(**faults))
+    mission_spec = MissionSpec(example_mission_xml(num_agents), True)
+    client_pool = ClientPool()
+    for port in range(10000, 10000 + num_agents):
+        client_pool.add(ClientInfo("127.0.0.1", port))
+    agent_hosts = [AgentHost(server) for _ in range(num_agents)]
+    failures = 0
+    start = time.perf_counter()
+    for mission in range(num_missions):
+        try:
+            for role, agent_host in enumerate(agent_hosts):
+                safeStartMission(agent_host, mission_spec, client_pool, MissionRecordSpec(), role, f"benchmark_{mission}")
+            safeWaitForStart(agent_hosts, time_out=10)
+        except MissionStartError:
+            failures += 1
+        agent_hosts[0].sendCommand("quit")
+    return {"seconds_per_start": (time.perf_counter() - start) / num_missions, "failures": failures}
+
+
+if __name__ == "__main__":
+    install()
+    print(benchmark_start(startup_delay=0.5, start_failure_rate=0.2, seed=0))
@@ -3,7 +3,7 @@ import random
 import time
 import uuid
 import json
-import math
+from copy import deepcopy
 
 import gym
 
@@ -13,15 +13,53 @@ except:
     import MalmoPython
 from gym.spaces import Box, Dict
 from gym.vector.utils import batch_space
-from stable_baselines3 import A2C, SAC
+from stable_baselines3 import A2C
 from stable_baselines3.common.vec_env import DummyVecEnv
 
-from env import create_env
-from multi_agent_helper import safeStartMission, safeWaitForStart
+from malmo_commands import interact_command, move_commands, stop_commands
+from env import (
+    FULL_RESET_REGION, INTERACT_REACH, ResetRegion, agent_placement, create_env, create_tiled_env, gen_agent_positions,
+    tile_offsets, tiled_region, with_reset_region,
+)
+from mission_supervisor import ClientHungError, MissionSupervisor
+import artifact_cache
+from artifact_cache import content_hash, shared_cache
+from trajectory_recorder import TrajectoryRecorder
+from agent_distances import HiderDistanceTable
+from exploration import ExplorationTracker
+from distance_field import get_distance_field
+from scripted_agents import ScriptedTeam
+from curriculum import ArenaCache, CurriculumScheduler
+from referee import DEFAULT_REWARD_WEIGHTS, Referee
+from prioritized_replay import PrioritizedDictReplayBuffer, PrioritizedSAC
+from trajectory_dataset import TrajectoryDataset, fill_replay_buffer, pretrain_behaviour_cloning, pretrain_offline
+
+# seekers observe the distance to their closest hider up to the range of ObservationFromNearbyEntities
+MAX_CLOSEST = 60
+
+# parameters of HideAndSeekMission a config may override, see HideAndSeekMission.apply_config
+TUNABLE_PARAMETERS = frozenset({
+    # arena
+    "arena_size", "closed_arena", "env_type", "gen_num_blocks", "gen_num_stairs", "item_gen", "item_mode",
+    "artifact_cache_dir", "num_arenas",
+    # curriculum
+    "use_curriculum",
+    # agents
+    "obs_size", "num_hiders", "num_seekers", "max_episode_steps", "reward_weights",
+    # recording
+    "record_trajectories", "trajectory_dir", "video_every_n_episodes",
+    # warm start
+    "warm_start_dir", "warm_start_gradient_steps", "warm_start_bc_epochs",
+    # training
+    "num_runs", "seeker_phase_duration", "hider_phase_duration", "learning_starts", "target_model",
+    "prioritized_replay", "hider_model_path", "seeker_model_path", "hider_policy", "seeker_policy",
+    # malmo
+    "malmo_port", "malmo_spare_ports", "observation_deadline", "full_reset_first",
+})
 
 class SingleAgentEnv(gym.Env):
 
-    def __init__(self, agent_id, obs_size, init_malmo_callback, seeker_found_hider_callback, hider = True, max_steps=40):
+    def __init__(self, agent_id, obs_size, init_malmo_callback, referee, hider = True, max_steps=40, recorder=None, distance_table=None, exploration_tracker=None, tracker_index=0, supervisor=None, arena_index=0, origin=(0, 0), cells_callback=None):
         ### Env Parameters ###
         self.obs_size = obs_size
         self.agent_id = agent_id
@@ -34,32 +72,60 @@ class SingleAgentEnv(gym.Env):
         }
         
         if not self.hider:
-            obs_dict["closest"] = Box(0, 60, shape = (1,), dtype=np.float32)
+            obs_dict["closest"] = Box(0, MAX_CLOSEST, shape = (1,), dtype=np.float32)
         self.observation_space = Dict(obs_dict)
         
         ### Malmo Parameters ###
         self.agent_host = MalmoPython.AgentHost()
         self.init_malmo = init_malmo_callback
-        self.seeker_found_hider = seeker_found_hider_callback
+        self.referee = referee
+        self.recorder = recorder
+        self.distance_table = distance_table if distance_table is not None else HiderDistanceTable()
+        self.exploration_tracker = exploration_tracker
+        self.tracker_index = tracker_index
+        self.supervisor = supervisor
+        # arena the agent plays in and the world (x, z) of that arena's corner when several arenas share a world
+        self.arena_index = arena_index
+        self.origin = origin
+        # called with the arena index and the cells the obs grid shows, so the mission can follow placed and dug dirt
+        self.cells_callback = cells_callback
 
         ### Agent State ###
         self.max_steps = max_steps
+        self.episode = 0
         self.episode_step = 0
-        self.reward_given = False
-        self.staring_at_sky = False
-        self.explored_cells = set()
-        self.reward_explore = False
+        self.last_obs = None
+        self.pose = np.zeros((5,), dtype=np.float32)
+        # (min x, max x, min z, max z) of the cells the agent stood on this episode
+        self.bounds = None
     
     def reset(self):
-        self.explored_cells = set()      
         if self.episode_step > 0 and self.hider:
             print("attempting to end mission")
             self.agent_host.sendCommand(f"quit")
-        if not self.agent_host.getWorldState().is_mission_running:
-            self.init_malmo()
-        return self.get_observation()
+        while True:
+            if not self.agent_host.getWorldState().is_mission_running or self.mission_needs_restart():
+                self.init_malmo()
+            # episode_step doesn't move between these observations, the cached matrix would hold the old positions
+            self.distance_table.tick = None
+            try:
+                self.last_obs = self.get_observation()
+                return self.last_obs
+            except ClientHungError as e:
+                self.supervisor.report_failure(e, 0)
+
+    def mission_needs_restart(self):
+        return self.supervisor is not None and self.supervisor.needs_restart
     
     def step(self, action):
+        self.execute_malmo_action(action)
+        return self.finish_step(action, self.observe_step(action), self.referee.judge())
+
+    def observe_step(self, action):
+        """
+        Collects the result of an action that has already been sent to Malmo and reports it to the referee.
+        The returned reward only holds Malmo's own rewards, see finish_step.
+        """
         reward = 0
         info = {}
         obs = {
@@ -69,32 +135,39 @@ class SingleAgentEnv(gym.Env):
         }
         if not self.hider:
             obs["closest"] = np.zeros((1,), dtype=np.float32)
-        self.execute_malmo_action(action)
         world_state = self.agent_host.getWorldState()
         self.episode_step += 1
+        if self.exploration_tracker is not None:
+            info["coverage"] = float(self.exploration_tracker.coverage(self.tracker_index))
         if not world_state.is_mission_running:
             print("agent is done!")
+            if "coverage" in info:
+                print(f"episode coverage: {info['coverage']:.2f}")
             return obs, reward, True, info
         for r in world_state.rewards:
             reward += r.getValue()
-        obs = self.get_observation()
-        if self.staring_at_sky:
-            #reward -= 1
-            self.staring_at_sky = False
-        if not self.hider and self.reward_explore:
-            reward += 1
-            self.reward_explore = False
-            print("reward added for exploring new cell")
-        if self.seeker_found_hider() and self.reward_given == False:
-            if self.hider:
-                print("rewards applied to hider")
-                reward -= 50
-                self.seeker_found_hider(hidden=True)
-            else:
-                print("rewards applied to seeker")
-                reward += 100
-                self.reward_given = True
+        try:
+            obs = self.get_observation()
+        except ClientHungError as e:
+            # end the episode, the next reset starts a fresh mission and training carries on
+            self.supervisor.report_failure(e, self.episode_step)
+            info["client_failure"] = e.reason
+            return obs, reward, True, info
         return obs, reward, False, info
+
+    def finish_step(self, action, result, referee_rewards):
+        """
+        Adds the referee's reward of the tick to an observe_step result and records the transition.
+        """
+        obs, reward, done, info = result
+        reward += referee_rewards.get(self.agent_id, 0.0)
+        self.record_transition(action, reward, obs, done)
+        return obs, reward, done, info
+
+    def record_transition(self, action, reward, obs, done):
+        if self.recorder is not None and self.last_obs is not None:
+            self.recorder.record(self.agent_id, self.episode, self.episode_step, self.last_obs, action, reward, obs, done, self.pose)
+        self.last_obs = obs
     
     def get_observation(self):
         obs = {
@@ -104,186 +177,540 @@ class SingleAgentEnv(gym.Env):
         }
         if not self.hider:
             obs["closest"] = np.zeros((1,), dtype=np.float32)
+        wait_start = time.time()
         while self.agent_host.getWorldState().is_mission_running:
             world_state = self.agent_host.getWorldState()
+            if self.supervisor is not None:
+                self.supervisor.check_world_state(self.agent_id, world_state, wait_start)
             if world_state.number_of_observations_since_last_state > 0:
                 malmo_obs = json.loads(world_state.observations[-1].text)
+                spotted = None
+                staring_at_sky = False
+                new_cell = False
                 if "LineOfSight" in malmo_obs:
                     los = malmo_obs["LineOfSight"]
                     if "hider" in los["type"] and not self.hider:
-                        print("seeker found hider! rewards to be applied")
-                        self.seeker_found_hider(spotted=True)
+                        spotted = self.spotted_hider(los, malmo_obs.get("entities", []))
+                        print(f"seeker found {spotted}! rewards to be applied")
                         obs["cursor"][2] = 1
                     elif los["type"] in ("cobblestone", "stonebrick"):
                         obs["cursor"][0] = 1
                     elif los["type"] in ("dirt"):
                         obs["cursor"][1] = 1
                 else:
-                    self.staring_at_sky = True
+                    staring_at_sky = True
                 obs["facing"][0] = malmo_obs["Yaw"]
                 obs["facing"][1] = malmo_obs["Pitch"]
+                self.pose = np.array([malmo_obs["XPos"], malmo_obs["YPos"], malmo_obs["ZPos"], malmo_obs["Yaw"], malmo_obs["Pitch"]], dtype=np.float32)
+                self.track_bounds(int(np.floor(malmo_obs["XPos"])), int(np.floor(malmo_obs["ZPos"])))
                 grid = malmo_obs['floorAll']
                 for i, x in enumerate(grid):
                     if x == 'cobblestone' or x == 'stone_brick':
                         obs["grid"][i] = 1
                     elif x == 'dirt':
                         obs["grid"][i] = 2
+                if self.cells_callback is not None:
+                    self.cells_callback(self.arena_index, self.observed_cells(grid, malmo_obs["XPos"], malmo_obs["ZPos"]))
                 
+                if not self.hider and self.exploration_tracker is not None:
+                    cell_x = int(np.floor(malmo_obs["XPos"])) - self.origin[0]
+                    cell_z = int(np.floor(malmo_obs["ZPos"])) - self.origin[1]
+                    new_cell = self.exploration_tracker.visit(self.tracker_index, cell_x, cell_z)
                 if not self.hider:
-                    loc = (int(malmo_obs["XPos"]), int(malmo_obs["YPos"]))
-                    if loc not in self.explored_cells:
-                        self.reward_explore = True
-                        self.explored_cells.add(loc)
-                    min_dist = float('inf')
-                    for ent_obj in malmo_obs["entities"]:
-                        if "hider" in ent_obj["name"]:
-                            self_x = malmo_obs["XPos"]
-                            self_z = malmo_obs["ZPos"]
-                            other_x = ent_obj["x"]
-                            other_z = ent_obj["z"]
-                            dist = math.sqrt((other_x - self_x) ** 2 + (other_z - self_z) ** 2)
-                            if dist < min_dist:
-                                min_dist = dist
-                    obs["closest"] = np.array([min_dist], dtype=np.float32)
+                    # the table is shared by all seekers, only the first seeker of a step builds the distance matrix
+                    self.distance_table.update(malmo_obs["entities"], tick=(self.episode, self.episode_step))
+                    min_dist = self.distance_table.closest(self.agent_id, (malmo_obs["XPos"], malmo_obs["ZPos"]))
+                    # a hider sealed in by dirt is inf blocks away, out of range for the policy like any far hider
+                    obs["closest"] = np.array([min(min_dist, MAX_CLOSEST)], dtype=np.float32)
+                local_pose = self.pose - np.array([self.origin[0], 0, self.origin[1], 0, 0], dtype=np.float32)
+                self.referee.report(self.agent_id, local_pose, spotted=spotted, new_cell=new_cell, sky=staring_at_sky)
                 break
         return obs
 
+    def observed_cells(self, grid, x_pos, z_pos):
+        """
+        Cells at the agent's height in its floorAll grid that agents can change, as (x, z, value) in arena
+        coordinates. Dirt is 2 and open cells are 0, everything else is left out.
+        """
+        half = int(self.obs_size / 2)
+        size = 2 * half + 1
+        base_x = int(np.floor(x_pos)) - self.origin[0] - half
+        base_z = int(np.floor(z_pos)) - self.origin[1] - half
+        cells = []
+        # the grid runs x fastest, then z, then y, the upper layer is the one the agent stands in
+        for i, block in enumerate(grid[size * size:]):
+            if block in ("dirt", "air"):
+                z, x = divmod(i, size)
+                cells.append((base_x + x, base_z + z, 2 if block == "dirt" else 0))
+        return cells
+
+    def track_bounds(self, cell_x, cell_z):
+        if self.bounds is None:
+            self.bounds = [cell_x, cell_x, cell_z, cell_z]
+        else:
+            self.bounds = [min(self.bounds[0], cell_x), max(self.bounds[1], cell_x), min(self.bounds[2], cell_z), max(self.bounds[3], cell_z)]
+
+    def dirty_region(self):
+        """
+        Area the agent could have changed blocks in this episode.
+        """
+        if self.bounds is None:
+            return None
+        min_x, max_x, min_z, max_z = self.bounds
+        return ResetRegion(min_x - INTERACT_REACH, max_x + INTERACT_REACH, min_z - INTERACT_REACH, max_z + INTERACT_REACH)
+
+    def spotted_hider(self, los, entities):
+        """
+        Name of the hider the cursor ray hit. Falls back to the hider entity closest to the hit point when the
+        ray only reports an entity type.
+        """
+        if los["type"] in self.referee.hider_index:
+            return los["type"]
+        hiders = [entity for entity in entities if entity.get("name") in self.referee.hider_index]
+        if len(hiders) == 0:
+            return None
+        hit = np.array([los.get("x", self.pose[0]), los.get("z", self.pose[2])])
+        return min(hiders, key=lambda entity: np.hypot(entity["x"] - hit[0], entity["z"] - hit[1]))["name"]
+
     def execute_malmo_stop(self):
-        self.agent_host.sendCommand("move 0")
-        self.agent_host.sendCommand("turn 0")
-        self.agent_host.sendCommand("pitch 0")
+        for command in stop_commands():
+            self.agent_host.sendCommand(command)
+    
+    def execute_malmo_move(self, action):
+        for command in move_commands(action):
+            self.agent_host.sendCommand(command)
+
+    def execute_malmo_interact(self):
+        self.agent_host.sendCommand(interact_command(self.hider))
     
     def execute_malmo_action(self, action):
-        self.agent_host.sendCommand(f"move {action[0]}")
-        self.agent_host.sendCommand(f"turn {action[1]}")
-        self.agent_host.sendCommand(f"pitch {action[2]}")
+        self.execute_malmo_move(action)
         time.sleep(0.5)
         self.execute_malmo_stop()
         if action[3] > 0:
-            if self.hider:
-                self.execute_malmo_action([0,0,0,0])
-                self.agent_host.sendCommand(f"use 1")
+            self.execute_malmo_action([0,0,0,0])
+            self.execute_malmo_interact()
             if not self.hider:
-                self.execute_malmo_action([0,0,0,0])
-                self.agent_host.sendCommand(f"attack 1")
                 time.sleep(0.2)
     
     def __repr__(self):
         return self.agent_id
 
 
+def step_agents(agent_envs, actions):
+    """
+    Steps several agents of the same mission at once and returns the (obs, reward, done, info) of each.
+
+    Commands of all agents are sent before the shared 0.5 second movement window instead of one agent after
+    the other, so a step takes the same wall time no matter how many agents there are.
+    """
+    for agent_env, action in zip(agent_envs, actions):
+        agent_env.execute_malmo_move(action)
+    time.sleep(0.5)
+    for agent_env in agent_envs:
+        agent_env.execute_malmo_stop()
+
+    # same pause a single agent takes before using or attacking
+    interacting = [agent_env for agent_env, action in zip(agent_envs, actions) if action[3] > 0]
+    if len(interacting) > 0:
+        time.sleep(0.5)
+        for agent_env in interacting:
+            agent_env.execute_malmo_interact()
+        if any(not agent_env.hider for agent_env in interacting):
+            time.sleep(0.2)
+
+    # the referee judges the tick once every agent has reported its observation
+    results = [agent_env.observe_step(action) for agent_env, action in zip(agent_envs, actions)]
+    referee_rewards = {}
+    for referee in {id(agent_env.referee): agent_env.referee for agent_env in agent_envs}.values():
+        referee_rewards.update(referee.judge())
+    return [agent_env.finish_step(action, result, referee_rewards) for agent_env, action, result in zip(agent_envs, actions, results)]
+
+
+class TeamVecEnv(DummyVecEnv):
+    """
+    Steps every agent of a team as one vectorized env, so a single policy forward pass serves the whole team
+    and the replay buffer collects the transitions of every agent. See step_agents for how agents move together.
+    """
+
+    def __init__(self, agent_envs):
+        self.agent_envs = agent_envs
+        super().__init__([lambda agent_env=agent_env: agent_env for agent_env in agent_envs])
+
+    def step_wait(self):
+        # collect every result before resetting, a reset starts a new mission for the whole team
+        results = step_agents(self.envs, self.actions)
+        for env_idx, (obs, self.buf_rews[env_idx], self.buf_dones[env_idx], self.buf_infos[env_idx]) in enumerate(results):
+            if self.buf_dones[env_idx]:
+                self.buf_infos[env_idx]["terminal_observation"] = obs
+                obs = self.envs[env_idx].reset()
+            self._save_obs(env_idx, obs)
+        return (self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones), deepcopy(self.buf_infos))
+
+    def stop(self):
+        for agent_env in self.envs:
+            agent_env.execute_malmo_stop()
+
+
 class HideAndSeekMission:
 
     metadata = {'render.modes': ['human'], "name": "HideAndSeek"}
 
-    def __init__(self):
+    def __init__(self, config=None):
+        """
+        Arguments:
+            config (dict):
+                Overrides for any of the parameters below, for example {"seeker_phase_duration": 40} from a sweep.
+        """
         ### Arena Parameters ###
         self.arena_size = 10
         self.closed_arena = True
         self.env_type = "quadrant"
         self.gen_num_blocks = 0
         self.gen_num_stairs = 0
+        self.item_gen = {
+            "blocks_inside": False,
+            "blocks_outside": True,
+            "stairs_inside": False,
+            "stairs_outside": True,
+        }
+        # blocks and stairs are placed as blocks, "item" drops them as entities every agent has to observe
+        self.item_mode = "block"
+
+        # arena artifacts like visibility indexes are shared with other processes and later runs through this directory
+        self.artifact_cache_dir = None
+
+        # arenas tiled into the same world, every arena hosts its own game of num_hiders against num_seekers
+        self.num_arenas = 1
+
+        ### Curriculum Parameters ###
+        # opt in: arenas grow and fill up as the seekers get better, arena_size then follows the current level
+        self.use_curriculum = False
 
         ### Agent Parameters ###
         self.obs_size = 7
         self.num_hiders = 1
-        assert self.num_hiders > 0, "hiders are mandatory"
         self.num_seekers = 1
         self.max_episode_steps = 300
+        self.reward_weights = dict(DEFAULT_REWARD_WEIGHTS)
 
-        ### Multi-Model State ###
+        ### Recording Parameters ###
+        self.record_trajectories = True
+        self.trajectory_dir = "trajectories"
+        self.video_every_n_episodes = 10
+
+        ### Warm Start Parameters ###
+        # None warm starts from trajectory_dir
+        self.warm_start_dir = None
+        self.warm_start_gradient_steps = 1000
+        self.warm_start_bc_epochs = 0
+
+        ### Training Parameters ###
         self.num_runs = 10
         self.seeker_phase_duration = 20
         self.hider_phase_duration = 20
-        self.target_model = SAC
-        self.possible_hiders = [f"hider_{x}" for x in range(self.num_hiders)]
-        self.possible_seekers = [f"seeker_{x}" for x in range(self.num_seekers)]
-        self.hider_agents = {key:SingleAgentEnv(key, self.obs_size, self.init_malmo, self.seeker_found_hider_check, hider = True) for key in self.possible_hiders}
-        self.seeker_agents = {key:SingleAgentEnv(key, self.obs_size, self.init_malmo, self.seeker_found_hider_check, hider = False) for key in self.possible_seekers}
-        try:
-            print("attempting to load hider...")
-            self.hider_model = self.target_model.load("sac_hider", self.hider_agents["hider_0"])
-        except:
-            print("could not find hider")
-            self.hider_model = self.target_model("MultiInputPolicy", self.hider_agents["hider_0"], learning_starts=10, verbose = 1)
-        try:
-            print("attempting to load seeker...")
-            self.seeker_model = self.target_model.load("sac_seeker", self.seeker_agents["seeker_0"])
-        except:
-            print("could not find seeker")
-            self.seeker_model = self.target_model("MultiInputPolicy", self.seeker_agents["seeker_0"], learning_starts=10, verbose = 1)
-        self.seeker_found_hider = False
+        self.learning_starts = 10
+        self.target_model = PrioritizedSAC
+        # rare "hider found" transitions are replayed by priority instead of drowning in a uniform buffer
+        self.prioritized_replay = True
+        self.hider_model_path = "sac_hider"
+        self.seeker_model_path = "sac_seeker"
+        # "scripted" plays a team with the heuristic agents of scripted_agents instead of a trained model
+        self.hider_policy = "sac"
+        self.seeker_policy = "sac"
+
+        ### Malmo Parameters ###
+        # first port of the consecutive range of Minecraft clients, one client per agent plus the observer
+        self.malmo_port = 10000
+        # ports of extra clients that take over from clients that die and can't be restarted
+        self.malmo_spare_ports = []
+        self.observation_deadline = 30.0
+        # leftovers of an earlier run are unknown, so the first mission clears the whole area like it used to
+        self.full_reset_first = True
+
+        self.apply_config(config)
+        # checkpoints the config names have to load, only the default paths may fall back to fresh models
+        self.explicit_model_paths = {key for key in (config or {}) if key.endswith("_model_path")}
+        assert self.num_hiders > 0, "hiders are mandatory"
+        artifact_cache.configure(cache_dir=self.artifact_cache_dir)
+
+        ### Supervisor State ###
+        self.supervisor = MissionSupervisor(
+            range(self.malmo_port, self.malmo_port + self.num_arenas * (self.num_seekers + self.num_hiders) + 1),
+            spare_ports=self.malmo_spare_ports,
+            observation_deadline=self.observation_deadline,
+        )
+
+        ### Curriculum State ###
+        if self.use_curriculum:
+            self.curriculum = CurriculumScheduler()
+            self.arena_cache = ArenaCache(
+                [{**level, "item_mode": self.item_mode} for level in self.curriculum.levels],
+                self.closed_arena,
+                self.env_type,
+                self.item_gen,
+            )
+            self.arena_cache.warm(self.curriculum.level)
+            self.arena_size = self.curriculum.params["arena_size"]
+        self.num_seeker_wins = 0
+
+        ### Reset State ###
+        self.dirty_region = FULL_RESET_REGION if self.full_reset_first else None
+
+        ### Recording State ###
+        self.episode_count = 0
+        # whether this process started an episode whose outcome the referees hold
+        self.episode_started = False
+        self.recorder = TrajectoryRecorder(self.trajectory_dir, video_every_n_episodes=self.video_every_n_episodes) if self.record_trajectories else None
+
+        ### Multi-Model State ###
+        self.model_kwargs = {"learning_starts": self.learning_starts, "verbose": 1}
+        if self.prioritized_replay:
+            self.model_kwargs["replay_buffer_class"] = PrioritizedDictReplayBuffer
+        # agents are numbered across arenas, hider_x plays in arena x // num_hiders
+        self.possible_hiders = [f"hider_{x}" for x in range(self.num_arenas * self.num_hiders)]
+        self.possible_seekers = [f"seeker_{x}" for x in range(self.num_arenas * self.num_seekers)]
+        self.arena_offsets = tile_offsets(self.num_arenas, self.arena_size)
+        # every arena keeps its own score and distances, so results are demultiplexed per arena
+        self.referees = [
+            Referee(self.arena_agents(self.possible_hiders, self.num_hiders, k), self.arena_agents(self.possible_seekers, self.num_seekers, k), self.reward_weights)
+            for k in range(self.num_arenas)
+        ]
+        self.hider_distances = [
+            HiderDistanceTable(names=self.arena_agents(self.possible_hiders, self.num_hiders, k) + self.arena_agents(self.possible_seekers, self.num_seekers, k))
+            for k in range(self.num_arenas)
+        ]
+        self.exploration = ExplorationTracker(len(self.possible_seekers), self.arena_size)
+        self.hider_agents = {
+            key:SingleAgentEnv(key, self.obs_size, self.init_malmo, self.referees[i // self.num_hiders], hider = True, recorder=self.recorder, supervisor=self.supervisor, arena_index=i // self.num_hiders, cells_callback=self.update_cells)
+            for i, key in enumerate(self.possible_hiders)
+        }
+        self.seeker_agents = {
+            key:SingleAgentEnv(key, self.obs_size, self.init_malmo, self.referees[i // self.num_seekers], hider = False, recorder=self.recorder, distance_table=self.hider_distances[i // self.num_seekers], exploration_tracker=self.exploration, tracker_index=i, supervisor=self.supervisor, arena_index=i // self.num_seekers, cells_callback=self.update_cells)
+            for i, key in enumerate(self.possible_seekers)
+        }
+        # every team shares one policy, its agents are stepped together as a vectorized env
+        self.hider_team = TeamVecEnv([self.hider_agents[key] for key in self.possible_hiders])
+        self.seeker_team = TeamVecEnv([self.seeker_agents[key] for key in self.possible_seekers])
+        self.hider_model = self.make_model(self.hider_team, "hider", self.hider_model_path, self.hider_policy)
+        self.seeker_model = self.make_model(self.seeker_team, "seeker", self.seeker_model_path, self.seeker_policy)
 
         ### Malmo State ###
         self.malmo_agents = { **{key : self.hider_agents[key].agent_host for key in self.possible_hiders}, **{key : self.seeker_agents[key].agent_host for key in self.possible_seekers}}
         self.malmo_agents["Observer"] = MalmoPython.AgentHost()
 
-    def init_malmo(self):
-        self.hider_agents["hider_0"].episode_step = 0
-        self.seeker_agents["seeker_0"].episode_step = 0
-        self.seeker_agents["seeker_0"].reward_given = False
-        self.seeker_found_hider = False
-        my_mission = MalmoPython.MissionSpec(
-            self.gen_mission_xml(
-                self.arena_size,
-                self.closed_arena,
-                self.env_type,
-                {
-                    "blocks_inside": False,
-                    "blocks_outside": True,
-                    "stairs_inside": False,
-                    "stairs_outside": True,
-                }, 
-                0, 
-                0, 
-                2
-            ), 
-            True)
+    def make_model(self, team, agent_prefix, model_path, policy):
+        """
+        Loads the team's model, creates a fresh one if there is none, or scripts the team. A checkpoint whose
+        path was set in the config and exists but can't be loaded raises instead of being replaced.
+        """
+        if policy == "scripted":
+            return ScriptedTeam(team, self, hider=agent_prefix == "hider")
+        if policy != "sac":
+            raise ValueError(f"Unknown {agent_prefix} policy {policy}, expected one of ['sac', 'scripted']")
+        try:
+            print(f"attempting to load {agent_prefix}...")
+            return self.target_model.load(model_path, team)
+        except FileNotFoundError:
+            print(f"could not find {agent_prefix}")
+        except Exception as e:
+            # a checkpoint asked for by name has to load, a broken one would be played and scored as a fresh model
+            if f"{agent_prefix}_model_path" in self.explicit_model_paths:
+                raise
+            print(f"could not load {agent_prefix} ({e}), starting a fresh model")
+        model = self.target_model("MultiInputPolicy", team, **self.model_kwargs)
+        self.warm_start(model, agent_prefix)
+        return model
+
+    @staticmethod
+    def arena_agents(agent_ids, agents_per_arena, arena_index):
+        return agent_ids[arena_index * agents_per_arena:(arena_index + 1) * agents_per_arena]
+
+    def apply_config(self, config):
+        """
+        Overrides parameters by name, see TUNABLE_PARAMETERS. Reward weights can be overridden one at a time.
+        """
+        unknown = set(config or {}) - TUNABLE_PARAMETERS
+        if unknown:
+            raise ValueError(f"HideAndSeekMission has no parameters {sorted(unknown)}")
+        for key, value in (config or {}).items():
+            if key == "reward_weights":
+                unknown = set(value) - set(self.reward_weights)
+                if unknown:
+                    raise ValueError(f"Unknown reward weights {sorted(unknown)}")
+                self.reward_weights.update(value)
+            else:
+                setattr(self, key, value)
+
+    def training_state(self):
+        """
+        Episode counters and curriculum progress, which the saved models don't hold. See restore_training_state.
+        """
+        state = {"episode_count": self.episode_count, "num_seeker_wins": self.num_seeker_wins}
+        if self.use_curriculum:
+            state["curriculum_level"] = self.curriculum.level
+            state["curriculum_results"] = list(self.curriculum.results)
+        return state
+
+    def restore_training_state(self, state):
+        """
+        Continues the counters and the curriculum of an earlier run from its training_state.
+
+        The episode that was running when the state was saved has no outcome, it is dropped and its number is
+        played again by the next mission.
+        """
+        self.episode_count = max(state.get("episode_count", 0) - 1, 0)
+        self.num_seeker_wins = state.get("num_seeker_wins", 0)
+        if self.use_curriculum and "curriculum_level" in state:
+            self.curriculum.level = min(state["curriculum_level"], len(self.curriculum.levels) - 1)
+            self.curriculum.results.clear()
+            self.curriculum.results.extend(state.get("curriculum_results", []))
+            self.arena_cache.warm(self.curriculum.level)
+            self.arena_size = self.curriculum.params["arena_size"]
+
+    def init_malmo(self, arenas=None):
+        """
+        Starts a new mission for every agent.
+
+        Arguments:
+            arenas (list[tuple(str, list[list[int]])]):
+                create_env output of every arena to play on, for example from a fixed evaluation corpus. Defaults
+                to the next arenas of the curriculum, or freshly generated ones.
+        """
+        if self.episode_started:
+            # every arena played its own game, each one counts as an episode
+            for referee in self.referees:
+                seeker_won = referee.any_found()
+                self.num_seeker_wins += int(seeker_won)
+                if self.use_curriculum:
+                    self.curriculum.record(seeker_won)
+        self.episode_count += 1
+        self.episode_started = True
+        # only redraw what the new arena needs and what the last mission could have changed
+        for agent in (*self.hider_agents.values(), *self.seeker_agents.values()):
+            agent_region = agent.dirty_region()
+            if agent_region is not None:
+                self.dirty_region = agent_region.union(self.dirty_region)
+            agent.bounds = None
+            agent.episode = self.episode_count
+            agent.episode_step = 0
+        if arenas is None and self.use_curriculum:
+            arenas = [self.arena_cache.get(self.curriculum.level) for _ in range(self.num_arenas)]
+            self.arena_size = self.curriculum.params["arena_size"]
+        offsets = tile_offsets(self.num_arenas, self.arena_size)
+        reset_region = tiled_region(self.arena_size, offsets).union(self.dirty_region)
+        mission_xml = self.gen_mission_xml(
+            self.arena_size,
+            self.closed_arena,
+            self.env_type,
+            self.item_gen,
+            0, 
+            0, 
+            2,
+            arenas=arenas,
+            reset_region=reset_region,
+            item_mode=self.item_mode,
+        )
+        # the xml holds the arenas, spawns and settings, replaying them reuses the validated mission spec
+        my_mission = shared_cache.get_or_build(
+            "mission_spec", content_hash(mission_xml), lambda: MalmoPython.MissionSpec(mission_xml, True), persist=False
+        )
+        self.dirty_region = tiled_region(self.arena_size, self.arena_offsets)
+        for agent in (*self.hider_agents.values(), *self.seeker_agents.values()):
+            agent.origin = self.arena_offsets[agent.arena_index]
+        # seekers measure how far hiders are by walking around walls instead of through them, every table patches
+        # its own copy of the shared field as dirt gets placed and dug up
+        for distance_table, env_map, offset in zip(self.hider_distances, self.env_maps, self.arena_offsets):
+            distance_table.set_arena(get_distance_field(env_map).copy(), offset)
+        # seekers start exploring the new arena from scratch, walls don't count towards coverage
+        self.exploration.resize(self.arena_size)
+        self.exploration.reset(walkable=np.stack([np.array(self.env_maps[agent.arena_index]) != 1 for agent in self.seeker_agents.values()]))
+        # the referees also check detections geometrically on the arena, which update_cells keeps up to date
+        for referee, env_map in zip(self.referees, self.env_maps):
+            referee.reset(env_map)
         my_mission_record = MalmoPython.MissionRecordSpec()
         my_mission.setViewpoint(1)
 
-        my_mission_record.setDestination("mission_viewpoint.tgz")
-        my_mission_record.recordMP4(MalmoPython.FrameType.VIDEO, 24, 2000000, False)
+        # only sample the top down video every few episodes, trajectories are recorded every step instead
+        if self.should_record_video():
+            my_mission_record.setDestination(f"mission_viewpoint_{self.episode_count}.tgz")
+            my_mission_record.recordMP4(MalmoPython.FrameType.VIDEO, 24, 2000000, False)
 
-        client_pool = MalmoPython.ClientPool()
-        for port in range(10000, 10000 + self.num_seekers + self.num_hiders + 1):
-            client_pool.add(MalmoPython.ClientInfo('127.0.0.1', port))
-
-        experimentID = str(uuid.uuid4())
         agent_hosts = self.malmo_agents
 
         for agent_id, agent in enumerate(agent_hosts.keys()):
             agent_hosts[agent].sendCommand("quit")
 
-        for agent_id, agent in enumerate(agent_hosts.keys()):
-            time.sleep(1)
-            safeStartMission(agent_hosts[agent], my_mission, client_pool, MalmoPython.MissionRecordSpec(), agent_id, experimentID)
-            time.sleep(1)
-
-        safeWaitForStart(agent_hosts.values())
+        # the observer is the only agent with a top down view worth recording
+        record_specs = {agent: my_mission_record if agent == "Observer" else MalmoPython.MissionRecordSpec() for agent in agent_hosts}
+        # dead or hung clients are repaired and the start is retried instead of ending the run
+        self.supervisor.start_mission(agent_hosts, my_mission, record_specs, lambda: str(uuid.uuid4()))
         time.sleep(1)
     
+    def update_cells(self, arena_index, cells):
+        """
+        Patches an arena's map and walking distances with the dirt an agent observes, so blocks hiders place
+        and seekers dig up change the paths between agents.
+
+        Arguments:
+            cells (list[tuple(int, int, int)]):
+                (x, z, value) of observed cells in arena coordinates, see SingleAgentEnv.observed_cells.
+        """
+        env_map = self.env_maps[arena_index]
+        distance_table = self.hider_distances[arena_index]
+        for x, z, value in cells:
+            if not (0 <= z < len(env_map) and 0 <= x < len(env_map[z])):
+                continue
+            # walls and stairs don't change, agent markers count as open cells
+            if env_map[z][x] in (1, 3) or (env_map[z][x] == 2) == (value == 2):
+                continue
+            env_map[z][x] = value
+            if distance_table.distance_field is not None:
+                distance_table.distance_field.set_cell(x, z, value)
+                distance_table.tick = None
+
     def learn(self):
         self.init_malmo()
         ct = 0
         while ct < self.num_runs:
             ct += 1
-            self.hider_model = self.hider_model.learn(self.hider_phase_duration)
-            self.hider_agents["hider_0"].execute_malmo_action([0,0,0,0])
+            # timesteps are counted per agent, so a phase lasts the same number of team steps for any team size
+            self.hider_model = self.hider_model.learn(self.hider_phase_duration * len(self.possible_hiders))
+            self.hider_team.stop()
             
-            self.seeker_model = self.seeker_model.learn(self.seeker_phase_duration)
-            self.seeker_agents["seeker_0"].execute_malmo_action([0,0,0,0])
+            self.seeker_model = self.seeker_model.learn(self.seeker_phase_duration * len(self.possible_seekers))
+            self.seeker_team.stop()
         print("learn finished")
-        self.hider_model.save("sac_hider")
-        self.seeker_model.save("sac_seeker")
+        self.hider_model.save(self.hider_model_path)
+        self.seeker_model.save(self.seeker_model_path)
+        if self.recorder is not None:
+            self.recorder.flush()
+        if self.use_curriculum:
+            print(f"curriculum level {self.curriculum.level}, seeker win rate {self.curriculum.win_rate:.2f}, "
+                  f"arena cache hits {self.arena_cache.num_hits} misses {self.arena_cache.num_misses}")
+        print(f"supervisor: {self.supervisor.stats()}")
+        print(f"artifact cache: {shared_cache.stats()}")
+
+    def warm_start(self, model, agent_prefix):
+        """
+        Pretrains a freshly created model from trajectories recorded in earlier runs instead of live Minecraft time.
+        """
+        warm_start_dir = self.trajectory_dir if self.warm_start_dir is None else self.warm_start_dir
+        dataset = TrajectoryDataset(warm_start_dir, agent_prefix)
+        if len(dataset.chunk_names) == 0:
+            return
+        print(f"warm starting {agent_prefix} model from {warm_start_dir}")
+        if self.warm_start_bc_epochs > 0:
+            pretrain_behaviour_cloning(model, dataset, epochs=self.warm_start_bc_epochs)
+        num_added = fill_replay_buffer(model, dataset)
+        print(f"added {num_added} recorded transitions to the {agent_prefix} replay buffer")
+        pretrain_offline(model, self.warm_start_gradient_steps)
+
+    def should_record_video(self):
+        if self.recorder is not None:
+            return self.recorder.should_record_video(self.episode_count)
+        return self.video_every_n_episodes > 0 and self.episode_count % self.video_every_n_episodes == 0
     
-    def seeker_found_hider_check(self, spotted=False, hidden=False):
-        if hidden:
-            self.seeker_found_hider = False
-        if spotted:
-            self.seeker_found_hider = True
-        return self.seeker_found_hider
-
     def gen_mission_xml(self,
         arena_size: int,
         is_closed_arena: bool,
@@ -292,6 +719,8 @@ class HideAndSeekMission:
         num_blocks: int,
         num_stairs: int,
         min_agent_spawn_dist: int,
+        arenas=None,
+        reset_region=None,
         **kwargs,
     ):
         """
@@ -320,6 +749,11 @@ class HideAndSeekMission:
                 Specify the number of stairs that should be generated.
             min_agent_spawn_dist (int):
                 Specify the minimum distance agents have to spawn from one another
+            arenas (list[tuple(str, list[list[int]])]):
+                Pre-generated create_env output of every arena to use instead of generating new arenas, for example from an ArenaCache.
+                Defaults to num_arenas freshly generated arenas. Several arenas are tiled into the same world.
+            reset_region (ResetRegion):
+                Area to clear before drawing the arenas. Defaults to every arena, its walls and a small margin.
             **kwargs:
                 Arbitrary keyword arguments. Each environment type has additional settings that can be tweaked. Refer to those individual functions to find out more.
 
@@ -331,60 +765,40 @@ class HideAndSeekMission:
         # empty = 0
         # walls = 1
         # blocks = 2
-        # stairs = 3shoul
+        # stairs = 3
         # agents = 4
-        env, env_map = create_env(
-            arena_size,
-            is_closed_arena,
-            env_type,
-            item_gen,
-            num_blocks,
-            num_stairs,
-            **kwargs,
-        )
-
-        # generate positions for agents
-        agent_pos = []
-        attempt_counter = 0
-        max_attempts = 5
-        while len(agent_pos) != self.num_hiders + self.num_seekers:
-            while True:
-                # reset all generated agent positions to prevent situations where in initial generated 
-                # agent positions prevents generation of the remaining agents
-                attempt_counter += 1
-                if attempt_counter == max_attempts:
-                    for pos in agent_pos:
-                        env_map[pos[1]][pos[0]] = 0
-                    agent_pos = []
-
-                    continue
-
-                x_pos = random.randint(0, arena_size - 1)
-                y_pos = random.randint(0, arena_size - 1)
-
-                # prevent agents from spawning in walls
-                if env_map[y_pos][x_pos] == 1:
-                    continue
-                
-                # prevent agents from spawning too close to one another
-                adjacent_spots = []
-
-                # generate all spaces around potential spawn point, up to min_agent_spawn_dist inclusive
-                for row_index in range(-(min_agent_spawn_dist), min_agent_spawn_dist + 1):
-                    for col_index in range(-(min_agent_spawn_dist), min_agent_spawn_dist + 1):
-                        # only consider VALID spots
-                        if 0 <= (y_pos + col_index) < len(env_map) and 0 <= (x_pos + row_index) < len(env_map[0]):
-                            adjacent_spots.append((y_pos + col_index, x_pos + row_index))
-
-                # an agent was found within min_agent_spawn_dist
-                if any([True for i in adjacent_spots if env_map[i[0]][i[1]] == 4]):
-                    continue
-                
-                # valid position for agent
-                agent_pos.append((x_pos, y_pos))
-                env_map[y_pos][x_pos] = 4
-                attempt_counter = 0
-                break
+        if arenas is None:
+            arenas = [
+                create_env(
+                    arena_size,
+                    is_closed_arena,
+                    env_type,
+                    item_gen,
+                    num_blocks,
+                    num_stairs,
+                    **kwargs,
+                )
+                for _ in range(self.num_arenas)
+            ]
+
+        # every arena gets its own corner of the world, a single arena stays at the origin
+        self.arena_offsets = tile_offsets(len(arenas), arena_size)
+        if len(arenas) == 1:
+            env = arenas[0][0]
+            if reset_region is not None:
+                env = with_reset_region(env, arena_size, reset_region)
+        else:
+            env = create_tiled_env([arena_env for arena_env, _, _ in arenas], self.arena_offsets, reset_region)
+
+        self.env_maps = [deepcopy(env_map) for _, env_map, _ in arenas]
+        # rooms, doors and chokepoints the generator recorded for every arena
+        self.layouts = [layout for _, _, layout in arenas]
+
+        # generate positions for agents, every arena places its own agents
+        agent_pos = [
+            gen_agent_positions(env_map, arena_size, self.num_hiders + self.num_seekers, self.num_hiders, min_agent_spawn_dist, layout)
+            for env_map, layout in zip(self.env_maps, self.layouts)
+        ]
 
         mission_string = f""
 
@@ -417,12 +831,15 @@ class HideAndSeekMission:
             </ServerSection>"""
 
         # set up hiders
-        for i in range(self.num_hiders):
+        for i in range(len(self.possible_hiders)):
             # randomize agent starting position
+            arena_index = i // self.num_hiders
+            pos = agent_pos[arena_index][i % self.num_hiders]
+            dx, dz = self.arena_offsets[arena_index]
             mission_string += f"""<AgentSection mode="Survival">
                 <Name>{self.possible_hiders[i]}</Name>
                 <AgentStart>
-                    <Placement x="{str(agent_pos[i][1])}" y="2" z="{str(agent_pos[i][0])}"/>
+                    {agent_placement(pos, (dx, dz))}
                     <Inventory>
                         <InventoryItem slot="0" type="dirt" quantity="8"/>
                     </Inventory>
@@ -442,12 +859,15 @@ class HideAndSeekMission:
             </AgentSection>"""
         
         #set up seekers
-        for i in range(self.num_seekers):
+        for i in range(len(self.possible_seekers)):
             # randomize agent starting position
+            arena_index = i // self.num_seekers
+            pos = agent_pos[arena_index][self.num_hiders + i % self.num_seekers]
+            dx, dz = self.arena_offsets[arena_index]
             mission_string += f"""<AgentSection mode="Survival">
                 <Name>{self.possible_seekers[i]}</Name>
                 <AgentStart>
-                    <Placement x="{str(agent_pos[self.num_hiders + i][1])}" y="2" z="{str(agent_pos[self.num_hiders + i][0])}"/>
+                    {agent_placement(pos, (dx, dz))}
                     <Inventory>
                         <InventoryItem slot="0" type="iron_shovel"/>
                     </Inventory>
@@ -469,12 +889,16 @@ class HideAndSeekMission:
                 </AgentHandlers>
             </AgentSection>"""
 
-        # setup agent as observer
+        # setup agent as observer, high enough above the middle of the arenas to see all of them
+        view = tiled_region(arena_size, self.arena_offsets)
+        view_size = max(view.x2 - view.x1, view.z2 - view.z1) if len(self.arena_offsets) > 1 else arena_size
+        view_x = (view.x1 + view.x2 + 1) / 2 if len(self.arena_offsets) > 1 else arena_size / 2
+        view_z = (view.z1 + view.z2 + 1) / 2 if len(self.arena_offsets) > 1 else arena_size / 2
         mission_string += f"""
             <AgentSection mode="Spectator">
                 <Name>TopDownView</Name>
                 <AgentStart>
-                    <Placement x="{arena_size/2}" y="{10 + (arena_size//3)}" z="{arena_size/2}" pitch="90" yaw="180"/>
+                    <Placement x="{view_x}" y="{10 + (view_size//3)}" z="{view_z}" pitch="90" yaw="180"/>
                 </AgentStart>
                 <AgentHandlers>
                     <ContinuousMovementCommands turnSpeedDegs="180"/>
@@ -485,7 +909,7 @@ class HideAndSeekMission:
         return mission_string
 
 if __name__ == '__main__':
-    env = HideAndSeekMission()
+    env = HideAndSeekMission({"use_curriculum": True})
     num_cycles = 500
     for _ in range(num_cycles):
         env.learn()
@@ -0,0 +1,297 @@
+import multiprocessing as mp
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import Dict
+
+import numpy as np
+from prioritized_replay import PrioritizedSAC
+
+# seconds a worker waits for its actions before giving up on the server
+REQUEST_TIMEOUT = 30.0
+# how often a waiting worker checks that the server is still alive
+ALIVE_CHECK_INTERVAL = 0.5
+# workers in other processes can't ask the server process directly, they take a server that hasn't been through
+# its loop for this many seconds for dead
+HEARTBEAT_TIMEOUT = 10.0
+
+
+class InferenceServerError(Exception):
+    """
+    Raised when the inference server died while a worker waited for actions.
+    """
+
+
+class ObsLayout:
+    """
+    Packs Dict observations of a team into rows of a flat float32 array and back.
+    """
+
+    def __init__(self, observation_space):
+        self.keys = sorted(observation_space.spaces.keys())
+        self.shapes = {key: observation_space.spaces[key].shape for key in self.keys}
+        self.sizes = {key: int(np.prod(self.shapes[key])) for key in self.keys}
+        self.size = sum(self.sizes.values())
+
+    def pack(self, obs: Dict[str, np.ndarray], out: np.ndarray):
+        """
+        Writes a batch of observations of shape (n, *shape) per key into out of shape (n, size).
+        """
+        start = 0
+        for key in self.keys:
+            out[:, start:start + self.sizes[key]] = np.asarray(obs[key], dtype=np.float32).reshape(len(out), -1)
+            start += self.sizes[key]
+
+    def unpack(self, rows: np.ndarray):
+        obs = {}
+        start = 0
+        for key in self.keys:
+            obs[key] = rows[:, start:start + self.sizes[key]].reshape(len(rows), *self.shapes[key])
+            start += self.sizes[key]
+        return obs
+
+
+class InferenceServer:
+    """
+    Runs the hider and seeker actors in their own process and serves actions to many env workers.
+
+    Every worker owns a block of shared memory holding up to max_batch observation rows and the matching
+    actions. A worker writes its observations into its block, puts a small (worker_id, team, rows) message on
+    the request queue and waits on its event. The server collects requests for batch_window seconds, then runs
+    one forward pass per team over the rows of all waiting workers and writes the actions straight back into
+    their blocks.
+
+    New weights are loaded into the running server with update_weights(). Every team has a version counter in
+    shared memory so workers can tell which weights produced their actions.
+
+    The server is standalone, neither HideAndSeekMission nor the evaluator start one. A driver that runs env
+    workers in their own processes starts it with the checkpoints the mission saved, hands every worker its
+    client(worker_id) and lets the workers act through client.policy(team) in place of the loaded models.
+    """
+
+    def __init__(
+        self,
+        model_paths: Dict[str, str],
+        observation_spaces: Dict[str, object],
+        num_workers: int,
+        max_batch: int = 8,
+        action_dim: int = 4,
+        target_model=PrioritizedSAC,
+        deterministic: bool = True,
+        batch_window: float = 0.002,
+    ):
+        """
+        Arguments:
+            model_paths (dict[str, str]):
+                Checkpoint to serve for every team, for example {"hider": "sac_hider", "seeker": "sac_seeker"}.
+            observation_spaces (dict[str, gym.spaces.Dict]):
+                Observation space of every team.
+            num_workers (int):
+                Number of env workers that will send requests.
+            max_batch (int):
+                Largest number of observations a single worker sends at once, usually its team size.
+            action_dim (int):
+                Size of the action vector.
+            target_model (class):
+                SB3 algorithm the checkpoints were saved with. Defaults to the one HideAndSeekMission trains.
+            deterministic (bool):
+                Whether actions are sampled or the mean action is used.
+            batch_window (float):
+                Seconds the server waits for more requests before running a forward pass.
+        """
+        self.teams = sorted(model_paths.keys())
+        self.model_paths = model_paths
+        self.observation_spaces = observation_spaces
+        self.num_workers = num_workers
+        self.max_batch = max_batch
+        self.action_dim = action_dim
+        self.target_model = target_model
+        self.deterministic = deterministic
+        self.batch_window = batch_window
+
+        ### Shared Memory ###
+        self.row_size = max(ObsLayout(observation_spaces[team]).size for team in self.teams)
+        self.block_size = 4 * max_batch * (self.row_size + action_dim)
+        self.blocks = [shared_memory.SharedMemory(create=True, size=self.block_size) for _ in range(num_workers)]
+        self.versions = mp.Array("i", len(self.teams))
+
+        ### Messaging ###
+        self.requests = mp.Queue()
+        self.commands = mp.Queue()
+        self.ready = [mp.Event() for _ in range(num_workers)]
+        # time of the server's last pass through its loop, it passes at least every 0.1 seconds while idle
+        self.heartbeat = mp.Value("d", 0.0)
+        self.process = None
+
+    def start(self):
+        # loading the models counts as alive
+        self.heartbeat.value = time.time() + HEARTBEAT_TIMEOUT
+        self.process = mp.Process(target=self._serve, name="inference-server", daemon=True)
+        self.process.start()
+        return self
+
+    def stop(self):
+        if self.process is not None:
+            self.commands.put(("stop",))
+            self.process.join()
+            self.process = None
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+    def client(self, worker_id: int):
+        """
+        Returns the handle a worker uses to request actions. Pass it to the worker process.
+        """
+        return InferenceClient(self, worker_id)
+
+    def update_weights(self, team: str, model_path: str):
+        """
+        Loads new weights for a team into the running server without restarting it or any worker.
+        """
+        self.commands.put(("load", team, model_path))
+
+    def weight_version(self, team: str):
+        return self.versions[self.teams.index(team)]
+
+    def _serve(self):
+        models = {team: self.target_model.load(self.model_paths[team], device="cpu") for team in self.teams}
+        layouts = {team: ObsLayout(self.observation_spaces[team]) for team in self.teams}
+        views = [self._block_views(block) for block in self.blocks]
+
+        while True:
+            self.heartbeat.value = time.time()
+            # weight updates are applied between batches, never in the middle of one
+            while True:
+                try:
+                    command = self.commands.get_nowait()
+                except queue.Empty:
+                    break
+                if command[0] == "stop":
+                    return
+                _, team, model_path = command
+                models[team].set_parameters(model_path, device="cpu")
+                self.heartbeat.value = time.time()
+                self.versions[self.teams.index(team)] += 1
+
+            try:
+                pending = [self.requests.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            deadline = time.time() + self.batch_window
+            while len(pending) < self.num_workers:
+                try:
+                    pending.append(self.requests.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+
+            for team in self.teams:
+                team_requests = [(worker_id, rows) for worker_id, request_team, rows in pending if request_team == team]
+                if len(team_requests) == 0:
+                    continue
+                layout = layouts[team]
+                batch = np.concatenate([views[worker_id][0][:rows, :layout.size] for worker_id, rows in team_requests])
+                actions, _ = models[team].predict(layout.unpack(batch), deterministic=self.deterministic)
+
+                start = 0
+                for worker_id, rows in team_requests:
+                    views[worker_id][1][:rows] = actions[start:start + rows]
+                    start += rows
+                    self.ready[worker_id].set()
+
+    def _block_views(self, block):
+        obs = np.ndarray((self.max_batch, self.row_size), dtype=np.float32, buffer=block.buf)
+        actions = np.ndarray((self.max_batch, self.action_dim), dtype=np.float32, buffer=block.buf, offset=obs.nbytes)
+        return obs, actions
+
+
+class InferenceClient:
+    """
+    Worker side handle of an InferenceServer.
+    """
+
+    def __init__(self, server: InferenceServer, worker_id: int):
+        self.worker_id = worker_id
+        self.teams = server.teams
+        self.layouts = {team: ObsLayout(server.observation_spaces[team]) for team in server.teams}
+        self.block_name = server.blocks[worker_id].name
+        self.max_batch = server.max_batch
+        self.row_size = server.row_size
+        self.action_dim = server.action_dim
+        self.requests = server.requests
+        self.ready = server.ready[worker_id]
+        self.versions = server.versions
+        self.heartbeat = server.heartbeat
+        self.server_process = server.process
+        self.owner_pid = os.getpid()
+        self.block = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["block"] = None
+        # only the process that started the server can ask its process object, the others go by the heartbeat
+        state["server_process"] = None
+        return state
+
+    def server_alive(self):
+        if self.server_process is not None and os.getpid() == self.owner_pid:
+            return self.server_process.is_alive()
+        return time.time() - self.heartbeat.value < HEARTBEAT_TIMEOUT
+
+    def predict(self, team: str, obs: Dict[str, np.ndarray], timeout: float = REQUEST_TIMEOUT):
+        """
+        Requests actions for a batch of observations of shape (n, *shape) per key.
+
+        Returns:
+            np.ndarray: Actions of shape (n, action_dim).
+
+        Raises:
+            InferenceServerError: If the server died while waiting.
+            TimeoutError: If the server didn't answer within timeout seconds.
+        """
+        if self.block is None:
+            # attach lazily so the handle can be pickled into another process
+            self.block = shared_memory.SharedMemory(name=self.block_name)
+            self.obs_view = np.ndarray((self.max_batch, self.row_size), dtype=np.float32, buffer=self.block.buf)
+            self.action_view = np.ndarray(
+                (self.max_batch, self.action_dim), dtype=np.float32, buffer=self.block.buf, offset=self.obs_view.nbytes
+            )
+
+        layout = self.layouts[team]
+        rows = len(obs[layout.keys[0]])
+        if rows > self.max_batch:
+            raise ValueError(f"Requested {rows} actions but the server was started with max_batch={self.max_batch}")
+        layout.pack(obs, self.obs_view[:rows, :layout.size])
+
+        self.ready.clear()
+        self.requests.put((self.worker_id, team, rows))
+        deadline = time.time() + timeout
+        while not self.ready.wait(min(ALIVE_CHECK_INTERVAL, max(deadline - time.time(), 0))):
+            if not self.server_alive():
+                raise InferenceServerError(f"Inference server died while worker {self.worker_id} waited for actions")
+            if time.time() >= deadline:
+                raise TimeoutError(f"Inference server didn't answer worker {self.worker_id} within {timeout} seconds")
+        return self.action_view[:rows].copy()
+
+    def weight_version(self, team: str):
+        return self.versions[self.teams.index(team)]
+
+    def policy(self, team: str):
+        """
+        Returns an object with an SB3 style predict() that can stand in for a team's model.
+        """
+        return RemotePolicy(self, team)
+
+
+class RemotePolicy:
+    """
+    SB3 style predict() backed by an InferenceClient.
+    """
+
+    def __init__(self, client: InferenceClient, team: str):
+        self.client = client
+        self.team = team
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=True):
+        return self.client.predict(self.team, observation), state
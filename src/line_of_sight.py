@@ -0,0 +1,268 @@
+import numpy as np
+
+# heights of the arena built by create_env
+# the floor is drawn at y=1, so agents stand on y=2 and walls occupy y=2 and y=3
+FLOOR_Y = 2.0
+WALL_TOP_Y = 4.0
+EYE_HEIGHT = 1.62
+AGENT_HEIGHT = 1.8
+AGENT_RADIUS = 0.3
+
+# Malmo's ObservationFromRay doesn't report blocks further away than this
+MAX_RAY_RANGE = 50.0
+
+# play_arena values that block sight
+# walls = 1
+# blocks = 2
+OPAQUE_CELLS = (1, 2)
+
+
+def facing_vector(yaw, pitch):
+    """
+    Converts Minecraft yaw and pitch (in degrees) into a horizontal unit direction and the slope of the ray.
+
+    Minecraft yaw 0 faces +z and yaw 90 faces -x. Positive pitch looks down.
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): Direction of shape (..., 2) as (x, z) and tan(pitch) of shape (...).
+    """
+    yaw = np.radians(np.asarray(yaw, dtype=np.float64))
+    pitch = np.radians(np.clip(np.asarray(pitch, dtype=np.float64), -89.9, 89.9))
+    direction = np.stack([-np.sin(yaw), np.cos(yaw)], axis=-1)
+    return direction, np.tan(pitch)
+
+
+def ray_reach(slope, eye_y=FLOOR_Y + EYE_HEIGHT, max_range: float = MAX_RAY_RANGE):
+    """
+    Horizontal distance a ray travels before it leaves the band between the floor and the top of the walls.
+
+    Looking down the ray ends on the floor. Looking up the ray passes over the walls and only sees the sky.
+    """
+    slope = np.asarray(slope, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        reach = np.where(
+            slope > 0,
+            (eye_y - FLOOR_Y) / slope,
+            np.where(slope < 0, (WALL_TOP_Y - eye_y) / -slope, np.inf),
+        )
+    return np.minimum(reach, max_range)
+
+
+def as_grids(grids):
+    """
+    Converts a single play_arena or a stack of equally sized play_arenas into an int array of shape (A, H, W).
+    """
+    grids = np.asarray(grids, dtype=np.int8)
+    if grids.ndim == 2:
+        grids = grids[np.newaxis]
+    return grids
+
+
+def opaque_lookup(grids, opaque=OPAQUE_CELLS):
+    """
+    Returns a boolean array of the same shape as grids marking every cell that blocks sight.
+    """
+    lookup = np.zeros(max(int(grids.max(initial=0)), max(opaque)) + 1, dtype=bool)
+    lookup[list(opaque)] = True
+    return lookup[grids]
+
+
+def cast_rays(grids, arena_index, origins, directions, max_dist, opaque=OPAQUE_CELLS, blocked=None):
+    """
+    Marches many rays through the arena grids at once using a DDA (Amanatides-Woo) traversal.
+
+    Every ray is advanced one cell boundary per iteration, all rays in lockstep, so the python loop only runs
+    for as many iterations as the longest ray crosses cells. The cell a ray starts in is never reported as a hit.
+
+    Arguments:
+        grids (array-like):
+            A play_arena or a stack of play_arenas of shape (A, H, W). Indexed as [z][x].
+        arena_index (array-like):
+            Index of the arena each ray is cast in, shape (N,). Ignored when a single grid is passed.
+        origins (np.ndarray):
+            Start of every ray as world (x, z) coordinates, shape (N, 2).
+        directions (np.ndarray):
+            Horizontal direction of every ray as (x, z), shape (N, 2). Doesn't have to be normalized.
+        max_dist (array-like):
+            Distance along the direction at which each ray stops, in units of the direction's length.
+        opaque (tuple[int]):
+            play_arena values that stop rays.
+        blocked (np.ndarray):
+            Precomputed opaque_lookup(grids, opaque). Saves rebuilding it when casting repeatedly.
+
+    Returns:
+        tuple(np.ndarray, np.ndarray, np.ndarray):
+            hit (N,) - Whether the ray stopped on an opaque cell.
+            cells (N, 2) - (x, z) of the cell that was hit, -1 if nothing was hit.
+            dist (N,) - Distance to the boundary of the hit cell, inf if nothing was hit.
+    """
+    grids = as_grids(grids)
+    if blocked is None:
+        blocked = opaque_lookup(grids, opaque)
+    num_arenas, height, width = grids.shape
+
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 2)
+    num_rays = len(origins)
+    arena_index = np.broadcast_to(np.asarray(arena_index if num_arenas > 1 else 0, dtype=np.intp), (num_rays,))
+    max_dist = np.broadcast_to(np.asarray(max_dist, dtype=np.float64), (num_rays,))
+
+    cell = np.floor(origins).astype(np.intp)
+    step = np.sign(directions).astype(np.intp)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_delta = np.where(directions != 0, np.abs(1.0 / directions), np.inf)
+        boundary = np.where(step > 0, cell + 1, cell)
+        t_max = np.where(directions != 0, (boundary - origins) / directions, np.inf)
+
+    hit = np.zeros(num_rays, dtype=bool)
+    hit_cells = np.full((num_rays, 2), -1, dtype=np.intp)
+    hit_dist = np.full(num_rays, np.inf)
+
+    # rays are dropped from the working set as soon as they hit, leave the grid or run out of distance
+    active = np.flatnonzero(max_dist > 0)
+    while len(active) > 0:
+        axis = (t_max[active, 1] < t_max[active, 0]).astype(np.intp)
+        t = t_max[active, axis]
+        cell[active, axis] += step[active, axis]
+        t_max[active, axis] += t_delta[active, axis]
+
+        x = cell[active, 0]
+        z = cell[active, 1]
+        alive = (t < max_dist[active]) & (x >= 0) & (x < width) & (z >= 0) & (z < height)
+        active = active[alive]
+        t = t[alive]
+
+        stopped = blocked[arena_index[active], cell[active, 1], cell[active, 0]]
+        stopped_rays = active[stopped]
+        hit[stopped_rays] = True
+        hit_cells[stopped_rays] = cell[stopped_rays]
+        hit_dist[stopped_rays] = t[stopped]
+        active = active[~stopped]
+
+    return hit, hit_cells, hit_dist
+
+
+def segment_clear(grids, arena_index, starts, ends, opaque=OPAQUE_CELLS, blocked=None):
+    """
+    Checks if the straight lines between pairs of points are free of opaque cells.
+
+    The cell containing the end point may itself be opaque, which makes walls count as visible.
+
+    Returns:
+        np.ndarray: Boolean array of shape (N,).
+    """
+    starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+    hit, cells, _ = cast_rays(grids, arena_index, starts, ends - starts, 1.0, opaque, blocked)
+    return ~hit | np.all(cells == np.floor(ends).astype(np.intp), axis=1)
+
+
+def can_see(
+    grids,
+    arena_index,
+    seeker_pos,
+    yaw,
+    pitch,
+    hider_pos,
+    max_range: float = MAX_RAY_RANGE,
+    opaque=OPAQUE_CELLS,
+    blocked=None,
+):
+    """
+    Checks if the cursor ray of seekers lands on hiders, the same test Malmo's LineOfSight observation does.
+
+    All arguments are broadcast against each other, so pairs, one seeker against many hiders or full
+    seeker x hider matrices can be checked in a single call.
+
+    Arguments:
+        grids (array-like):
+            A play_arena or a stack of play_arenas of shape (A, H, W).
+        arena_index (array-like):
+            Arena every pair is in. Ignored when a single grid is passed.
+        seeker_pos (np.ndarray):
+            World (x, z) of the seekers, shape (..., 2).
+        yaw (array-like):
+            Yaw of the seekers in degrees, shape (...).
+        pitch (array-like):
+            Pitch of the seekers in degrees, shape (...).
+        hider_pos (np.ndarray):
+            World (x, z) of the hiders, shape (..., 2).
+        max_range (float):
+            Maximum distance the cursor ray reaches.
+
+    Returns:
+        np.ndarray: Boolean array with the broadcast shape of the inputs.
+    """
+    seeker_pos = np.asarray(seeker_pos, dtype=np.float64)
+    hider_pos = np.asarray(hider_pos, dtype=np.float64)
+    direction, slope = facing_vector(yaw, pitch)
+    shape = np.broadcast_shapes(seeker_pos.shape[:-1], hider_pos.shape[:-1], direction.shape[:-1], np.shape(arena_index))
+
+    seeker_pos = np.broadcast_to(seeker_pos, shape + (2,)).reshape(-1, 2)
+    hider_pos = np.broadcast_to(hider_pos, shape + (2,)).reshape(-1, 2)
+    direction = np.broadcast_to(direction, shape + (2,)).reshape(-1, 2)
+    slope = np.broadcast_to(slope, shape).reshape(-1)
+    arena_index = np.broadcast_to(arena_index, shape).reshape(-1)
+
+    # closest approach of the horizontal ray to the hider's vertical axis
+    offset = hider_pos - seeker_pos
+    along = np.einsum("ij,ij->i", offset, direction)
+    across = np.abs(offset[:, 0] * direction[:, 1] - offset[:, 1] * direction[:, 0])
+    entry = along - np.sqrt(np.maximum(AGENT_RADIUS ** 2 - across ** 2, 0.0))
+
+    # height of the ray where it enters the hider's body
+    ray_y = FLOOR_Y + EYE_HEIGHT - slope * entry
+    in_body = (ray_y >= FLOOR_Y) & (ray_y <= FLOOR_Y + AGENT_HEIGHT)
+    in_reach = (entry > 0) & (entry <= ray_reach(slope, max_range=max_range) + AGENT_RADIUS)
+    candidates = (across <= AGENT_RADIUS) & in_body & in_reach
+
+    # only the candidates have to be ray marched for occluders between seeker and hider
+    seen = np.zeros(len(candidates), dtype=bool)
+    index = np.flatnonzero(candidates)
+    if len(index) > 0:
+        hit, _, hit_dist = cast_rays(grids, arena_index[index], seeker_pos[index], direction[index], entry[index], opaque, blocked)
+        seen[index] = ~hit | (hit_dist >= entry[index])
+    return seen.reshape(shape)
+
+
+def visible_cells(grid, pos, yaw=None, fov: float = None, max_range: float = MAX_RAY_RANGE, opaque=OPAQUE_CELLS, blocked=None):
+    """
+    Finds every cell of a play_arena whose centre can be seen from a position.
+
+    Arguments:
+        grid (array-like):
+            play_arena to check, indexed as [z][x].
+        pos (tuple[float, float]):
+            World (x, z) the cells are viewed from.
+        yaw (float):
+            Yaw of the viewer in degrees. Only used together with fov.
+        fov (float):
+            Horizontal field of view in degrees. None sees all around.
+        max_range (float):
+            Cells further away than this aren't visible.
+
+    Returns:
+        np.ndarray: Boolean array of shape (H, W).
+    """
+    grid = as_grids(grid)[:1]
+    height, width = grid.shape[1:]
+    if blocked is None:
+        blocked = opaque_lookup(grid, opaque)
+    pos = np.asarray(pos, dtype=np.float64)
+
+    z, x = np.mgrid[0:height, 0:width]
+    centres = np.stack([x.ravel() + 0.5, z.ravel() + 0.5], axis=-1)
+    offsets = centres - pos
+    dist = np.hypot(offsets[:, 0], offsets[:, 1])
+
+    candidates = dist <= max_range
+    if fov is not None and yaw is not None:
+        direction, _ = facing_vector(yaw, 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cos_angle = (offsets @ direction) / dist
+        candidates &= (dist == 0) | (cos_angle >= np.cos(np.radians(fov / 2)))
+
+    visible = np.zeros(len(centres), dtype=bool)
+    index = np.flatnonzero(candidates)
+    visible[index] = segment_clear(grid, 0, np.broadcast_to(pos, (len(index), 2)), centres[index], opaque, blocked)
+    return visible.reshape(height, width)
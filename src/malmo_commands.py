@@ -0,0 +1,22 @@
+from typing import List
+
+# ContinuousMovementCommands that end an agent's movement
+STOP_COMMANDS = ("move 0", "turn 0", "pitch 0")
+
+
+def move_commands(action) -> List[str]:
+    """
+    ContinuousMovementCommands of the (move, turn, pitch, interact) action an agent takes.
+    """
+    return [f"move {action[0]}", f"turn {action[1]}", f"pitch {action[2]}"]
+
+
+def stop_commands() -> List[str]:
+    return list(STOP_COMMANDS)
+
+
+def interact_command(hider: bool) -> str:
+    """
+    Hiders place the dirt they hold, seekers dig up the block they look at.
+    """
+    return "use 1" if hider else "attack 1"
@@ -0,0 +1,179 @@
+import socket
+import time
+from typing import Callable, Dict, List
+
+try:
+    from malmo import MalmoPython
+except:
+    import MalmoPython
+
+from multi_agent_helper import MissionStartError, safeStartMission, safeWaitForStart
+
+
+class ClientHungError(Exception):
+    """
+    Raised when a running mission stops delivering observations or reports world state errors.
+    """
+
+    def __init__(self, agent_id: str, reason: str):
+        super().__init__(f"{agent_id}: {reason}")
+        self.agent_id = agent_id
+        self.reason = reason
+
+
+def port_alive(host: str, port: int, timeout: float = 1.0):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class MissionSupervisor:
+    """
+    Keeps missions running when Minecraft clients die or hang instead of ending the training run.
+
+    Missions are started through start_mission(), which retries failed starts after checking every client of
+    the pool. Clients whose port stopped answering are restarted with restart_client if one is given, and
+    replaced with a spare port if they don't come back. Envs report hung clients with report_failure(), which
+    makes the next reset start a fresh mission while the models and their replay buffers stay in memory.
+    """
+
+    def __init__(
+        self,
+        ports: List[int],
+        host: str = "127.0.0.1",
+        spare_ports: List[int] = (),
+        restart_client: Callable[[int], None] = None,
+        max_retries: int = 5,
+        restart_timeout: float = 120.0,
+        start_timeout: float = 120.0,
+        observation_deadline: float = 30.0,
+    ):
+        """
+        Arguments:
+            ports (list[int]):
+                Ports of the clients the missions run on, one per agent plus the observer.
+            host (str):
+                Host of the clients.
+            spare_ports (list[int]):
+                Ports of extra clients that replace clients that can't be restarted.
+            restart_client (callable):
+                Takes the port of a dead client and relaunches it, for example by running launchClient.sh.
+                None waits for the client to come back by itself.
+            max_retries (int):
+                Number of failed mission starts in a row before giving up.
+            restart_timeout (float):
+                Seconds to wait for a restarted client to accept connections.
+            start_timeout (float):
+                Seconds to wait for every agent to see the mission begin.
+            observation_deadline (float):
+                Seconds a running mission may go without a new observation before its client counts as hung.
+        """
+        self.ports = list(ports)
+        self.host = host
+        self.spare_ports = list(spare_ports)
+        self.restart_client = restart_client
+        self.max_retries = max_retries
+        self.restart_timeout = restart_timeout
+        self.start_timeout = start_timeout
+        self.observation_deadline = observation_deadline
+
+        ### Supervisor State ###
+        self.needs_restart = False
+        self.mission_restarts = 0
+        self.client_restarts = 0
+        self.client_replacements = 0
+        self.failures = 0
+        self.lost_steps = 0
+
+    def client_pool(self):
+        client_pool = MalmoPython.ClientPool()
+        for port in self.ports:
+            client_pool.add(MalmoPython.ClientInfo(self.host, port))
+        return client_pool
+
+    def start_mission(self, agent_hosts: Dict[str, object], mission, record_specs: Dict[str, object], experiment_id_fn: Callable[[], str]):
+        """
+        Starts a mission for every agent host, in order of their role, retrying with repaired clients on failure.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._start(agent_hosts, mission, record_specs, experiment_id_fn())
+                self.needs_restart = False
+                return
+            except MissionStartError as e:
+                print(f"mission start failed ({e}), attempt {attempt + 1} of {self.max_retries + 1}")
+                self.mission_restarts += 1
+                for agent_host in agent_hosts.values():
+                    agent_host.sendCommand("quit")
+                self.repair_clients()
+        raise MissionStartError(f"Mission couldn't be started after {self.max_retries + 1} attempts")
+
+    def _start(self, agent_hosts, mission, record_specs, experiment_id):
+        client_pool = self.client_pool()
+        for agent_id, agent in enumerate(agent_hosts.keys()):
+            time.sleep(1)
+            safeStartMission(agent_hosts[agent], mission, client_pool, record_specs[agent], agent_id, experiment_id)
+            time.sleep(1)
+        safeWaitForStart(agent_hosts.values(), time_out=self.start_timeout)
+
+    def repair_clients(self):
+        """
+        Restarts clients that stopped accepting connections and swaps in spare clients for those that stay down.
+        """
+        for index, port in enumerate(self.ports):
+            if port_alive(self.host, port):
+                continue
+            print(f"client on port {port} is down")
+            if self.restart_client is not None:
+                self.restart_client(port)
+                self.client_restarts += 1
+            if self.wait_for_client(port):
+                continue
+            while len(self.spare_ports) > 0:
+                spare = self.spare_ports.pop(0)
+                if port_alive(self.host, spare):
+                    print(f"replacing client on port {port} with spare client on port {spare}")
+                    self.ports[index] = spare
+                    self.client_replacements += 1
+                    break
+
+    def wait_for_client(self, port: int):
+        deadline = time.time() + self.restart_timeout
+        while time.time() < deadline:
+            if port_alive(self.host, port):
+                return True
+            time.sleep(1)
+        return False
+
+    def check_world_state(self, agent_id: str, world_state, last_observation_time: float):
+        """
+        Raises ClientHungError if a running mission reported errors or went quiet for too long.
+        """
+        if len(world_state.errors) > 0:
+            raise ClientHungError(agent_id, "; ".join(error.text for error in world_state.errors))
+        if time.time() - last_observation_time > self.observation_deadline:
+            raise ClientHungError(agent_id, f"no observation for {self.observation_deadline} seconds")
+
+    def report_failure(self, error: ClientHungError, lost_steps: int):
+        """
+        Records a failed client and makes the next reset restart the mission.
+
+        Arguments:
+            lost_steps (int):
+                Agent steps of the episode the failure cut short.
+        """
+        print(f"client failure: {error}")
+        self.failures += 1
+        self.lost_steps += lost_steps
+        self.needs_restart = True
+
+    def stats(self):
+        return {
+            "mission_restarts": self.mission_restarts,
+            "client_restarts": self.client_restarts,
+            "client_replacements": self.client_replacements,
+            "failures": self.failures,
+            "lost_steps": self.lost_steps,
+        }
@@ -5,6 +5,16 @@ except:
 import time
 
 
+class MissionStartError(Exception):
+    """
+    Raised when a mission couldn't be started, for example because a Minecraft client died.
+    """
+
+
+class MissionStartTimeout(MissionStartError):
+    pass
+
+
 def safeStartMission(agent_host, my_mission, my_client_pool, my_mission_record, role, expId):
     used_attempts = 0
     max_attempts = 5
@@ -34,18 +44,17 @@ def safeStartMission(agent_host, my_mission, my_client_pool, my_mission_record,
             else:
                 print("Other error:", e.message)
                 print("Waiting will not help here - bailing immediately.")
-                exit(1)
+                raise MissionStartError(f"startMission failed for role {role}: {e.message}") from e
         if used_attempts == max_attempts:
             print("All chances used up - bailing now.")
-            exit(1)
+            raise MissionStartError(f"startMission failed for role {role} after {max_attempts} attempts")
     print("startMission called okay.")
 
 
-def safeWaitForStart(agent_hosts):
+def safeWaitForStart(agent_hosts, time_out=120):
     print("Waiting for the mission to start", end=' ')
     start_flags = [False for a in agent_hosts]
     start_time = time.time()
-    time_out = 120  # Allow a two minute timeout.
     while not all(start_flags) and time.time() - start_time < time_out:
         states = [a.peekWorldState() for a in agent_hosts]
         start_flags = [w.has_mission_begun for w in states]
@@ -55,11 +64,11 @@ def safeWaitForStart(agent_hosts):
             for e in errors:
                 print(e.text)
             print("Bailing now.")
-            exit(1)
+            raise MissionStartError("Errors waiting for mission start: " + "; ".join(e.text for e in errors))
         time.sleep(0.1)
         print(".", end=' ')
     if time.time() - start_time >= time_out:
         print("Timed out while waiting for mission to start - bailing.")
-        exit(1)
+        raise MissionStartTimeout(f"Mission didn't start within {time_out} seconds")
     print()
     print("Mission has started.")
\ No newline at end of file
@@ -0,0 +1,222 @@
+from typing import NamedTuple
+
+import numpy as np
+import torch as th
+import torch.nn.functional as F
+from stable_baselines3 import SAC
+from stable_baselines3.common.buffers import DictReplayBuffer
+from stable_baselines3.common.type_aliases import TensorDict
+from stable_baselines3.common.utils import polyak_update
+
+from segment_tree import MinSegmentTree, SumSegmentTree
+
+
+class PrioritizedDictReplayBufferSamples(NamedTuple):
+    observations: TensorDict
+    actions: th.Tensor
+    next_observations: TensorDict
+    dones: th.Tensor
+    rewards: th.Tensor
+    weights: th.Tensor
+    indices: np.ndarray
+
+
+class PrioritizedDictReplayBuffer(DictReplayBuffer):
+    """
+    Proportional prioritized replay (Schaul et al. 2016) for Dict observations.
+
+    Every (position, env) slot of the buffer is a leaf of a sum tree and a min tree holding priority ** alpha.
+    New transitions enter with the highest priority seen so far, or with |reward| if that is larger, so the rare
+    large "hider found" rewards are replayed often before their TD error is even known.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space,
+        action_space,
+        device="auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        beta_increment: float = 1e-4,
+        epsilon: float = 1e-6,
+    ):
+        """
+        Arguments:
+            alpha (float):
+                How strongly priorities skew sampling. 0 is uniform sampling.
+            beta (float):
+                Initial strength of the importance sampling correction, annealed towards 1.
+            beta_increment (float):
+                Amount beta grows every time a batch is sampled.
+            epsilon (float):
+                Added to every priority so every transition keeps a chance of being sampled.
+        """
+        super().__init__(
+            buffer_size,
+            observation_space,
+            action_space,
+            device=device,
+            n_envs=n_envs,
+            optimize_memory_usage=optimize_memory_usage,
+            handle_timeout_termination=handle_timeout_termination,
+        )
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.max_priority = 1.0
+        self.sum_tree = SumSegmentTree(self.buffer_size * self.n_envs)
+        self.min_tree = MinSegmentTree(self.buffer_size * self.n_envs)
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        leaves = self.pos * self.n_envs + np.arange(self.n_envs)
+        super().add(obs, next_obs, action, reward, done, infos)
+        self.set_initial_priorities(leaves, reward)
+
+    def set_initial_priorities(self, leaves, rewards):
+        """
+        Gives freshly written slots the highest priority seen so far, or |reward| if that is larger.
+        Also used by bulk fills that write the buffer arrays directly.
+        """
+        priorities = np.maximum(self.max_priority, np.abs(np.asarray(rewards, dtype=np.float64)).reshape(-1))
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self._set_priorities(np.asarray(leaves).reshape(-1), priorities)
+
+    def sample(self, batch_size: int, env=None) -> PrioritizedDictReplayBufferSamples:
+        upper_bound = (self.buffer_size if self.full else self.pos) * self.n_envs
+
+        # stratified sampling: one draw from each of batch_size equal slices of the total priority mass
+        total = self.sum_tree.reduce()
+        segment = total / batch_size
+        prefixsums = (np.arange(batch_size) + np.random.uniform(size=batch_size)) * segment
+        leaves = np.minimum(self.sum_tree.find_prefixsum_index(prefixsums), upper_bound - 1)
+
+        # importance sampling weights, normalized by the largest possible weight
+        probabilities = self.sum_tree[leaves] / total
+        min_probability = self.min_tree.reduce() / total
+        weights = (probabilities / min_probability) ** -self.beta
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return self._get_prioritized_samples(leaves, weights, env)
+
+    def update_priorities(self, leaves, priorities):
+        priorities = np.abs(np.asarray(priorities, dtype=np.float64)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self._set_priorities(leaves, priorities)
+
+    def _set_priorities(self, leaves, priorities):
+        self.sum_tree.update(leaves, priorities ** self.alpha)
+        self.min_tree.update(leaves, priorities ** self.alpha)
+
+    def _get_prioritized_samples(self, leaves, weights, env=None) -> PrioritizedDictReplayBufferSamples:
+        batch_inds, env_indices = np.divmod(leaves, self.n_envs)
+
+        obs_ = self._normalize_obs({key: obs[batch_inds, env_indices] for key, obs in self.observations.items()}, env)
+        next_obs_ = self._normalize_obs({key: obs[batch_inds, env_indices] for key, obs in self.next_observations.items()}, env)
+
+        return PrioritizedDictReplayBufferSamples(
+            observations={key: self.to_torch(obs) for key, obs in obs_.items()},
+            actions=self.to_torch(self.actions[batch_inds, env_indices]),
+            next_observations={key: self.to_torch(obs) for key, obs in next_obs_.items()},
+            dones=self.to_torch(self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            rewards=self.to_torch(self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env)),
+            weights=self.to_torch(weights.astype(np.float32)).reshape(-1, 1),
+            indices=leaves,
+        )
+
+
+class PrioritizedSAC(SAC):
+    """
+    SAC that weights the critic loss with importance sampling weights and feeds TD errors back as priorities
+    when it is given a PrioritizedDictReplayBuffer. With any other buffer it trains exactly like SAC.
+    """
+
+    def train(self, gradient_steps: int, batch_size: int = 64) -> None:
+        if not isinstance(self.replay_buffer, PrioritizedDictReplayBuffer):
+            return super().train(gradient_steps, batch_size)
+
+        self.policy.set_training_mode(True)
+        optimizers = [self.actor.optimizer, self.critic.optimizer]
+        if self.ent_coef_optimizer is not None:
+            optimizers += [self.ent_coef_optimizer]
+        self._update_learning_rate(optimizers)
+
+        ent_coef_losses, ent_coefs = [], []
+        actor_losses, critic_losses = [], []
+
+        for gradient_step in range(gradient_steps):
+            replay_data = self.replay_buffer.sample(batch_size, env=self._vec_normalize_env)
+
+            if self.use_sde:
+                self.actor.reset_noise()
+
+            actions_pi, log_prob = self.actor.action_log_prob(replay_data.observations)
+            log_prob = log_prob.reshape(-1, 1)
+
+            ent_coef_loss = None
+            if self.ent_coef_optimizer is not None:
+                ent_coef = th.exp(self.log_ent_coef.detach())
+                ent_coef_loss = -(self.log_ent_coef * (log_prob + self.target_entropy).detach()).mean()
+                ent_coef_losses.append(ent_coef_loss.item())
+            else:
+                ent_coef = self.ent_coef_tensor
+            ent_coefs.append(ent_coef.item())
+
+            if ent_coef_loss is not None:
+                self.ent_coef_optimizer.zero_grad()
+                ent_coef_loss.backward()
+                self.ent_coef_optimizer.step()
+
+            with th.no_grad():
+                next_actions, next_log_prob = self.actor.action_log_prob(replay_data.next_observations)
+                next_q_values = th.cat(self.critic_target(replay_data.next_observations, next_actions), dim=1)
+                next_q_values, _ = th.min(next_q_values, dim=1, keepdim=True)
+                next_q_values = next_q_values - ent_coef * next_log_prob.reshape(-1, 1)
+                target_q_values = replay_data.rewards + (1 - replay_data.dones) * self.gamma * next_q_values
+
+            current_q_values = self.critic(replay_data.observations, replay_data.actions)
+
+            # importance sampling weights correct for the bias prioritized sampling introduces
+            critic_loss = 0.5 * sum(
+                (replay_data.weights * F.mse_loss(current_q, target_q_values, reduction="none")).mean()
+                for current_q in current_q_values
+            )
+            critic_losses.append(critic_loss.item())
+
+            self.critic.optimizer.zero_grad()
+            critic_loss.backward()
+            self.critic.optimizer.step()
+
+            # new priorities are the TD errors averaged over the critics
+            with th.no_grad():
+                td_errors = th.stack([th.abs(current_q - target_q_values) for current_q in current_q_values]).mean(dim=0)
+            self.replay_buffer.update_priorities(replay_data.indices, td_errors.cpu().numpy().reshape(-1))
+
+            q_values_pi = th.cat(self.critic(replay_data.observations, actions_pi), dim=1)
+            min_qf_pi, _ = th.min(q_values_pi, dim=1, keepdim=True)
+            actor_loss = (ent_coef * log_prob - min_qf_pi).mean()
+            actor_losses.append(actor_loss.item())
+
+            self.actor.optimizer.zero_grad()
+            actor_loss.backward()
+            self.actor.optimizer.step()
+
+            if gradient_step % self.target_update_interval == 0:
+                polyak_update(self.critic.parameters(), self.critic_target.parameters(), self.tau)
+                # running batch norm stats are only tracked by newer SB3 releases
+                if hasattr(self, "batch_norm_stats"):
+                    polyak_update(self.batch_norm_stats, self.batch_norm_stats_target, 1.0)
+
+        self._n_updates += gradient_steps
+
+        self.logger.record("train/n_updates", self._n_updates, exclude="tensorboard")
+        self.logger.record("train/ent_coef", np.mean(ent_coefs))
+        self.logger.record("train/actor_loss", np.mean(actor_losses))
+        self.logger.record("train/critic_loss", np.mean(critic_losses))
+        self.logger.record("train/per_beta", self.replay_buffer.beta)
+        if len(ent_coef_losses) > 0:
+            self.logger.record("train/ent_coef_loss", np.mean(ent_coef_losses))
@@ -307,7 +307,7 @@ class HideAndSeekMission:
         # blocks = 2
         # stairs = 3
         # agents = 4
-        env, env_map = create_env(
+        env, env_map, _ = create_env(
             arena_size,
             is_closed_arena,
             env_type,
@@ -197,7 +197,7 @@ class HideAndSeekMission(DummyVecEnv):
         """
 
         # generate environment and map for environment (doesn't include outer walls)
-        env, env_map = create_env(
+        env, env_map, _ = create_env(
             arena_size,
             is_closed_arena,
             env_type,
@@ -0,0 +1,151 @@
+from typing import Dict, List
+
+import numpy as np
+
+from line_of_sight import can_see
+
+# reward terms of a step, tuned by overriding them in HideAndSeekMission's config
+DEFAULT_REWARD_WEIGHTS = {
+    "seeker_found_hider": 100,
+    "hider_found": -50,
+    "explore_cell": 1,
+    "stare_at_sky": 0,
+}
+
+
+class Referee:
+    """
+    Computes the rewards of every agent of a mission once per tick.
+
+    Agents report what they observed this tick, which hiders their cursor ray hit, whether they entered a new
+    cell and whether they stared at the sky. judge() then builds the seeker x hider detection matrix of the
+    tick and derives every agent's reward from it in one pass, so rewards no longer depend on the order the
+    agents are stepped in.
+
+    A seeker is rewarded once per hider it finds in an episode. A hider is penalized every tick a seeker newly
+    detects it. Only agents that reported this tick are rewarded, in phased training only one team steps at a
+    time. Detections are still checked geometrically from the last known pose of every seeker, so a hider that
+    walks into the sight of an idle seeker is found. A hider found while it was idle is penalized the next time
+    it reports, its hiding spot is what the seekers found.
+    """
+
+    def __init__(self, hider_ids: List[str], seeker_ids: List[str], reward_weights: Dict[str, float] = None):
+        self.hider_ids = list(hider_ids)
+        self.seeker_ids = list(seeker_ids)
+        self.hider_index = {agent_id: i for i, agent_id in enumerate(self.hider_ids)}
+        self.seeker_index = {agent_id: i for i, agent_id in enumerate(self.seeker_ids)}
+        self.reward_weights = reward_weights if reward_weights is not None else DEFAULT_REWARD_WEIGHTS
+        self.grid = None
+        self.reset()
+
+    def reset(self, grid=None):
+        """
+        Starts a new episode.
+
+        Arguments:
+            grid (list[list[int]]):
+                play_arena of the episode. When given, detections are also checked geometrically from the agents'
+                poses, which catches hiders standing behind the one Malmo's LineOfSight reports.
+        """
+        self.grid = grid
+        # (seeker, hider) pairs that already paid out this episode
+        self.found = np.zeros((len(self.seeker_ids), len(self.hider_ids)), dtype=bool)
+        self.poses = np.zeros((len(self.hider_ids) + len(self.seeker_ids), 5), dtype=np.float64)
+        # whether an agent reported a pose this episode, hiders come first like in poses
+        self.posed = np.zeros(len(self.poses), dtype=bool)
+        # finds of every hider whose penalty waits for the hider's next report
+        self.unpaid_finds = np.zeros(len(self.hider_ids), dtype=np.int64)
+        self._clear_reports()
+
+    def _clear_reports(self):
+        self.reported = set()
+        self.spotted = np.zeros((len(self.seeker_ids), len(self.hider_ids)), dtype=bool)
+        self.new_cell = np.zeros(len(self.seeker_ids), dtype=bool)
+        self.sky = {}
+
+    def report(self, agent_id: str, pose=None, spotted: str = None, new_cell: bool = False, sky: bool = False):
+        """
+        Adds what an agent observed this tick.
+
+        Arguments:
+            agent_id (str):
+                Name of the reporting agent.
+            pose (array-like):
+                (x, y, z, yaw, pitch) of the agent.
+            spotted (str):
+                Name of the hider the seeker's cursor ray hit, if any.
+            new_cell (bool):
+                Whether the seeker entered a cell it hadn't visited before.
+            sky (bool):
+                Whether the agent's cursor ray didn't hit anything.
+        """
+        self.reported.add(agent_id)
+        self.sky[agent_id] = sky
+        if pose is not None:
+            self.poses[self._pose_index(agent_id)] = pose
+            self.posed[self._pose_index(agent_id)] = True
+        if agent_id in self.seeker_index:
+            seeker = self.seeker_index[agent_id]
+            self.new_cell[seeker] |= new_cell
+            if spotted in self.hider_index:
+                self.spotted[seeker, self.hider_index[spotted]] = True
+
+    def detections(self):
+        """
+        Seeker x hider matrix of the hiders seen this tick, by the cursor rays the seekers reported and from the
+        last known poses of the agents.
+        """
+        detected = self.spotted.copy()
+        if self.grid is not None and len(self.hider_ids) > 0:
+            seekers = self.poses[len(self.hider_ids):]
+            hiders = self.poses[:len(self.hider_ids)]
+            geometric = can_see(
+                self.grid,
+                0,
+                seekers[:, None, [0, 2]],
+                seekers[:, None, 3],
+                seekers[:, None, 4],
+                hiders[None, :, [0, 2]],
+            )
+            hiders_posed = self.posed[:len(self.hider_ids)]
+            seekers_posed = self.posed[len(self.hider_ids):]
+            detected |= geometric & seekers_posed[:, None] & hiders_posed[None, :]
+        return detected
+
+    def judge(self):
+        """
+        Computes the rewards of the tick and clears the reports.
+
+        Returns:
+            dict[str, float]: Reward of every agent that reported this tick.
+        """
+        weights = self.reward_weights
+        newly_found = self.detections() & ~self.found
+        self.found |= newly_found
+
+        seeker_rewards = (
+            newly_found.sum(axis=1) * weights["seeker_found_hider"]
+            + self.new_cell * weights["explore_cell"]
+        )
+        hider_finds = newly_found.sum(axis=0) + self.unpaid_finds
+        hiders_reported = np.array([agent_id in self.reported for agent_id in self.hider_ids], dtype=bool)
+        self.unpaid_finds = np.where(hiders_reported, 0, hider_finds)
+        hider_rewards = hider_finds * weights["hider_found"]
+        all_rewards = {
+            **dict(zip(self.seeker_ids, seeker_rewards.tolist())),
+            **dict(zip(self.hider_ids, hider_rewards.tolist())),
+        }
+
+        rewards = {}
+        for agent_id in self.reported:
+            rewards[agent_id] = float(all_rewards[agent_id]) + weights["stare_at_sky"] * self.sky[agent_id]
+        self._clear_reports()
+        return rewards
+
+    def any_found(self):
+        return bool(self.found.any())
+
+    def _pose_index(self, agent_id: str):
+        if agent_id in self.hider_index:
+            return self.hider_index[agent_id]
+        return len(self.hider_ids) + self.seeker_index[agent_id]
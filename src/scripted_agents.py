@@ -0,0 +1,451 @@
+import time
+
+import numpy as np
+
+from distance_field import UNREACHABLE, get_distance_field
+from referee import Referee
+from simulator import Simulator
+from visibility_index import get_visibility_index
+
+# a full turn command turns the agent by this many degrees during the 0.5 second movement window
+TURN_DEGREES_PER_STEP = 180.0
+# blocks a full move command walks during the movement window
+WALK_BLOCKS_PER_STEP = 2.15
+# headings closer than this count as facing the target
+FACING_TOLERANCE = 10.0
+# pitch that puts the cursor on the floor of the cell in front of the agent, where placed dirt ends up
+FLOOR_PITCH = 50.0
+# a step makes no progress when the agent walks less than this fraction of what its forward command asked for
+STALL_FRACTION = 0.2
+# steps without progress after which the seeker takes the cell it walks into for dirt
+STALL_STEPS = 2
+# extra steps a way around dirt may take before the seeker digs through it instead
+DETOUR_STEPS = 4
+# times an agent digs or places a block that doesn't show up on the map before it gives up on that block
+INTERACT_ATTEMPTS = 3
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def heading_to(pose, target):
+    """
+    Minecraft yaw that faces the (x, z) target from pose, yaw 0 faces +z and yaw 90 faces -x.
+    """
+    return float(np.degrees(np.arctan2(-(target[0] - pose[0]), target[1] - pose[2])))
+
+
+def angle_error(target, current):
+    return float((target - current + 180.0) % 360.0 - 180.0)
+
+
+class ScriptedAgent:
+    """
+    Base of the scripted agents. Walks along the shortest path of the arena's DistanceField and turns with the
+    same (move, turn, pitch, interact) actions SingleAgentEnv takes, so it drives any agent a model could.
+    """
+
+    def reset(self, play_arena, layout=None):
+        """
+        Starts an episode on a new arena.
+
+        Arguments:
+            play_arena (list[list[int]]):
+                2D map of the agent's arena, indexed as [z][x].
+            layout (ArenaLayout):
+                Rooms and doors of the arena, if the generator recorded them.
+        """
+        self.field = get_distance_field(play_arena)
+        self.visibility = get_visibility_index(play_arena)
+        self.layout = layout
+        # dirt of the arena's map the last time the agent saw it
+        self.map_dirt = np.asarray(play_arena) == 2
+
+    def act(self, pose):
+        """
+        Returns the action for a (x, y, z, yaw, pitch) pose in arena coordinates.
+        """
+        raise NotImplementedError
+
+    def observe(self, play_arena):
+        """
+        Sees the arena's current map, as patched with what the agents observe during the episode. Blocks the agent
+        digs or places only count once they show up here.
+        """
+        # only changes of the map are taken over, what the agent learned by itself isn't on the map until someone sees it
+        dirt = np.asarray(play_arena) == 2
+        for z, x in np.argwhere(dirt != self.map_dirt):
+            self.set_cell(int(x), int(z), 2 if dirt[z, x] else 0)
+        self.map_dirt = dirt
+
+    def set_cell(self, x: int, z: int, value: int):
+        self.field.set_cell(x, z, value)
+
+    def cell(self, pose):
+        return tuple(int(v) for v in self.field.cells([pose[0], pose[2]]))
+
+    def neighbours(self, x: int, z: int):
+        return [
+            (x + dx, z + dz) for dx, dz in NEIGHBOURS
+            if 0 <= x + dx < self.field.width and 0 <= z + dz < self.field.height
+        ]
+
+    def steer(self, pose, target, pitch: float = 0.0, move: bool = True):
+        """
+        Turns towards the (x, z) target and walks forward once roughly facing it.
+        """
+        yaw_error = angle_error(heading_to(pose, target), pose[3])
+        distance = np.hypot(target[0] - pose[0], target[1] - pose[2])
+        forward = np.clip(np.cos(np.radians(yaw_error)), 0.0, 1.0) * min(distance / WALK_BLOCKS_PER_STEP, 1.0) if move else 0.0
+        return np.array([
+            forward,
+            np.clip(yaw_error / TURN_DEGREES_PER_STEP, -1.0, 1.0),
+            np.clip((pitch - pose[4]) / TURN_DEGREES_PER_STEP, -1.0, 1.0),
+            -1.0,
+        ], dtype=np.float32)
+
+    def facing(self, pose, target, pitch: float = 0.0):
+        yaw_error = angle_error(heading_to(pose, target), pose[3])
+        return abs(yaw_error) < FACING_TOLERANCE and abs(pitch - pose[4]) < FACING_TOLERANCE
+
+    def walk_to(self, pose, target_cell):
+        """
+        Steers to the next cell on the shortest path to target_cell, (x, z).
+        """
+        cell = self.cell(pose)
+        to_target = self.field.field(*target_cell)
+        waypoint = target_cell
+        if cell != tuple(target_cell) and to_target[cell[1], cell[0]] != UNREACHABLE:
+            waypoint = min(self.neighbours(*cell), key=lambda n: to_target[n[1], n[0]])
+        self.waypoint = tuple(waypoint)
+        return self.steer(pose, (waypoint[0] + 0.5, waypoint[1] + 0.5))
+
+    def look_around(self, pose):
+        return np.array([0.0, 1.0, np.clip(-pose[4] / TURN_DEGREES_PER_STEP, -1.0, 1.0), -1.0], dtype=np.float32)
+
+
+class ScriptedSeeker(ScriptedAgent):
+    """
+    Sweeps the arena by always walking to the closest cell it hasn't seen yet.
+
+    Cells count as seen once they are visible from a cell the seeker stood on. The seeker learns about dirt
+    from the arena's map and from walking into it without getting anywhere, it then walks around the dirt or
+    digs through it when the way around is much longer. Once every reachable cell has been seen it digs into
+    unseen cells that dirt seals off, and when there are none the sweep starts over, hiders may have moved into
+    cells that were already checked.
+    """
+
+    def reset(self, play_arena, layout=None):
+        super().reset(play_arena, layout)
+        # the seeker's own copies learn about the dirt it runs into and digs up
+        self.field = self.field.copy()
+        self.visibility = self.visibility.copy()
+        self.seen = np.zeros((self.field.height, self.field.width), dtype=bool)
+        self.target = None
+        self.waypoint = None
+        # (cell to stand on, dirt cell) of the dirt that seals off unseen cells
+        self.door = None
+        self.digging = None
+        self.attacks = 0
+        self.last_position = None
+        self.last_forward = 0.0
+        self.stalled = 0
+
+    def set_cell(self, x: int, z: int, value: int):
+        self.field.set_cell(x, z, value)
+        self.visibility.set_cell(x, z, value)
+
+    def act(self, pose):
+        cell = self.cell(pose)
+        position = np.array([pose[0], pose[2]])
+        expected = self.last_forward * WALK_BLOCKS_PER_STEP
+        if self.last_position is not None and np.hypot(*(position - self.last_position)) < STALL_FRACTION * expected:
+            self.stalled += 1
+        else:
+            self.stalled = 0
+        self.last_position = position
+        if self.stalled >= STALL_STEPS and self.digging is None:
+            self.run_into(cell, self.waypoint)
+        action = self.plan(pose, cell)
+        self.last_forward = float(action[0])
+        return action
+
+    def plan(self, pose, cell):
+        self.seen |= self.visibility.visible_from(*cell)
+        self.seen[cell[1], cell[0]] = True
+        if self.digging is not None:
+            if self.field.grid[self.digging[1], self.digging[0]] == 2:
+                return self.dig(pose)
+            # the map shows the dirt gone
+            self.digging = None
+            self.attacks = 0
+        if self.door is not None:
+            stand, block = self.door
+            if self.field.grid[block[1], block[0]] != 2 or self.field.distance(cell, stand) == UNREACHABLE:
+                self.door = None
+            elif cell != stand:
+                return self.walk_to(pose, stand)
+            else:
+                self.door = None
+                self.digging = block
+                return self.dig(pose)
+        if self.target is None or self.seen[self.target[1], self.target[0]] or not self.field.passable[self.target[1], self.target[0]]:
+            self.target = self.nearest_unseen(cell)
+            if self.target is None:
+                self.door = self.sealing_dirt(cell)
+                if self.door is not None:
+                    return self.plan(pose, cell)
+                self.seen[:] = False
+                return self.look_around(pose)
+        return self.walk_to(pose, self.target)
+
+    def run_into(self, cell, block):
+        """
+        Marks the cell the seeker is stuck walking into as dirt, then digs through it if the way around it is
+        more than DETOUR_STEPS longer.
+        """
+        self.stalled = 0
+        if block is None or abs(block[0] - cell[0]) + abs(block[1] - cell[1]) != 1 or not self.field.passable[block[1], block[0]]:
+            return
+        goal = self.door[0] if self.door is not None else self.target
+        before = self.field.distance(cell, goal) if goal is not None else UNREACHABLE
+        self.set_cell(*block, 2)
+        after = self.field.distance(cell, goal) if goal is not None else UNREACHABLE
+        if goal is None or after > before + DETOUR_STEPS:
+            self.digging = block
+
+    def dig(self, pose):
+        """
+        Faces the dirt being dug and attacks once it is in the cursor, until the map shows the dirt gone.
+        """
+        centre = (self.digging[0] + 0.5, self.digging[1] + 0.5)
+        action = self.steer(pose, centre, pitch=FLOOR_PITCH, move=False)
+        if not self.facing(pose, centre, pitch=FLOOR_PITCH):
+            return action
+        if self.attacks == INTERACT_ATTEMPTS:
+            # the attacks didn't dig anything up, for example another agent was in the way, the map knows better
+            x, z = self.digging
+            self.set_cell(x, z, 2 if self.map_dirt[z, x] else 0)
+            self.digging = None
+            self.attacks = 0
+            return action
+        action[3] = 1.0
+        self.attacks += 1
+        return action
+
+    def sealing_dirt(self, cell):
+        """
+        Closest dirt cell between cells the seeker can reach and unseen cells it can't.
+
+        Returns:
+            tuple(tuple(int, int), tuple(int, int)): Cell to dig from and the dirt cell, None if no dirt seals
+            off unseen cells.
+        """
+        reach = self.field.field(*cell)
+        sealed = self.field.passable & (reach == UNREACHABLE) & ~self.seen
+        best = None
+        for z, x in np.argwhere(self.field.grid == 2):
+            neighbours = self.neighbours(int(x), int(z))
+            stands = [n for n in neighbours if reach[n[1], n[0]] != UNREACHABLE]
+            if not stands or not any(sealed[n[1], n[0]] for n in neighbours):
+                continue
+            stand = min(stands, key=lambda n: reach[n[1], n[0]])
+            if best is None or reach[stand[1], stand[0]] < reach[best[0][1], best[0][0]]:
+                best = (stand, (int(x), int(z)))
+        return best
+
+    def nearest_unseen(self, cell):
+        distances = np.where(self.seen, UNREACHABLE, self.field.field(*cell))
+        z, x = np.unravel_index(np.argmin(distances), distances.shape)
+        if distances[z, x] == UNREACHABLE:
+            return None
+        return (int(x), int(z))
+
+
+class ScriptedHider(ScriptedAgent):
+    """
+    Walks into the room, seals every door from the inside with dirt and then waits in the room's least visible
+    cell. In an arena without rooms it only goes to the least visible cell it can reach. A door counts as sealed
+    once the map shows its dirt, doors that stay open after INTERACT_ATTEMPTS tries are left open.
+    """
+
+    def reset(self, play_arena, layout=None):
+        super().reset(play_arena, layout)
+        # the hider's own copy learns about the blocks placed on the map
+        self.field = self.field.copy()
+        self.placements = 0
+        self.doors = []
+        if layout is not None:
+            for door_x, door_z in ((col, row) for row, col in layout.doors):
+                inside = [
+                    (door_x + dx, door_z + dz) for dx, dz in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                    if 0 <= door_x + dx < self.field.width and 0 <= door_z + dz < self.field.height
+                    and layout.inside[door_z + dz, door_x + dx]
+                ]
+                if inside:
+                    self.doors.append((inside[0], (door_x, door_z)))
+        self.hideout_cells = layout.inside if layout is not None and layout.inside.any() else self.field.passable
+        self.hideout = None
+
+    def act(self, pose):
+        cell = self.cell(pose)
+        while self.doors:
+            stand, door = self.doors[0]
+            # done once the map shows the dirt, skipped when the door can't be reached or placing keeps failing
+            if (self.field.grid[door[1], door[0]] == 2 or self.field.field(*cell)[stand[1], stand[0]] == UNREACHABLE
+                    or self.placements == INTERACT_ATTEMPTS):
+                self.doors.pop(0)
+                self.placements = 0
+                continue
+            if cell != stand:
+                return self.walk_to(pose, stand)
+            door_centre = (door[0] + 0.5, door[1] + 0.5)
+            action = self.steer(pose, door_centre, pitch=FLOOR_PITCH, move=False)
+            if self.facing(pose, door_centre, pitch=FLOOR_PITCH):
+                action[3] = 1.0
+                self.placements += 1
+            return action
+
+        if self.hideout is None:
+            self.hideout = self.least_visible(cell)
+        if self.hideout is None or cell == self.hideout:
+            return np.zeros((4,), dtype=np.float32)
+        return self.walk_to(pose, self.hideout)
+
+    def least_visible(self, cell):
+        reachable = self.hideout_cells & (self.field.field(*cell) != UNREACHABLE)
+        if not reachable.any():
+            return None
+        counts = np.where(reachable, self.visibility.visible_counts(), np.iinfo(np.int64).max)
+        z, x = np.unravel_index(np.argmin(counts), counts.shape)
+        return (int(x), int(z))
+
+
+class ScriptedTeam:
+    """
+    Plays a team with scripted agents in place of its SB3 model.
+
+    Offers the parts of the model interface HideAndSeekMission and the evaluation harness use: predict() maps
+    every agent's current pose to its action, learn() just plays the team's phase and save() has nothing to save.
+    Poses are read from the agent envs, the arenas from the mission, so the observations themselves are unused.
+    play_simulated runs the same agents on a Simulator instead, at simulator speed.
+    """
+
+    def __init__(self, team_env, mission, hider: bool):
+        """
+        Arguments:
+            team_env (TeamVecEnv):
+                Vectorized env of the team's agents.
+            mission (HideAndSeekMission):
+                Source of the env_maps and layouts of the current arenas.
+            hider (bool):
+                Whether the team hides or seeks.
+        """
+        self.team_env = team_env
+        self.mission = mission
+        self.agent_envs = team_env.agent_envs
+        self.agents = [ScriptedHider() if hider else ScriptedSeeker() for _ in self.agent_envs]
+        self.episodes = [None for _ in self.agent_envs]
+
+    def predict(self, observation=None, state=None, episode_start=None, deterministic=True):
+        actions = []
+        for i, (agent_env, agent) in enumerate(zip(self.agent_envs, self.agents)):
+            if self.episodes[i] != agent_env.episode:
+                self.episodes[i] = agent_env.episode
+                agent.reset(self.mission.env_maps[agent_env.arena_index], self.mission.layouts[agent_env.arena_index])
+            agent.observe(self.mission.env_maps[agent_env.arena_index])
+            origin = np.array([agent_env.origin[0], 0, agent_env.origin[1], 0, 0], dtype=np.float32)
+            actions.append(agent.act(agent_env.pose - origin))
+        return np.stack(actions), state
+
+    def learn(self, total_timesteps: int, **kwargs):
+        self.team_env.reset()
+        for _ in range(max(total_timesteps // self.team_env.num_envs, 1)):
+            actions, _ = self.predict()
+            self.team_env.step(actions)
+        return self
+
+    def save(self, path: str):
+        pass
+
+
+def play_simulated(play_arena, layout, spawns, num_hiders: int, hide_steps: int = 40, seek_steps: int = 200,
+                   obs_size: int = 7, use_jit: bool = True):
+    """
+    Plays one game of scripted hiders against scripted seekers on a Simulator in place of Minecraft.
+
+    The hiders get hide_steps on their own, then both teams move. Like in a mission the agents share one map of
+    the arena that only learns about dirt within obs_size of an agent, and a Referee judges every tick.
+
+    Arguments:
+        play_arena (list[list[int]]):
+            2D map of the arena, indexed as [z][x].
+        layout (ArenaLayout):
+            Rooms and doors of the arena.
+        spawns (list[tuple(int, int)]):
+            Spawn (x, z) of every agent, hiders first, see gen_agent_positions.
+        num_hiders (int):
+            Number of hiders among the agents.
+
+    Returns:
+        tuple(int, int): Tick a seeker first found a hider, None if no hider was found, and the number of agent
+        steps played.
+    """
+    sim = Simulator(play_arena, len(spawns), use_jit=use_jit)
+    agents = [ScriptedHider() if i < num_hiders else ScriptedSeeker() for i in range(len(spawns))]
+    for i, ((x, z), agent) in enumerate(zip(spawns, agents)):
+        sim.place_agent(i, x + 0.5, z + 0.5)
+        agent.reset(play_arena, layout)
+    hiders = np.arange(len(agents)) < num_hiders
+    agent_ids = [f"hider_{i}" if hiders[i] else f"seeker_{i - num_hiders}" for i in range(len(agents))]
+    referee = Referee(agent_ids[:num_hiders], agent_ids[num_hiders:])
+    referee.reset(sim.grid)
+    env_map = sim.grid.copy()
+    half = obs_size // 2
+
+    agent_steps = 0
+    for tick in range(hide_steps + seek_steps):
+        acting = hiders if tick < hide_steps else np.ones(len(agents), dtype=bool)
+        actions = np.zeros((len(agents), 4), dtype=np.float32)
+        for i in np.nonzero(acting)[0]:
+            agents[i].observe(env_map)
+            actions[i] = agents[i].act(sim.world_pose(i))
+        agent_steps += int(acting.sum())
+        sim.step(actions, hiders)
+
+        for i, agent_id in enumerate(agent_ids):
+            x, z = np.floor(sim.pos[i]).astype(np.int64)
+            window = (slice(max(z - half, 0), z + half + 1), slice(max(x - half, 0), x + half + 1))
+            env_map[window] = sim.grid[window]
+            referee.report(agent_id, sim.world_pose(i))
+        referee.judge()
+        if referee.any_found():
+            return tick, agent_steps
+    return None, agent_steps
+
+
+def benchmark(num_games: int = 10, num_hiders: int = 1, num_seekers: int = 1, seed: int = 0, use_jit: bool = True):
+    """
+    Agent steps per second of scripted games on the Simulator and the fraction of games the seekers won.
+    """
+    import random
+
+    from env import create_env, gen_agent_positions
+
+    random.seed(seed)
+    item_gen = {"blocks_inside": False, "blocks_outside": True, "stairs_inside": False, "stairs_outside": True}
+    num_found = 0
+    num_steps = 0
+    elapsed = 0.0
+    for _ in range(num_games):
+        _, play_arena, layout = create_env(10, True, "quadrant", item_gen, 4, 2)
+        spawns = gen_agent_positions(play_arena, 10, num_hiders + num_seekers, num_hiders, 1, layout)
+        start = time.perf_counter()
+        found, agent_steps = play_simulated(play_arena, layout, spawns, num_hiders, use_jit=use_jit)
+        elapsed += time.perf_counter() - start
+        num_found += int(found is not None)
+        num_steps += agent_steps
+    return {"agent_steps_per_second": num_steps / elapsed, "seeker_win_rate": num_found / num_games}
+
+
+if __name__ == "__main__":
+    print(benchmark())
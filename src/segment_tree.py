@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class SegmentTree:
+    """
+    Complete binary tree over a fixed number of leaves where every node stores operation(left, right).
+
+    Leaves are updated in batches. After writing the leaves, only the ancestors of the touched leaves are
+    recomputed, one tree level per numpy call, so a batch update costs O(log n) vectorized operations.
+    """
+
+    def __init__(self, capacity: int, operation, neutral: float):
+        self.capacity = capacity
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.operation = operation
+        self.neutral = neutral
+        self.values = np.full(2 * self.size, neutral, dtype=np.float64)
+
+    def update(self, indices, values):
+        nodes = np.asarray(indices, dtype=np.int64) + self.size
+        self.values[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while len(nodes) > 0:
+            self.values[nodes] = self.operation(self.values[2 * nodes], self.values[2 * nodes + 1])
+            nodes = np.unique(nodes[nodes > 1] // 2)
+
+    def reduce(self):
+        return self.values[1]
+
+    def __getitem__(self, indices):
+        return self.values[np.asarray(indices) + self.size]
+
+
+class SumSegmentTree(SegmentTree):
+    def __init__(self, capacity: int):
+        super().__init__(capacity, np.add, 0.0)
+
+    def find_prefixsum_index(self, prefixsums):
+        """
+        Finds, for every prefix sum, the highest leaf whose cumulative sum of preceding leaves is at most it.
+        All prefix sums descend the tree together.
+        """
+        prefixsums = np.array(prefixsums, dtype=np.float64)
+        nodes = np.ones(len(prefixsums), dtype=np.int64)
+        while nodes[0] < self.size:
+            left = 2 * nodes
+            go_right = prefixsums > self.values[left]
+            prefixsums -= self.values[left] * go_right
+            nodes = left + go_right
+        return nodes - self.size
+
+
+class MinSegmentTree(SegmentTree):
+    def __init__(self, capacity: int):
+        super().__init__(capacity, np.minimum, np.inf)
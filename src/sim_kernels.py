@@ -0,0 +1,313 @@
+import math
+
+import numpy as np
+
+# numba compiles the kernels when it is installed, otherwise they run as plain python
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# heights of the arena built by create_env, the floor's top is at y=2
+FLOOR_Y = 2.0
+EYE_HEIGHT = 1.62
+AGENT_HEIGHT = 1.8
+AGENT_RADIUS = 0.3
+# longest step an agent takes between two collision checks, well below AGENT_RADIUS so agents can't tunnel
+MAX_SUBSTEP = 0.1
+
+# what kind of thing a ray hit
+HIT_NONE = 0
+HIT_BLOCK = 1
+HIT_FLOOR = 2
+HIT_AGENT = 3
+
+
+def jit(fn, cache: bool = True):
+    return njit(cache=cache)(fn) if HAVE_NUMBA else fn
+
+
+def _overlaps_blocked(grid, blocked_lut, x, z, radius):
+    # cells outside the grid count as blocked, the arena is walled in
+    x1 = int(math.floor(x - radius))
+    x2 = int(math.floor(x + radius - 1e-9))
+    z1 = int(math.floor(z - radius))
+    z2 = int(math.floor(z + radius - 1e-9))
+    for cz in range(z1, z2 + 1):
+        for cx in range(x1, x2 + 1):
+            if cz < 0 or cz >= grid.shape[0] or cx < 0 or cx >= grid.shape[1]:
+                return True
+            if blocked_lut[grid[cz, cx]]:
+                return True
+    return False
+
+
+def _move_agents_kernel(overlaps_blocked):
+    def move_agents(grid, blocked_lut, pos, yaw, distance, radius):
+        """
+        Walks every agent distance blocks along its yaw, sliding along the blocked cells it runs into.
+
+        Arguments:
+            grid (np.ndarray):
+                int8 play_arena of shape (H, W), indexed as [z][x].
+            blocked_lut (np.ndarray):
+                Boolean lookup of the grid values agents can't walk through.
+            pos (np.ndarray):
+                (x, z) positions of shape (N, 2), moved in place.
+            yaw (np.ndarray):
+                Minecraft yaw of every agent in degrees, yaw 0 faces +z and yaw 90 faces -x.
+            distance (np.ndarray):
+                Signed distance every agent walks, negative walks backwards.
+        """
+        for i in range(pos.shape[0]):
+            if distance[i] == 0.0:
+                continue
+            heading = math.radians(yaw[i])
+            dx_total = -math.sin(heading) * distance[i]
+            dz_total = math.cos(heading) * distance[i]
+            num_steps = int(math.ceil(abs(distance[i]) / MAX_SUBSTEP))
+            dx = dx_total / num_steps
+            dz = dz_total / num_steps
+            for _ in range(num_steps):
+                # axes are resolved one after the other, so an agent walking into a wall at an angle slides along it
+                if not overlaps_blocked(grid, blocked_lut, pos[i, 0] + dx, pos[i, 1], radius):
+                    pos[i, 0] += dx
+                if not overlaps_blocked(grid, blocked_lut, pos[i, 0], pos[i, 1] + dz, radius):
+                    pos[i, 1] += dz
+        return pos
+    return move_agents
+
+
+def _ray_agent(ox, oy, oz, dx, dy, dz, ax, az, radius, height):
+    # slab test against the agent's bounding box, returns the entry distance or -1 when the ray misses
+    t_near = -1e30
+    t_far = 1e30
+    lows = (ax - radius, FLOOR_Y, az - radius)
+    highs = (ax + radius, FLOOR_Y + height, az + radius)
+    origin = (ox, oy, oz)
+    direction = (dx, dy, dz)
+    for axis in range(3):
+        if direction[axis] == 0.0:
+            if origin[axis] < lows[axis] or origin[axis] > highs[axis]:
+                return -1.0
+            continue
+        t0 = (lows[axis] - origin[axis]) / direction[axis]
+        t1 = (highs[axis] - origin[axis]) / direction[axis]
+        if t0 > t1:
+            t0, t1 = t1, t0
+        t_near = max(t_near, t0)
+        t_far = min(t_far, t1)
+    if t_near > t_far or t_far < 0.0:
+        return -1.0
+    return max(t_near, 0.0)
+
+
+def _cast_ray_kernel(ray_agent):
+    def cast_ray(grid, height_lut, pos, eye_y, yaw, pitch, agent, max_dist, radius, agent_height):
+        """
+        Casts the cursor ray of one agent through the arena and the other agents.
+
+        Blocks are columns of height_lut[value] blocks standing on the floor. The ray is marched cell by cell in
+        the x-z plane (Amanatides-Woo) while its height is tracked, so it can pass over low blocks and hit the floor.
+
+        Returns:
+            tuple: (kind, cell x, cell z, previous cell x, previous cell z, agent index, distance). The previous
+            cell is the one the ray crossed right before the hit, where a placed block ends up.
+        """
+        heading = math.radians(yaw)
+        tilt = math.radians(pitch)
+        dx = -math.sin(heading) * math.cos(tilt)
+        dz = math.cos(heading) * math.cos(tilt)
+        dy = -math.sin(tilt)
+        ox = pos[agent, 0]
+        oz = pos[agent, 1]
+        oy = eye_y
+
+        # closest other agent along the ray
+        best_agent = -1
+        best_agent_t = max_dist
+        for other in range(pos.shape[0]):
+            if other == agent:
+                continue
+            t = ray_agent(ox, oy, oz, dx, dy, dz, pos[other, 0], pos[other, 1], radius, agent_height)
+            if t >= 0.0 and t < best_agent_t:
+                best_agent = other
+                best_agent_t = t
+
+        cx = int(math.floor(ox))
+        cz = int(math.floor(oz))
+        step_x = 1 if dx > 0 else -1
+        step_z = 1 if dz > 0 else -1
+        t_max_x = ((cx + (1 if dx > 0 else 0)) - ox) / dx if dx != 0.0 else 1e30
+        t_max_z = ((cz + (1 if dz > 0 else 0)) - oz) / dz if dz != 0.0 else 1e30
+        t_delta_x = abs(1.0 / dx) if dx != 0.0 else 1e30
+        t_delta_z = abs(1.0 / dz) if dz != 0.0 else 1e30
+
+        prev_x = cx
+        prev_z = cz
+        t_enter = 0.0
+        limit = min(max_dist, best_agent_t)
+        while t_enter <= limit:
+            t_exit = min(t_max_x, t_max_z)
+            inside = 0 <= cz < grid.shape[0] and 0 <= cx < grid.shape[1]
+            top = FLOOR_Y + (height_lut[grid[cz, cx]] if inside else 0.0)
+            # the start cell never blocks, the agent is standing in it
+            if inside and top > FLOOR_Y and (cx != int(math.floor(ox)) or cz != int(math.floor(oz))):
+                y_enter = oy + dy * t_enter
+                if y_enter < top:
+                    return HIT_BLOCK, cx, cz, prev_x, prev_z, -1, t_enter
+                if dy < 0.0:
+                    t_top = (top - oy) / dy
+                    if t_top <= t_exit and t_top <= limit:
+                        # hit the top face, nothing can be placed against it
+                        return HIT_BLOCK, cx, cz, cx, cz, -1, t_top
+            if dy < 0.0:
+                t_floor = (FLOOR_Y - oy) / dy
+                if t_floor <= t_exit and t_floor <= limit:
+                    return HIT_FLOOR, cx, cz, cx, cz, -1, t_floor
+            prev_x = cx
+            prev_z = cz
+            t_enter = t_exit
+            if t_max_x < t_max_z:
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                cz += step_z
+                t_max_z += t_delta_z
+
+        if best_agent >= 0:
+            return HIT_AGENT, int(math.floor(pos[best_agent, 0])), int(math.floor(pos[best_agent, 1])), prev_x, prev_z, best_agent, best_agent_t
+        return HIT_NONE, -1, -1, -1, -1, -1, max_dist
+    return cast_ray
+
+
+def _cast_rays_kernel(cast_ray):
+    def cast_rays(grid, height_lut, pos, eye_y, yaw, pitch, max_dist, radius, agent_height, out_kind, out_cells, out_agent, out_dist):
+        """
+        Cursor rays of every agent, written into the out arrays.
+        """
+        for agent in range(pos.shape[0]):
+            kind, hx, hz, px, pz, hit_agent, dist = cast_ray(
+                grid, height_lut, pos, eye_y, yaw[agent], pitch[agent], agent, max_dist, radius, agent_height
+            )
+            out_kind[agent] = kind
+            out_cells[agent, 0] = hx
+            out_cells[agent, 1] = hz
+            out_cells[agent, 2] = px
+            out_cells[agent, 3] = pz
+            out_agent[agent] = hit_agent
+            out_dist[agent] = dist
+    return cast_rays
+
+
+def _segments_clear(grid, opaque_lut, starts, ends, out):
+    """
+    Whether the straight x-z segments between starts and ends of shape (N, 2) cross no opaque cell.
+    The cells the segments start and end in are ignored, like in line_of_sight.segment_clear.
+    """
+    for i in range(starts.shape[0]):
+        ox = starts[i, 0]
+        oz = starts[i, 1]
+        dx = ends[i, 0] - ox
+        dz = ends[i, 1] - oz
+        cx = int(math.floor(ox))
+        cz = int(math.floor(oz))
+        end_x = int(math.floor(ends[i, 0]))
+        end_z = int(math.floor(ends[i, 1]))
+        step_x = 1 if dx > 0 else -1
+        step_z = 1 if dz > 0 else -1
+        t_max_x = ((cx + (1 if dx > 0 else 0)) - ox) / dx if dx != 0.0 else 1e30
+        t_max_z = ((cz + (1 if dz > 0 else 0)) - oz) / dz if dz != 0.0 else 1e30
+        t_delta_x = abs(1.0 / dx) if dx != 0.0 else 1e30
+        t_delta_z = abs(1.0 / dz) if dz != 0.0 else 1e30
+        clear = True
+        while True:
+            if t_max_x < t_max_z:
+                if t_max_x >= 1.0:
+                    break
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                if t_max_z >= 1.0:
+                    break
+                cz += step_z
+                t_max_z += t_delta_z
+            if cx == end_x and cz == end_z:
+                break
+            if 0 <= cz < grid.shape[0] and 0 <= cx < grid.shape[1] and opaque_lut[grid[cz, cx]]:
+                clear = False
+                break
+        out[i] = clear
+
+
+# pure python versions, the reference the compiled kernels are checked against. Kernels get their helpers
+# passed in, so these keep calling the python helpers even when numba is installed.
+move_agents_py = _move_agents_kernel(_overlaps_blocked)
+cast_rays_py = _cast_rays_kernel(_cast_ray_kernel(_ray_agent))
+segments_clear_py = _segments_clear
+
+# kernels closing over compiled helpers can't be cached on disk
+move_agents = jit(_move_agents_kernel(jit(_overlaps_blocked)), cache=False)
+cast_rays = jit(_cast_rays_kernel(jit(_cast_ray_kernel(jit(_ray_agent)), cache=False)), cache=False)
+segments_clear = jit(_segments_clear)
+
+
+def check_equivalence(num_arenas: int = 20, num_agents: int = 4, seed: int = 0):
+    """
+    Runs the kernels in use and their references on random arenas and states and returns the largest differences.
+
+    The compiled kernels are compared against the pure python ones. The line of sight kernel is also compared
+    against the numpy ray marcher of line_of_sight, which the rest of the code uses.
+    """
+    import random
+
+    from env import create_env
+    from line_of_sight import OPAQUE_CELLS, segment_clear
+
+    rng = np.random.default_rng(seed)
+    random.seed(seed)
+    item_gen = {"blocks_inside": True, "blocks_outside": True, "stairs_inside": True, "stairs_outside": True}
+    blocked_lut = np.zeros(8, dtype=np.bool_)
+    blocked_lut[[1, 2]] = True
+    height_lut = np.array([0.0, 2.0, 1.0, 0.5, 0.0, 0.0, 0.0, 0.0])
+    opaque_lut = np.zeros(8, dtype=np.bool_)
+    opaque_lut[list(OPAQUE_CELLS)] = True
+
+    worst = {"move": 0.0, "rays": 0, "ray_distance": 0.0, "segments": 0, "segments_vs_numpy": 0}
+    for _ in range(num_arenas):
+        _, play_arena, _ = create_env(10, True, "quadrant", item_gen, 6, 3)
+        grid = np.asarray(play_arena, dtype=np.int8)
+        free = np.argwhere(~blocked_lut[grid])
+        cells = free[rng.choice(len(free), num_agents)]
+        pos = cells[:, ::-1] + rng.uniform(0.3, 0.7, (num_agents, 2))
+        yaw = rng.uniform(-180, 180, num_agents)
+        pitch = rng.uniform(-30, 60, num_agents)
+        distance = rng.uniform(-2, 3, num_agents)
+
+        moved = move_agents(grid, blocked_lut, pos.copy(), yaw, distance, AGENT_RADIUS)
+        reference = move_agents_py(grid, blocked_lut, pos.copy(), yaw, distance, AGENT_RADIUS)
+        worst["move"] = max(worst["move"], float(np.abs(moved - reference).max()))
+
+        results = []
+        for kernel in (cast_rays, cast_rays_py):
+            out = (np.zeros(num_agents, np.int64), np.zeros((num_agents, 4), np.int64), np.zeros(num_agents, np.int64), np.zeros(num_agents))
+            kernel(grid, height_lut, pos, FLOOR_Y + EYE_HEIGHT, yaw, pitch, 50.0, AGENT_RADIUS, AGENT_HEIGHT, *out)
+            results.append(out)
+        worst["rays"] += sum(int((a != b).any()) for a, b in zip(results[0][:3], results[1][:3]))
+        worst["ray_distance"] = max(worst["ray_distance"], float(np.abs(results[0][3] - results[1][3]).max()))
+
+        starts = rng.uniform(0, 10, (200, 2))
+        ends = rng.uniform(0, 10, (200, 2))
+        compiled = np.zeros(200, np.bool_)
+        python = np.zeros(200, np.bool_)
+        segments_clear(grid, opaque_lut, starts, ends, compiled)
+        segments_clear_py(grid, opaque_lut, starts, ends, python)
+        worst["segments"] += int((compiled != python).sum())
+        worst["segments_vs_numpy"] += int((python != segment_clear(grid, 0, starts, ends)).sum())
+    return worst
+
+
+if __name__ == "__main__":
+    print(f"numba {'enabled' if HAVE_NUMBA else 'not installed, checking the python kernels only'}")
+    print(check_equivalence())
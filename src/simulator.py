@@ -0,0 +1,233 @@
+import time
+
+import numpy as np
+
+import sim_kernels
+from sim_kernels import AGENT_HEIGHT, AGENT_RADIUS, EYE_HEIGHT, FLOOR_Y, HIT_BLOCK, HIT_FLOOR
+
+# Minecraft movement the mission XML asks for, ContinuousMovementCommands with turnSpeedDegs="360"
+WALK_SPEED = 4.317
+TURN_SPEED = 360.0
+# how far agents reach when placing or digging blocks
+REACH = 4.5
+# Malmo's ObservationFromRay doesn't report anything further away than this
+MAX_RAY_RANGE = 50.0
+
+# play_arena values agents can't walk through, agents don't jump
+BLOCKED_VALUES = (1, 2)
+# height in blocks of what stands on every play_arena value
+# empty = 0, walls = 1, blocks = 2, stairs = 3, agents = 4
+VALUE_HEIGHTS = (0.0, 2.0, 1.0, 0.5, 0.0)
+
+
+class Simulator:
+    """
+    Headless stand-in for the Minecraft side of one arena: agents walking, turning, looking at things and
+    placing or digging dirt on a play_arena grid.
+
+    Agents are points with Minecraft's bounding box that walk at Minecraft's speed and collide with walls and
+    blocks, but don't jump or push each other. The per agent loops run in sim_kernels, compiled with numba
+    when it is installed.
+    """
+
+    def __init__(self, play_arena, num_agents: int, origin=(0, 0), dirt=8, use_jit: bool = True):
+        """
+        Arguments:
+            play_arena (list[list[int]]):
+                2D map of the arena as returned by gen_quadrant_env. Agent markers are ignored.
+            num_agents (int):
+                Number of agents in the arena.
+            origin (tuple(int, int)):
+                World (x, z) of the arena's corner, positions in and out of the simulator are world positions.
+            dirt (int or array-like):
+                Dirt blocks every agent can place.
+            use_jit (bool):
+                Whether to run the compiled kernels. Without numba the python kernels run either way.
+        """
+        grid = np.asarray(play_arena, dtype=np.int8)
+        self.grid = np.where(grid == 4, 0, grid).astype(np.int8)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.num_agents = num_agents
+
+        self.blocked_lut = np.zeros(max(len(VALUE_HEIGHTS), 8), dtype=np.bool_)
+        self.blocked_lut[list(BLOCKED_VALUES)] = True
+        self.height_lut = np.zeros(len(self.blocked_lut), dtype=np.float64)
+        self.height_lut[:len(VALUE_HEIGHTS)] = VALUE_HEIGHTS
+
+        compiled = use_jit and sim_kernels.HAVE_NUMBA
+        self.move_agents = sim_kernels.move_agents if compiled else sim_kernels.move_agents_py
+        self.cast_rays = sim_kernels.cast_rays if compiled else sim_kernels.cast_rays_py
+
+        ### Agent State ###
+        # positions are kept relative to the arena's corner
+        self.pos = np.zeros((num_agents, 2), dtype=np.float64)
+        self.yaw = np.zeros(num_agents, dtype=np.float64)
+        self.pitch = np.zeros(num_agents, dtype=np.float64)
+        # move, turn and pitch command of every agent, each in [-1, 1]
+        self.commands = np.zeros((num_agents, 3), dtype=np.float64)
+        self.dirt = np.broadcast_to(np.asarray(dirt, dtype=np.int64), (num_agents,)).copy()
+        self.time = 0.0
+
+        ### Cursor State ###
+        self._cursors = None
+
+    def place_agent(self, agent: int, x: float, z: float, yaw: float = 0.0, pitch: float = 0.0):
+        self.pos[agent] = (x - self.origin[0], z - self.origin[1])
+        self.yaw[agent] = yaw
+        self.pitch[agent] = pitch
+        self._cursors = None
+
+    def set_commands(self, agent: int, move: float = None, turn: float = None, pitch: float = None):
+        for column, value in enumerate((move, turn, pitch)):
+            if value is not None:
+                self.commands[agent, column] = np.clip(value, -1.0, 1.0)
+
+    def advance(self, seconds: float):
+        """
+        Lets the agents carry out their current commands for the given time.
+        """
+        self.yaw = (self.yaw + self.commands[:, 1] * TURN_SPEED * seconds + 180.0) % 360.0 - 180.0
+        self.pitch = np.clip(self.pitch + self.commands[:, 2] * TURN_SPEED * seconds, -90.0, 90.0)
+        distance = self.commands[:, 0] * WALK_SPEED * seconds
+        self.move_agents(self.grid, self.blocked_lut, self.pos, self.yaw, distance, AGENT_RADIUS)
+        self.time += seconds
+        self._cursors = None
+
+    def cursors(self):
+        """
+        What every agent's cursor ray hits.
+
+        Returns:
+            tuple(np.ndarray, ...): Hit kind of shape (N,), hit and previous cell of shape (N, 4) as
+            (x, z, previous x, previous z), index of the agent hit of shape (N,) and distance of shape (N,).
+            Cells are relative to the arena's corner.
+        """
+        if self._cursors is None:
+            kinds = np.zeros(self.num_agents, dtype=np.int64)
+            cells = np.zeros((self.num_agents, 4), dtype=np.int64)
+            agents = np.zeros(self.num_agents, dtype=np.int64)
+            distances = np.zeros(self.num_agents, dtype=np.float64)
+            self.cast_rays(
+                self.grid, self.height_lut, self.pos, FLOOR_Y + EYE_HEIGHT, self.yaw, self.pitch, MAX_RAY_RANGE,
+                AGENT_RADIUS, AGENT_HEIGHT, kinds, cells, agents, distances,
+            )
+            self._cursors = (kinds, cells, agents, distances)
+        return self._cursors
+
+    def interact(self, agent: int, use: bool):
+        """
+        Places dirt where the agent looks when use is True, digs up the dirt it looks at otherwise.
+
+        Returns:
+            tuple(int, int): Cell (x, z) relative to the arena's corner that changed, None if nothing did.
+        """
+        kinds, cells, _, distances = self.cursors()
+        if distances[agent] > REACH or kinds[agent] not in (HIT_BLOCK, HIT_FLOOR):
+            return None
+        hit_x, hit_z, prev_x, prev_z = cells[agent]
+        if not use:
+            if kinds[agent] == HIT_BLOCK and self.grid[hit_z, hit_x] == 2:
+                return self.set_cell(hit_x, hit_z, 0)
+            return None
+        # blocks go against the face the ray hit, on top of a block is out of this flat world
+        if self.dirt[agent] <= 0 or (kinds[agent] == HIT_BLOCK and (prev_x, prev_z) == (hit_x, hit_z)):
+            return None
+        if not (0 <= prev_z < self.grid.shape[0] and 0 <= prev_x < self.grid.shape[1]) or self.grid[prev_z, prev_x] != 0:
+            return None
+        if self.occupied(prev_x, prev_z):
+            return None
+        self.dirt[agent] -= 1
+        return self.set_cell(prev_x, prev_z, 2)
+
+    def occupied(self, x: int, z: int):
+        """
+        Whether any agent's bounding box overlaps cell (x, z).
+        """
+        low = np.array([x, z], dtype=np.float64)
+        return bool(((self.pos + AGENT_RADIUS > low) & (self.pos - AGENT_RADIUS < low + 1)).all(axis=1).any())
+
+    def stuck(self, agent: int):
+        """
+        Whether an agent's bounding box overlaps a cell it can't walk through, it then can't move at all.
+        """
+        low = np.floor(self.pos[agent] - AGENT_RADIUS).astype(np.int64)
+        high = np.floor(self.pos[agent] + AGENT_RADIUS - 1e-9).astype(np.int64)
+        if (low < 0).any() or high[0] >= self.grid.shape[1] or high[1] >= self.grid.shape[0]:
+            return True
+        return bool(self.blocked_lut[self.grid[low[1]:high[1] + 1, low[0]:high[0] + 1]].any())
+
+    def set_cell(self, x: int, z: int, value: int):
+        self.grid[z, x] = value
+        self._cursors = None
+        return (int(x), int(z))
+
+    def step(self, actions, use, seconds: float = 0.5):
+        """
+        Plays one step of every agent the way step_agents does in Minecraft: everyone moves for the same window,
+        stops and then the agents with a positive interact action use or attack.
+
+        Arguments:
+            actions (array-like):
+                (move, turn, pitch, interact) of every agent, shape (N, 4).
+            use (array-like):
+                Whether every agent places dirt (hiders) or digs (seekers) when interacting, shape (N,).
+
+        Returns:
+            list[tuple(int, int)]: Cells changed by the interactions.
+        """
+        actions = np.asarray(actions, dtype=np.float64).reshape(self.num_agents, 4)
+        self.commands[:] = np.clip(actions[:, :3], -1.0, 1.0)
+        self.advance(seconds)
+        self.commands[:] = 0.0
+        changed = []
+        for agent in np.nonzero(actions[:, 3] > 0)[0]:
+            cell = self.interact(agent, bool(use[agent]))
+            if cell is not None:
+                changed.append(cell)
+        return changed
+
+    def world_pose(self, agent: int):
+        """
+        (x, y, z, yaw, pitch) of an agent in world coordinates.
+        """
+        return np.array([
+            self.pos[agent, 0] + self.origin[0], FLOOR_Y, self.pos[agent, 1] + self.origin[1],
+            self.yaw[agent], self.pitch[agent],
+        ], dtype=np.float64)
+
+
+def benchmark(num_steps: int = 2000, num_agents: int = 4, seed: int = 0):
+    """
+    Steps per second of the simulator with random actions, with the kernels in use and with the python ones.
+    """
+    import random
+
+    from env import create_env
+
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    item_gen = {"blocks_inside": False, "blocks_outside": True, "stairs_inside": False, "stairs_outside": True}
+    _, play_arena, _ = create_env(10, True, "quadrant", item_gen, 4, 2)
+    free = np.argwhere(np.asarray(play_arena) == 0)
+    actions = rng.uniform(-1, 1, (num_steps, num_agents, 4))
+    use = np.arange(num_agents) % 2 == 0
+
+    rates = {}
+    for use_jit in (True, False):
+        sim = Simulator(play_arena, num_agents, use_jit=use_jit)
+        for agent, (z, x) in enumerate(free[rng.choice(len(free), num_agents, replace=False)]):
+            sim.place_agent(agent, x + 0.5, z + 0.5)
+        # the first call compiles the kernels
+        sim.step(actions[0], use)
+        sim.cursors()
+        start = time.perf_counter()
+        for step_actions in actions:
+            sim.step(step_actions, use)
+            sim.cursors()
+        rates["compiled" if use_jit and sim_kernels.HAVE_NUMBA else "python"] = num_steps / (time.perf_counter() - start)
+    return rates
+
+
+if __name__ == "__main__":
+    print(sim_kernels.check_equivalence())
+    print({name: f"{rate:.0f} steps/s" for name, rate in benchmark().items()})
@@ -0,0 +1,305 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+import traceback
+from typing import Dict, List
+
+from artifact_cache import shared_cache
+
+# values tried for every parameter, every combination becomes one trial
+DEFAULT_GRID = {
+    "seeker_phase_duration": [20, 40],
+    "hider_phase_duration": [20, 40],
+    "learning_starts": [10, 100],
+    "obs_size": [5, 7],
+    "reward_weights": [{"explore_cell": 1}, {"explore_cell": 5}],
+}
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def grid(**choices):
+    """
+    Expands lists of values per parameter into one config per combination.
+
+    Returns:
+        list[dict]: Configs for HideAndSeekMission.
+    """
+    keys = sorted(choices.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(choices[key] for key in keys))]
+
+
+def trial_id(config: Dict, backend: str):
+    """
+    Stable name of a trial, so a rerun of the same sweep finds the results of the trials that already finished.
+    """
+    text = json.dumps({"backend": backend, "config": config}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def ports_needed(config: Dict):
+    """
+    Number of Minecraft client ports a trial opens, one per agent of every arena plus the observer.
+
+    Parameters the config leaves out count with the HideAndSeekMission defaults of one arena, one hider and one
+    seeker.
+    """
+    agents = config.get("num_hiders", 1) + config.get("num_seekers", 1)
+    return config.get("num_arenas", 1) * agents + 1
+
+
+def make_mission(backend: str, config: Dict):
+    """
+    Builds a HideAndSeekMission on the requested backend.
+    """
+    if backend == "malmo":
+        from final import HideAndSeekMission
+        return HideAndSeekMission(config)
+    if backend == "simulated":
+        # Minecraft clients are replaced by simulated ones, config["simulated_faults"] sets the Faults they inject
+        import fake_malmo
+        config = dict(config)
+        fake_malmo.configure(**config.pop("simulated_faults", {}))
+        fake_malmo.install()
+        from final import HideAndSeekMission
+        return HideAndSeekMission(config)
+    raise ValueError(f"Unknown backend {backend}, expected one of ['malmo', 'simulated']")
+
+
+def pin_threads(cores: List[int]):
+    """
+    Restricts the calling process and the math libraries it loads to the given cores.
+    Must run before torch is imported to also bind the OpenMP pool.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(len(cores))
+
+
+def write_json(path: str, data: Dict):
+    # written next to the target and renamed, so a killed trial never leaves half a file behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def run_trial(trial_dir: str, config: Dict, backend: str, num_cycles: int, cores: List[int], malmo_port: int):
+    """
+    Trial process. Trains one config for num_cycles calls of learn() inside its own directory.
+
+    Models are saved by learn() and the number of finished cycles, the episode counters and the curriculum
+    state are written after each of them, so an interrupted trial continues from its last finished cycle.
+    """
+    pin_threads(cores)
+    os.chdir(trial_dir)
+    progress = read_json("progress.json") or {"cycles_done": 0, "wall_time": 0.0}
+    result = {"status": "ok"}
+    start_time = time.time()
+    try:
+        import torch
+        torch.set_num_threads(len(cores))
+        mission = make_mission(backend, {**config, "malmo_port": malmo_port})
+        mission.restore_training_state(progress.get("mission", {}))
+        while progress["cycles_done"] < num_cycles:
+            mission.learn()
+            progress["cycles_done"] += 1
+            progress["mission"] = mission.training_state()
+            write_json("progress.json", {**progress, "wall_time": progress["wall_time"] + time.time() - start_time})
+        # the episode still running when training stopped has no outcome yet
+        finished_games = (mission.episode_count - int(mission.episode_started)) * mission.num_arenas
+        result.update({
+            "episodes": mission.episode_count,
+            "games": finished_games,
+            "seeker_wins": mission.num_seeker_wins,
+            "seeker_win_rate": mission.num_seeker_wins / max(finished_games, 1),
+        })
+        if mission.use_curriculum:
+            result["curriculum_level"] = mission.curriculum.level
+        result.update(mission.supervisor.stats())
+        result.update(shared_cache.stats())
+    except Exception as e:
+        traceback.print_exc()
+        result = {"status": "failed", "error": repr(e)}
+
+    result.update({
+        "cycles_done": progress["cycles_done"],
+        "wall_time": progress["wall_time"] + time.time() - start_time,
+    })
+    write_json("result.json", result)
+
+
+class Sweep:
+    """
+    Runs many training configs at once, one process per trial on its own cores and its own backend.
+
+    Every worker slot owns a fixed set of cores and, on the Malmo backend, a fixed range of client ports, so
+    trials never compete for threads or Minecraft clients. Every trial gets a fresh process, which keeps Malmo
+    and torch state from leaking between trials. Trials that already finished are skipped when the sweep is
+    started again and the results of all trials are collected into one table.
+    """
+
+    def __init__(
+        self,
+        configs: List[Dict],
+        out_dir: str = "sweeps",
+        num_workers: int = None,
+        cores_per_worker: int = 1,
+        num_cycles: int = 1,
+        backend: str = "malmo",
+        base_port: int = 10000,
+        port_stride: int = 10,
+    ):
+        """
+        Arguments:
+            configs (list[dict]):
+                Parameter overrides of every trial, see grid().
+            out_dir (str):
+                Directory holding one sub directory per trial and the results table.
+            num_workers (int):
+                Number of trials running at the same time. Defaults to every core being busy.
+            cores_per_worker (int):
+                Number of cores, and so torch threads, of every trial.
+            num_cycles (int):
+                Number of HideAndSeekMission.learn() calls per trial.
+            backend (str):
+                Backend every trial trains on.
+            base_port (int):
+                First Malmo client port. Worker slot i uses the ports from base_port + i * port_stride.
+            port_stride (int):
+                Number of ports reserved per worker slot, at least the ports_needed of every config.
+        """
+        widest = max(configs, key=ports_needed, default={})
+        if ports_needed(widest) > port_stride:
+            raise ValueError(
+                f"port_stride {port_stride} is smaller than the {ports_needed(widest)} ports of the trial {widest}, "
+                f"worker slots would share Minecraft clients"
+            )
+        self.configs = configs
+        self.out_dir = os.path.abspath(out_dir)
+        self.cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+        self.cores_per_worker = cores_per_worker
+        self.num_workers = num_workers if num_workers is not None else max(len(self.cores) // cores_per_worker, 1)
+        self.num_cycles = num_cycles
+        self.backend = backend
+        self.base_port = base_port
+        self.port_stride = port_stride
+        self.trials = {trial_id(config, backend): config for config in configs}
+
+    def trial_dir(self, name: str):
+        return os.path.join(self.out_dir, name)
+
+    def pending(self):
+        """
+        Names of the trials without a successful result, failed trials are retried.
+        """
+        return [
+            name for name in self.trials
+            if (read_json(os.path.join(self.trial_dir(name), "result.json")) or {}).get("status") != "ok"
+        ]
+
+    def slot_cores(self, slot: int):
+        start = (slot * self.cores_per_worker) % len(self.cores)
+        return [self.cores[(start + i) % len(self.cores)] for i in range(self.cores_per_worker)]
+
+    def run(self, poll_interval: float = 1.0):
+        """
+        Runs every pending trial and returns the results of all trials.
+        """
+        queued = self.pending()
+        print(f"{len(self.trials) - len(queued)} of {len(self.trials)} trials already done, running {len(queued)}")
+        ctx = mp.get_context("spawn")
+        running = {}
+
+        while queued or running:
+            for slot in range(self.num_workers):
+                process = running.get(slot)
+                if process is not None and not process.is_alive():
+                    process.join()
+                    del running[slot]
+                if slot not in running and queued:
+                    name = queued.pop(0)
+                    trial_dir = self.trial_dir(name)
+                    os.makedirs(trial_dir, exist_ok=True)
+                    write_json(os.path.join(trial_dir, "config.json"), self.trials[name])
+                    running[slot] = ctx.Process(
+                        target=run_trial,
+                        args=(trial_dir, self.trials[name], self.backend, self.num_cycles, self.slot_cores(slot),
+                              self.base_port + slot * self.port_stride),
+                        name=f"trial_{name}",
+                    )
+                    running[slot].start()
+                    print(f"started trial {name} on slot {slot}: {self.trials[name]}")
+            time.sleep(poll_interval)
+
+        results = self.collect()
+        self.write_table(results)
+        return results
+
+    def collect(self):
+        results = []
+        for name, config in self.trials.items():
+            result = read_json(os.path.join(self.trial_dir(name), "result.json")) or {"status": "missing"}
+            results.append({"trial": name, **flatten(config), **result})
+        return results
+
+    def write_table(self, results: List[Dict], file_name: str = "results.csv"):
+        columns = []
+        for result in results:
+            columns += [key for key in result if key not in columns]
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, file_name), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+def flatten(config: Dict, prefix: str = ""):
+    """
+    Flattens nested dicts such as reward_weights into prefixed columns.
+    """
+    flat = {}
+    for key, value in config.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a hyperparameter sweep of HideAndSeekMission")
+    parser.add_argument("--out-dir", default="sweeps")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cores-per-worker", type=int, default=1)
+    parser.add_argument("--cycles", type=int, default=1)
+    parser.add_argument("--backend", default="malmo")
+    parser.add_argument("--base-port", type=int, default=10000)
+    parser.add_argument("--port-stride", type=int, default=10)
+    args = parser.parse_args()
+
+    sweep = Sweep(
+        grid(**DEFAULT_GRID),
+        out_dir=args.out_dir,
+        num_workers=args.workers,
+        cores_per_worker=args.cores_per_worker,
+        num_cycles=args.cycles,
+        backend=args.backend,
+        base_port=args.base_port,
+        port_stride=args.port_stride,
+    )
+    sweep.run()
@@ -0,0 +1,204 @@
+import os
+from typing import Dict
+
+import numpy as np
+import torch as th
+import torch.nn.functional as F
+from stable_baselines3.common.logger import configure
+
+
+class TrajectoryDataset:
+    """
+    Streams transitions written by TrajectoryRecorder back from disk.
+
+    The recorder stores compressed .npz chunks. The first time a chunk is read every column is decompressed
+    into its own .npy file inside cache_dir, after that the columns are opened as memory maps so only the rows
+    that are actually used get paged in.
+    """
+
+    def __init__(self, directory: str, agent_prefix: str = "", cache_dir: str = None):
+        """
+        Arguments:
+            directory (str):
+                Folder the TrajectoryRecorder wrote its chunks to.
+            agent_prefix (str):
+                Only load chunks of agents whose id starts with this prefix. "hider" loads every hider,
+                "seeker_0" only loads a single seeker.
+            cache_dir (str):
+                Folder the decompressed columns are written to. Defaults to "<directory>/.mmap".
+        """
+        self.directory = directory
+        self.cache_dir = cache_dir if cache_dir is not None else os.path.join(directory, ".mmap")
+        self.chunk_names = sorted(
+            f[: -len(".npz")]
+            for f in os.listdir(directory)
+            if f.startswith(agent_prefix) and f.endswith(".npz")
+        ) if os.path.isdir(directory) else []
+
+    def __len__(self):
+        # only the small reward column has to be decompressed to count rows
+        num_rows = 0
+        for name in self.chunk_names:
+            with np.load(os.path.join(self.directory, name + ".npz")) as chunk:
+                num_rows += len(chunk["reward"])
+        return num_rows
+
+    def load_chunk(self, chunk_name: str) -> Dict[str, np.ndarray]:
+        """
+        Returns every column of a chunk as a read only memory mapped array.
+        """
+        chunk_dir = os.path.join(self.cache_dir, chunk_name)
+        if not os.path.isdir(chunk_dir):
+            tmp_dir = chunk_dir + ".tmp"
+            os.makedirs(tmp_dir, exist_ok=True)
+            with np.load(os.path.join(self.directory, chunk_name + ".npz")) as chunk:
+                for column in chunk.files:
+                    np.save(os.path.join(tmp_dir, column + ".npy"), chunk[column])
+            os.replace(tmp_dir, chunk_dir)
+
+        return {
+            f[: -len(".npy")]: np.load(os.path.join(chunk_dir, f), mmap_mode="r")
+            for f in os.listdir(chunk_dir)
+            if f.endswith(".npy")
+        }
+
+    def iter_chunks(self):
+        """
+        Yields the columns of every chunk in recording order.
+        """
+        for name in self.chunk_names:
+            yield self.load_chunk(name)
+
+    def iter_batches(self, batch_size: int, shuffle: bool = True, seed: int = None):
+        """
+        Yields batches of transitions as (obs, actions, rewards, next_obs, dones).
+
+        Batches never span chunks, so shuffling is done over the order of the chunks and over the rows inside
+        each chunk. This keeps the number of chunks paged in at any time to one.
+        """
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(self.chunk_names)) if shuffle else range(len(self.chunk_names))
+        for chunk_index in order:
+            columns = self.load_chunk(self.chunk_names[chunk_index])
+            num_rows = len(columns["reward"])
+            rows = rng.permutation(num_rows) if shuffle else np.arange(num_rows)
+            for start in range(0, num_rows, batch_size):
+                # sorted indices keep the reads from the memory map sequential
+                index = np.sort(rows[start:start + batch_size])
+                yield split_columns(columns, index)
+
+
+def split_columns(columns: Dict[str, np.ndarray], index=slice(None)):
+    """
+    Splits chunk columns into (obs, actions, rewards, next_obs, dones) for the given rows.
+    """
+    obs = {key[len("obs_"):]: np.asarray(value[index]) for key, value in columns.items() if key.startswith("obs_")}
+    next_obs = {key[len("next_obs_"):]: np.asarray(value[index]) for key, value in columns.items() if key.startswith("next_obs_")}
+    return (
+        obs,
+        np.asarray(columns["action"][index]),
+        np.asarray(columns["reward"][index]),
+        next_obs,
+        np.asarray(columns["done"][index]),
+    )
+
+
+def fill_replay_buffer(model, dataset: TrajectoryDataset, max_transitions: int = None):
+    """
+    Copies recorded transitions straight into the replay buffer of an off-policy SB3 model.
+
+    Rows are written a whole chunk at a time into the buffer arrays instead of going through
+    ReplayBuffer.add() one transition at a time. When the buffer stores several envs per position the rows
+    are spread over all env columns.
+
+    Returns:
+        int: Number of transitions added to the replay buffer.
+    """
+    buffer = model.replay_buffer
+    n_envs = buffer.n_envs
+    added = 0
+    for columns in dataset.iter_chunks():
+        obs, actions, rewards, next_obs, dones = split_columns(columns)
+        num_rows = len(rewards)
+        if max_transitions is not None:
+            num_rows = min(num_rows, max_transitions - added)
+        num_rows -= num_rows % n_envs
+        if num_rows <= 0:
+            break
+
+        # recorded actions are what was sent to the env, the buffer stores them scaled to [-1, 1]
+        actions = model.policy.scale_action(actions[:num_rows])
+
+        start = 0
+        while start < num_rows:
+            positions = min((num_rows - start) // n_envs, buffer.buffer_size - buffer.pos)
+            end = start + positions * n_envs
+            rows = slice(buffer.pos, buffer.pos + positions)
+
+            for key in buffer.observations.keys():
+                buffer.observations[key][rows] = obs[key][start:end].reshape(positions, n_envs, *buffer.obs_shape[key])
+                buffer.next_observations[key][rows] = next_obs[key][start:end].reshape(positions, n_envs, *buffer.obs_shape[key])
+            buffer.actions[rows] = actions[start:end].reshape(positions, n_envs, buffer.action_dim)
+            buffer.rewards[rows] = rewards[start:end].reshape(positions, n_envs)
+            buffer.dones[rows] = dones[start:end].reshape(positions, n_envs)
+            if hasattr(buffer, "timeouts"):
+                buffer.timeouts[rows] = 0
+            # prioritized buffers have to learn about slots written behind the back of add()
+            if hasattr(buffer, "set_initial_priorities"):
+                leaves = np.arange(buffer.pos * n_envs, (buffer.pos + positions) * n_envs)
+                buffer.set_initial_priorities(leaves, rewards[start:end])
+
+            buffer.pos += positions
+            if buffer.pos == buffer.buffer_size:
+                buffer.full = True
+                buffer.pos = 0
+            start = end
+
+        added += num_rows
+        if max_transitions is not None and added >= max_transitions:
+            break
+    return added
+
+
+def pretrain_offline(model, gradient_steps: int):
+    """
+    Runs gradient steps of the model on whatever is already in its replay buffer, without touching the env.
+
+    train() needs a logger before learn() set one up, a stdout logger stands in for the pretraining only and the
+    model's own logger setup is restored afterwards, so learn() still configures it as usual.
+    """
+    if model.replay_buffer.size() < model.batch_size:
+        return
+    previous_logger = model.__dict__.get("_logger")
+    previous_custom = model.__dict__.get("_custom_logger", False)
+    model.set_logger(configure(None, ["stdout"]))
+    try:
+        model.train(gradient_steps=gradient_steps, batch_size=model.batch_size)
+    finally:
+        if previous_logger is None:
+            del model._logger
+        else:
+            model._logger = previous_logger
+        model._custom_logger = previous_custom
+
+
+def pretrain_behaviour_cloning(model, dataset: TrajectoryDataset, epochs: int = 1, batch_size: int = 256):
+    """
+    Fits the actor of a SAC model to the recorded actions with a mean squared error loss.
+
+    Returns:
+        float: Loss of the last batch. None if the dataset is empty.
+    """
+    loss_value = None
+    for _ in range(epochs):
+        for obs, actions, _, _, _ in dataset.iter_batches(batch_size):
+            obs_tensor, _ = model.policy.obs_to_tensor(obs)
+            target = th.as_tensor(model.policy.scale_action(actions), device=model.device)
+            predicted = model.actor(obs_tensor, deterministic=True)
+            loss = F.mse_loss(predicted, target)
+
+            model.actor.optimizer.zero_grad()
+            loss.backward()
+            model.actor.optimizer.step()
+            loss_value = loss.item()
+    return loss_value
@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+from typing import Dict
+
+import numpy as np
+
+
+class TrajectoryRecorder:
+    """
+    Streams per-step agent transitions to disk as chunked, compressed columnar files.
+
+    Every agent gets its own row buffer. Once a buffer holds chunk_size rows it is handed to a background
+    writer thread which stacks each column into an array and saves the chunk as a compressed .npz file named
+    "{agent_id}_{chunk_index:06d}.npz". Chunks are written to a temporary file first and renamed once complete,
+    so readers never see a partially written chunk.
+
+    Columns of a chunk:
+        episode (int64)        - Mission counter the transition belongs to.
+        step (int32)           - Agent step within the episode.
+        action (float32, 4)    - Action sent to Malmo.
+        reward (float32)       - Reward returned by the environment.
+        done (bool)            - Whether the mission ended on this step.
+        pose (float32, 5)      - XPos, YPos, ZPos, Yaw and Pitch after the action.
+        obs_<key>              - Decoded observation the action was chosen from.
+        next_obs_<key>         - Decoded observation after the action.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 1024, video_every_n_episodes: int = 0, max_pending_chunks: int = 8):
+        """
+        Arguments:
+            directory (str):
+                Folder chunks are written to. Created if it doesn't exist.
+            chunk_size (int):
+                Number of transitions per agent stored in a single chunk file.
+            video_every_n_episodes (int):
+                Record the Malmo MP4 of every Nth episode. 0 disables video recording.
+            max_pending_chunks (int):
+                Number of full chunks that can wait for the writer thread before record() blocks.
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.video_every_n_episodes = video_every_n_episodes
+        os.makedirs(self.directory, exist_ok=True)
+
+        ### Recorder State ###
+        self.buffers = {}
+        self.chunk_counters = {}
+        self.num_recorded = 0
+
+        ### Writer Thread ###
+        self.pending = queue.Queue(maxsize=max_pending_chunks)
+        self.writer_error = None
+        self.writer = threading.Thread(target=self._writer_loop, name="trajectory-writer", daemon=True)
+        self.writer.start()
+
+    def should_record_video(self, episode: int):
+        """
+        Returns True if the MP4 of the given episode should be recorded.
+        """
+        return self.video_every_n_episodes > 0 and episode % self.video_every_n_episodes == 0
+
+    def record(
+        self,
+        agent_id: str,
+        episode: int,
+        step: int,
+        obs: Dict[str, np.ndarray],
+        action,
+        reward: float,
+        next_obs: Dict[str, np.ndarray],
+        done: bool,
+        pose,
+    ):
+        """
+        Buffers a single transition of an agent. Full buffers are queued for the writer thread.
+        """
+        if self.writer_error is not None:
+            raise RuntimeError("trajectory writer thread failed") from self.writer_error
+
+        rows = self.buffers.setdefault(agent_id, [])
+        rows.append((episode, step, obs, action, reward, next_obs, done, pose))
+        self.num_recorded += 1
+        if len(rows) >= self.chunk_size:
+            self._queue_chunk(agent_id)
+
+    def flush(self):
+        """
+        Queues every partially filled buffer and waits until the writer thread has saved them.
+        """
+        for agent_id in list(self.buffers.keys()):
+            if len(self.buffers[agent_id]) > 0:
+                self._queue_chunk(agent_id)
+        self.pending.join()
+
+    def close(self):
+        """
+        Flushes all buffers and stops the writer thread.
+        """
+        self.flush()
+        self.pending.put(None)
+        self.writer.join()
+
+    def _queue_chunk(self, agent_id: str):
+        if agent_id not in self.chunk_counters:
+            # continue numbering after chunks left behind by earlier runs instead of overwriting them
+            self.chunk_counters[agent_id] = len(
+                [f for f in os.listdir(self.directory) if f.startswith(f"{agent_id}_") and f.endswith(".npz")]
+            )
+        chunk_index = self.chunk_counters[agent_id]
+        self.chunk_counters[agent_id] = chunk_index + 1
+        rows = self.buffers[agent_id]
+        self.buffers[agent_id] = []
+        self.pending.put((agent_id, chunk_index, rows))
+
+    def _writer_loop(self):
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                self._write_chunk(*item)
+            except Exception as e:
+                self.writer_error = e
+            finally:
+                self.pending.task_done()
+
+    def _write_chunk(self, agent_id: str, chunk_index: int, rows):
+        episodes, steps, obs, actions, rewards, next_obs, dones, poses = zip(*rows)
+        columns = {
+            "episode": np.asarray(episodes, dtype=np.int64),
+            "step": np.asarray(steps, dtype=np.int32),
+            "action": np.asarray(actions, dtype=np.float32),
+            "reward": np.asarray(rewards, dtype=np.float32),
+            "done": np.asarray(dones, dtype=bool),
+            "pose": np.asarray(poses, dtype=np.float32),
+        }
+        for key in obs[0].keys():
+            columns[f"obs_{key}"] = np.stack([o[key] for o in obs]).astype(np.float32)
+            columns[f"next_obs_{key}"] = np.stack([o[key] for o in next_obs]).astype(np.float32)
+
+        path = os.path.join(self.directory, f"{agent_id}_{chunk_index:06d}.npz")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp_path, path)
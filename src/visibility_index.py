@@ -0,0 +1,159 @@
+import numpy as np
+
+from artifact_cache import arena_hash, shared_cache
+from line_of_sight import OPAQUE_CELLS, as_grids, opaque_lookup, segment_clear
+
+# number of source cells whose rays are marched together while building an index
+BUILD_BATCH_CELLS = 64
+
+
+class VisibilityIndex:
+    """
+    Cell to cell visibility of a static play_arena stored as a bitset.
+
+    Bit j of row i is set when the centre of cell j can be seen from the centre of cell i. Cells are numbered
+    row major, index = z * width + x, matching the [z][x] layout of play_arena. The table is built once with
+    the line_of_sight ray marcher and then patched whenever a single cell changes, for example when a hider
+    places a dirt block or a seeker digs one up.
+    """
+
+    def __init__(self, play_arena, opaque=OPAQUE_CELLS):
+        """
+        Arguments:
+            play_arena (list[list[int]]):
+                2D map of the arena as returned by gen_quadrant_env.
+            opaque (tuple[int]):
+                play_arena values that block sight.
+        """
+        self.opaque = opaque
+        self.grid = as_grids(play_arena)[0].copy()
+        self.height, self.width = self.grid.shape
+        self.num_cells = self.height * self.width
+
+        z, x = np.divmod(np.arange(self.num_cells), self.width)
+        self.centres = np.stack([x + 0.5, z + 0.5], axis=-1)
+        self.bits = np.zeros((self.num_cells, (self.num_cells + 7) // 8), dtype=np.uint8)
+        self._build()
+
+    def copy(self):
+        """
+        Returns an independent copy that can be patched without touching the cached index.
+        """
+        index = VisibilityIndex.__new__(VisibilityIndex)
+        index.__dict__.update(self.__dict__)
+        index.grid = self.grid.copy()
+        index.bits = self.bits.copy()
+        return index
+
+    def cell_index(self, x: int, z: int):
+        return z * self.width + x
+
+    def can_see(self, a, b):
+        """
+        Returns True if cell b = (x, z) is visible from cell a = (x, z).
+        """
+        i = self.cell_index(*a)
+        j = self.cell_index(*b)
+        return bool((self.bits[i, j >> 3] >> (7 - (j & 7))) & 1)
+
+    def can_see_many(self, a, b):
+        """
+        Vectorized can_see for arrays of (x, z) cells of shape (..., 2).
+        """
+        a = np.asarray(a, dtype=np.intp)
+        b = np.asarray(b, dtype=np.intp)
+        i = self.cell_index(a[..., 0], a[..., 1])
+        j = self.cell_index(b[..., 0], b[..., 1])
+        return ((self.bits[i, j >> 3] >> (7 - (j & 7))) & 1).astype(bool)
+
+    def visible_from(self, x: int, z: int):
+        """
+        Returns a boolean array of shape (H, W) of every cell visible from (x, z).
+        """
+        row = np.unpackbits(self.bits[self.cell_index(x, z)], count=self.num_cells)
+        return row.astype(bool).reshape(self.height, self.width)
+
+    def visible_counts(self):
+        """
+        Returns how many cells each cell can see, shape (H, W). Handy for picking exposed or hidden spawns.
+        """
+        counts = np.unpackbits(self.bits, axis=1, count=self.num_cells).sum(axis=1)
+        return counts.reshape(self.height, self.width)
+
+    def place_block(self, x: int, z: int, value: int = 2):
+        """
+        Marks a cell as filled, by default with a dirt block, and updates the affected visibility bits.
+        """
+        self.set_cell(x, z, value)
+
+    def remove_block(self, x: int, z: int):
+        """
+        Marks a cell as empty and updates the affected visibility bits.
+        """
+        self.set_cell(x, z, 0)
+
+    def set_cell(self, x: int, z: int, value: int):
+        """
+        Changes a single cell and re-checks only the pairs whose line of sight passes through it.
+
+        A cell turning opaque can only hide pairs that were visible, and a cell turning transparent can only
+        reveal pairs that were hidden, so the other half of the table is skipped entirely.
+        """
+        was_opaque = self.grid[z, x] in self.opaque
+        self.grid[z, x] = value
+        if was_opaque == (value in self.opaque):
+            return
+
+        visible = np.unpackbits(self.bits, axis=1, count=self.num_cells).astype(bool)
+        i, j = np.nonzero(visible if not was_opaque else ~visible)
+        crosses = segments_cross_cell(self.centres[i], self.centres[j], x, z)
+        i = i[crosses]
+        j = j[crosses]
+        self._set_bits(i, j, segment_clear(self.grid, 0, self.centres[i], self.centres[j], self.opaque))
+
+    def _build(self):
+        blocked = opaque_lookup(as_grids(self.grid), self.opaque)
+        targets = np.arange(self.num_cells)
+        for start in range(0, self.num_cells, BUILD_BATCH_CELLS):
+            sources = np.arange(start, min(start + BUILD_BATCH_CELLS, self.num_cells))
+            i = np.repeat(sources, self.num_cells)
+            j = np.tile(targets, len(sources))
+            visible = segment_clear(self.grid, 0, self.centres[i], self.centres[j], self.opaque, blocked)
+            self.bits[sources] = np.packbits(visible.reshape(len(sources), self.num_cells), axis=1)
+
+    def _set_bits(self, i, j, values):
+        masks = (1 << (7 - (j & 7))).astype(np.uint8)
+        columns = j >> 3
+        np.bitwise_and.at(self.bits, (i, columns), ~masks)
+        np.bitwise_or.at(self.bits, (i[values], columns[values]), masks[values])
+
+
+def segments_cross_cell(starts, ends, x: int, z: int):
+    """
+    Slab test of many segments against the unit square of cell (x, z).
+
+    Returns:
+        np.ndarray: Boolean array of shape (N,).
+    """
+    direction = ends - starts
+    low = np.array([x, z], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t0 = (low - starts) / direction
+        t1 = (low + 1 - starts) / direction
+    # segments parallel to an axis only cross if they lie inside that slab
+    inside = (starts >= low) & (starts <= low + 1)
+    t_near = np.where(direction == 0, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1)).max(axis=1)
+    t_far = np.where(direction == 0, np.where(inside, np.inf, -np.inf), np.maximum(t0, t1)).min(axis=1)
+    return (t_near <= t_far) & (t_far >= 0) & (t_near <= 1)
+
+
+def get_visibility_index(play_arena, opaque=OPAQUE_CELLS):
+    """
+    Returns the VisibilityIndex of a play_arena, building it only the first time that arena is seen.
+
+    Agent markers (4) don't block sight, so they are ignored when looking up an arena. Indexes are kept in the
+    shared artifact cache. The returned index is shared, copy() it before placing or removing blocks.
+    """
+    grid = as_grids(play_arena)[0]
+    key = arena_hash(grid, config={"opaque": list(opaque)})
+    return shared_cache.get_or_build("visibility", key, lambda: VisibilityIndex(np.where(grid == 4, 0, grid), opaque))
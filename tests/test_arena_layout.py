@@ -0,0 +1,87 @@
+import random
+from collections import deque
+
+import numpy as np
+
+from arena_layout import describe_layout, find_chokepoints
+from distance_field import BLOCKED_CELLS
+from env import create_env
+
+
+def count_components(walkable):
+    seen = np.zeros(walkable.shape, dtype=bool)
+    count = 0
+    for start in zip(*np.nonzero(walkable)):
+        if seen[start]:
+            continue
+        count += 1
+        seen[start] = True
+        queue = deque([start])
+        while queue:
+            row, col = queue.popleft()
+            for r, c in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+                if 0 <= r < walkable.shape[0] and 0 <= c < walkable.shape[1] and walkable[r, c] and not seen[r, c]:
+                    seen[r, c] = True
+                    queue.append((r, c))
+    return count
+
+
+def reference_chokepoints(walkable):
+    # a chokepoint splits its part of the walkable area when it is blocked
+    components = count_components(walkable)
+    chokepoints = []
+    for row, col in zip(*np.nonzero(walkable)):
+        blocked = walkable.copy()
+        blocked[row, col] = False
+        if count_components(blocked) > components:
+            chokepoints.append((int(row), int(col)))
+    return tuple(chokepoints)
+
+
+def test_chokepoints_match_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        height, width = rng.integers(1, 9, 2)
+        walkable = rng.random((height, width)) < rng.uniform(0.4, 0.9)
+        assert find_chokepoints(walkable) == reference_chokepoints(walkable)
+
+
+def test_layout_masks():
+    play_arena = [
+        [0, 0, 0, 0, 0],
+        [0, 1, 1, 1, 0],
+        [0, 1, 0, 0, 0],
+        [0, 1, 0, 2, 0],
+        [0, 1, 1, 1, 0],
+    ]
+    layout = describe_layout(play_arena, rooms=[((2, 2), (3, 3))], doors=[(2, 4)])
+    walkable = ~np.isin(play_arena, BLOCKED_CELLS)
+    assert np.array_equal(layout.inside | layout.outside, walkable)
+    assert not (layout.inside & layout.outside).any()
+    assert layout.room_of((3, 2)) == 0
+    assert layout.room_of((0, 0)) is None
+    assert layout.chokepoints == reference_chokepoints(walkable)
+
+
+def test_dirt_is_not_walkable():
+    # a dirt block closes the only way between the two halves, the cell next to it is no chokepoint anymore
+    play_arena = [
+        [0, 0, 1, 0, 0],
+        [0, 0, 1, 0, 0],
+        [0, 0, 0, 2, 0],
+        [0, 0, 1, 0, 0],
+    ]
+    layout = describe_layout(play_arena)
+    assert not layout.outside[2, 3]
+    assert (2, 2) not in layout.chokepoints
+    assert layout.chokepoints == reference_chokepoints(~np.isin(play_arena, (1, 2)))
+
+
+def test_generated_layout_matches_finished_map():
+    random.seed(0)
+    item_gen = {"blocks_inside": True, "blocks_outside": True, "stairs_inside": True, "stairs_outside": True}
+    for _ in range(20):
+        _, play_arena, layout = create_env(10, True, "quadrant", item_gen, 6, 3)
+        walkable = ~np.isin(play_arena, BLOCKED_CELLS)
+        assert np.array_equal(layout.inside | layout.outside, walkable)
+        assert layout.chokepoints == find_chokepoints(walkable)
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import numpy as np
+
+import fake_malmo
+
+fake_malmo.install()
+
+from async_malmo import AsyncAgentHost, start_mission, step  # noqa: E402
+
+
+async def play(num_missions, num_agents, num_steps, window):
+    client_pool = fake_malmo.ClientPool()
+    for port in range(10000, 10000 + num_agents):
+        client_pool.add(fake_malmo.ClientInfo("127.0.0.1", port))
+    starts = []
+    agent_hosts = []
+    for mission in range(num_missions):
+        mission_spec = fake_malmo.MissionSpec(fake_malmo.example_mission_xml(num_agents, seed=mission), True)
+        mission_hosts = {f"agent_{i}": AsyncAgentHost(fake_malmo.AgentHost(), f"mission_{mission}_agent_{i}") for i in range(num_agents)}
+        record_specs = {name: fake_malmo.MissionRecordSpec() for name in mission_hosts}
+        starts.append(start_mission(mission_hosts, mission_spec, client_pool, record_specs, f"async_test_{mission}", timeout=10))
+        agent_hosts += mission_hosts.values()
+    # every mission starts and waits for its agents at the same time
+    await asyncio.gather(*starts)
+
+    hiders = [i % num_agents == 0 for i in range(len(agent_hosts))]
+    first = await asyncio.gather(*(agent_host.next_observation(5.0) for agent_host in agent_hosts))
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        results = await step(agent_hosts, np.tile([0.0, 1.0, 0.0, 0.0], (len(agent_hosts), 1)), hiders, window=window, timeout=5.0)
+    elapsed = time.perf_counter() - start
+    for agent_host in agent_hosts:
+        await agent_host.quit()
+    return first, results, elapsed
+
+
+def test_one_loop_drives_several_missions():
+    num_missions, num_agents, num_steps, window = 3, 2, 4, 0.05
+    first, results, elapsed = asyncio.run(play(num_missions, num_agents, num_steps, window))
+    assert len(results) == num_missions * num_agents
+    for (before, _), (after, _) in zip(first, results):
+        assert after is not None
+        # every agent turned for its own window, no agent waited for the others to take their turn
+        assert after["Yaw"] != before["Yaw"]
+    # the windows of all agents overlap, a step takes one window and not one per agent
+    assert elapsed < num_steps * window * num_agents * num_missions
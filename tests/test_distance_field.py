@@ -0,0 +1,79 @@
+from collections import deque
+
+import numpy as np
+
+from distance_field import UNREACHABLE, DistanceField, bfs
+
+
+def random_grid(rng, height, width, density=0.3):
+    return np.where(rng.random((height, width)) < density, rng.choice([1, 2, 3], (height, width)), 0).astype(np.int8)
+
+
+def reference_field(passable, source):
+    field = np.full(passable.shape, UNREACHABLE, dtype=np.float32)
+    x, z = source
+    if not passable[z, x]:
+        return field
+    field[z, x] = 0
+    queue = deque([(x, z)])
+    while queue:
+        x, z = queue.popleft()
+        for nx, nz in ((x + 1, z), (x - 1, z), (x, z + 1), (x, z - 1)):
+            if 0 <= nz < passable.shape[0] and 0 <= nx < passable.shape[1] and passable[nz, nx] and field[nz, nx] == UNREACHABLE:
+                field[nz, nx] = field[z, x] + 1
+                queue.append((nx, nz))
+    return field
+
+
+def test_bfs_matches_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(30):
+        height, width = rng.integers(2, 10, 2)
+        passable = rng.random((height, width)) > 0.3
+        sources = np.stack([rng.integers(0, width, 5), rng.integers(0, height, 5)], axis=-1)
+        fields = bfs(passable, sources)
+        for source, field in zip(sources, fields):
+            assert np.array_equal(field, reference_field(passable, source))
+        nearest = bfs(passable, sources, multi_source=True)[0]
+        assert np.array_equal(nearest, np.min([reference_field(passable, source) for source in sources], axis=0))
+
+
+def test_set_cell_matches_fresh_search():
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        height, width = rng.integers(3, 9, 2)
+        grid = random_grid(rng, height, width)
+        field = DistanceField(grid)
+        # keep fields of some sources before patching, so both the blocking and the opening path are exercised
+        field.field_index(np.stack([rng.integers(0, width, 6), rng.integers(0, height, 6)], axis=-1))
+        for _ in range(15):
+            x, z = int(rng.integers(width)), int(rng.integers(height))
+            if rng.random() < 0.5:
+                field.place_block(x, z)
+            else:
+                field.remove_block(x, z)
+            for (sx, sz), row in field.sources.items():
+                assert np.array_equal(field.fields[row], reference_field(field.passable, (sx, sz)))
+
+
+def test_labels_match_reachability():
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        height, width = rng.integers(2, 8, 2)
+        field = DistanceField(random_grid(rng, height, width))
+        labels = field.labels()
+        for z, x in zip(*np.nonzero(field.passable)):
+            reachable = reference_field(field.passable, (x, z)) != UNREACHABLE
+            assert np.array_equal(labels == labels[z, x], reachable)
+        assert (labels[~field.passable] == -1).all()
+
+
+def test_copy_is_independent():
+    field = DistanceField(np.zeros((5, 5), dtype=np.int8))
+    before = field.field(0, 0).copy()
+    patched = field.copy()
+    patched.place_block(1, 0)
+    patched.place_block(0, 1)
+    assert np.array_equal(field.field(0, 0), before)
+    assert field.passable.all()
+    assert patched.distance((0, 0), (4, 4)) == UNREACHABLE
@@ -0,0 +1,89 @@
+import time
+import types
+
+import pytest
+
+import fake_malmo
+
+fake_malmo.install()
+
+import multi_agent_helper  # noqa: E402
+from multi_agent_helper import MissionStartError, safeStartMission, safeWaitForStart  # noqa: E402
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # the helpers wait 2 seconds between attempts, the waits are recorded instead
+    slept = []
+    monkeypatch.setattr(multi_agent_helper, "time", types.SimpleNamespace(sleep=slept.append, time=time.time))
+    return slept
+
+
+def start(server, num_agents=2, experiment_id="test"):
+    mission_spec = fake_malmo.MissionSpec(fake_malmo.example_mission_xml(num_agents), True)
+    client_pool = fake_malmo.ClientPool()
+    for port in range(10000, 10000 + num_agents):
+        client_pool.add(fake_malmo.ClientInfo("127.0.0.1", port))
+    agent_hosts = [fake_malmo.AgentHost(server) for _ in range(num_agents)]
+    for role, agent_host in enumerate(agent_hosts):
+        safeStartMission(agent_host, mission_spec, client_pool, fake_malmo.MissionRecordSpec(), role, experiment_id)
+    return agent_hosts
+
+
+def test_start_waits_for_the_server_to_warm_up(sleeps):
+    server = fake_malmo.SimulatedServer(fake_malmo.Faults(warming_up=3))
+    agent_hosts = start(server)
+    assert len(sleeps) == 3
+    assert server.warming_up == 0
+    assert all(agent_host.mission is agent_hosts[0].mission for agent_host in agent_hosts)
+
+
+def test_start_retries_failed_starts(sleeps):
+    server = fake_malmo.SimulatedServer(fake_malmo.Faults(start_failure_rate=0.5, seed=3))
+    agent_hosts = start(server)
+    assert len(sleeps) > 0
+    assert agent_hosts[1].mission is agent_hosts[0].mission
+
+    server = fake_malmo.SimulatedServer(fake_malmo.Faults(start_failure_rate=1.0))
+    with pytest.raises(MissionStartError, match="after 5 attempts"):
+        start(server)
+    assert len(sleeps) > 4
+
+
+def test_observations_are_dropped():
+    for drop_rate in (0.0, 1.0):
+        server = fake_malmo.SimulatedServer(fake_malmo.Faults(drop_rate=drop_rate, seed=0))
+        agent_hosts = start(server)
+        safeWaitForStart(agent_hosts, time_out=5)
+        time.sleep(0.3)
+        world_state = agent_hosts[0].getWorldState()
+        assert world_state.is_mission_running
+        if drop_rate == 0.0:
+            assert world_state.number_of_observations_since_last_state >= 4
+            assert len(world_state.observations) == 1
+        else:
+            assert world_state.number_of_observations_since_last_state == 0
+            assert world_state.observations == []
+        agent_hosts[0].sendCommand("quit")
+
+
+def test_hosts_keep_their_server_across_configure():
+    fake_malmo.configure()
+    agent_hosts = [fake_malmo.AgentHost() for _ in range(2)]
+    mission_spec = fake_malmo.MissionSpec(fake_malmo.example_mission_xml(2), True)
+    agent_hosts[0].startMission(mission_spec, None, fake_malmo.MissionRecordSpec(), 0, "configured")
+    # a later configure doesn't take the mission away from the roles that still have to join
+    fake_malmo.configure(start_failure_rate=1.0)
+    agent_hosts[1].startMission(mission_spec, None, fake_malmo.MissionRecordSpec(), 1, "configured")
+    assert agent_hosts[1].mission is agent_hosts[0].mission
+    with pytest.raises(fake_malmo.MissionException):
+        fake_malmo.AgentHost().startMission(mission_spec, None, fake_malmo.MissionRecordSpec(), 0, "later")
+    agent_hosts[0].sendCommand("quit")
+    fake_malmo.configure()
+
+
+def test_benchmark_leaves_the_configured_server_alone():
+    server = fake_malmo._server
+    result = fake_malmo.benchmark_start(num_missions=1, num_agents=2)
+    assert result["failures"] == 0
+    assert fake_malmo._server is server
@@ -0,0 +1,67 @@
+import numpy as np
+
+from line_of_sight import OPAQUE_CELLS, segment_clear, visible_cells
+
+
+def random_grid(rng, height, width, density=0.3):
+    return np.where(rng.random((height, width)) < density, rng.choice([1, 2], (height, width)), 0).astype(np.int8)
+
+
+def crosses(start, end, x, z):
+    # clips the segment against the square of the cell, grazing an edge or a corner doesn't count
+    t_low, t_high = 0.0, 1.0
+    for axis, low in ((0, x), (1, z)):
+        delta = end[axis] - start[axis]
+        if delta == 0:
+            if not low < start[axis] < low + 1:
+                return False
+            continue
+        t0, t1 = sorted(((low - start[axis]) / delta, (low + 1 - start[axis]) / delta))
+        t_low, t_high = max(t_low, t0), min(t_high, t1)
+    return t_low < t_high
+
+
+def reference_clear(grid, start, end):
+    # every opaque cell the segment passes through blocks it, except the cells it starts and ends in
+    start_cell = tuple(int(v) for v in np.floor(start))
+    end_cell = tuple(int(v) for v in np.floor(end))
+    for z, x in zip(*np.nonzero(np.isin(grid, OPAQUE_CELLS))):
+        if (x, z) not in (start_cell, end_cell) and crosses(start, end, x, z):
+            return False
+    return True
+
+
+def test_segment_clear_matches_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        height, width = rng.integers(3, 9, 2)
+        grid = random_grid(rng, height, width)
+        starts = rng.random((40, 2)) * (width, height)
+        ends = rng.random((40, 2)) * (width, height)
+        clear = segment_clear(grid, 0, starts, ends)
+        expected = [reference_clear(grid, start, end) for start, end in zip(starts, ends)]
+        assert clear.tolist() == expected
+
+
+def test_segment_clear_picks_the_arena_of_every_segment():
+    rng = np.random.default_rng(1)
+    grids = np.stack([random_grid(rng, 6, 6) for _ in range(4)])
+    arena_index = rng.integers(0, len(grids), 200)
+    starts = rng.random((200, 2)) * 6
+    ends = rng.random((200, 2)) * 6
+    clear = segment_clear(grids, arena_index, starts, ends)
+    for k, grid in enumerate(grids):
+        mask = arena_index == k
+        assert np.array_equal(clear[mask], segment_clear(grid, 0, starts[mask], ends[mask]))
+
+
+def test_visible_cells_matches_reference():
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        height, width = rng.integers(3, 9, 2)
+        grid = random_grid(rng, height, width)
+        pos = rng.random(2) * (width, height)
+        visible = visible_cells(grid, pos)
+        for z in range(height):
+            for x in range(width):
+                assert visible[z, x] == reference_clear(grid, pos, np.array([x + 0.5, z + 0.5]))
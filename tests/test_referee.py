@@ -0,0 +1,58 @@
+import numpy as np
+
+from referee import DEFAULT_REWARD_WEIGHTS, Referee
+
+# open 6x6 arena, agents face +z at yaw 0
+OPEN_ARENA = np.zeros((6, 6), dtype=np.int8).tolist()
+
+
+def make_referee():
+    referee = Referee(["hider_0"], ["seeker_0"], dict(DEFAULT_REWARD_WEIGHTS))
+    referee.reset(OPEN_ARENA)
+    return referee
+
+
+def test_hider_walking_into_idle_seeker_sight_is_penalized():
+    referee = make_referee()
+    # the seeker reports once, then its team is idle for the hiders' phase
+    referee.report("seeker_0", (2.5, 2.0, 0.5, 0.0, 0.0))
+    referee.report("hider_0", (5.5, 2.0, 5.5, 0.0, 0.0))
+    assert referee.judge() == {"seeker_0": 0.0, "hider_0": 0.0}
+
+    referee.report("hider_0", (2.5, 2.0, 4.5, 0.0, 0.0))
+    assert referee.judge() == {"hider_0": DEFAULT_REWARD_WEIGHTS["hider_found"]}
+    assert referee.any_found()
+    # found once per episode
+    referee.report("hider_0", (2.5, 2.0, 4.5, 0.0, 0.0))
+    assert referee.judge() == {"hider_0": 0.0}
+
+
+def test_seeker_without_pose_detects_nothing():
+    referee = make_referee()
+    referee.report("hider_0", (2.5, 2.0, 4.5, 0.0, 0.0))
+    assert referee.judge() == {"hider_0": 0.0}
+    assert not referee.any_found()
+
+
+def test_hider_found_while_idle_pays_on_its_next_report():
+    referee = make_referee()
+    referee.report("seeker_0", (2.5, 2.0, 0.5, 0.0, 0.0), spotted="hider_0")
+    assert referee.judge() == {"seeker_0": DEFAULT_REWARD_WEIGHTS["seeker_found_hider"]}
+    referee.report("seeker_0", (2.5, 2.0, 0.5, 0.0, 0.0), spotted="hider_0")
+    assert referee.judge() == {"seeker_0": 0.0}
+
+    referee.report("hider_0", (5.5, 2.0, 5.5, 0.0, 0.0))
+    assert referee.judge() == {"hider_0": DEFAULT_REWARD_WEIGHTS["hider_found"]}
+    referee.report("hider_0", (5.5, 2.0, 5.5, 0.0, 0.0))
+    assert referee.judge() == {"hider_0": 0.0}
+
+
+def test_walls_hide_hiders():
+    arena = np.zeros((6, 6), dtype=np.int8)
+    arena[2, :] = 1
+    referee = Referee(["hider_0"], ["seeker_0"], dict(DEFAULT_REWARD_WEIGHTS))
+    referee.reset(arena.tolist())
+    referee.report("seeker_0", (2.5, 2.0, 0.5, 0.0, 0.0))
+    referee.report("hider_0", (2.5, 2.0, 4.5, 0.0, 0.0))
+    assert referee.judge() == {"seeker_0": 0.0, "hider_0": 0.0}
+    assert not referee.any_found()
@@ -0,0 +1,53 @@
+import random
+import re
+
+import pytest
+
+from env import (
+    FULL_RESET_REGION, ResetRegion, arena_region, create_env, plan_reset_region, reset_cuboids, with_reset_region,
+)
+
+ITEM_GEN = {"blocks_inside": True, "blocks_outside": True, "stairs_inside": True, "stairs_outside": True}
+
+
+def drawn_cells(env):
+    return [
+        (int(x), int(z))
+        for x, z in re.findall(r"<Draw(?:Block|Item) x=['\"](-?\d+)['\"]\s+y=['\"]-?\d+['\"] z=['\"](-?\d+)['\"]", env)
+    ]
+
+
+def inside(region, x, z):
+    return region.x1 <= x <= region.x2 and region.z1 <= z <= region.z2
+
+
+def test_arena_reset_covers_everything_drawn():
+    random.seed(0)
+    for arena_size in (6, 10, 14):
+        env, _, _ = create_env(arena_size, True, "quadrant", ITEM_GEN, 4, 2)
+        region = arena_region(arena_size)
+        assert reset_cuboids(FULL_RESET_REGION) not in env
+        cells = drawn_cells(env)
+        assert len(cells) > 0
+        assert all(inside(region, x, z) for x, z in cells)
+        # the walls around the arena are part of the region too
+        assert inside(region, -1, -1) and inside(region, arena_size, arena_size)
+        assert region.num_blocks() < FULL_RESET_REGION.num_blocks() // 1000
+
+
+def test_plan_adds_the_dirty_region():
+    dirty = ResetRegion(-20, 3, 5, 40)
+    region = plan_reset_region(10, dirty)
+    assert region == ResetRegion(-20, 12, -3, 40)
+    assert plan_reset_region(10) == arena_region(10)
+
+
+def test_with_reset_region_swaps_the_default_reset():
+    random.seed(1)
+    env, _, _ = create_env(8, True, "quadrant", ITEM_GEN, 2, 1)
+    region = ResetRegion(-30, 30, -5, 12)
+    swapped = with_reset_region(env, 8, region)
+    assert reset_cuboids(region) in swapped
+    assert reset_cuboids(arena_region(8)) not in swapped
+    with pytest.raises(ValueError):
+        with_reset_region(env, 9, region)
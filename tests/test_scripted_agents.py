@@ -0,0 +1,110 @@
+import random
+
+import numpy as np
+
+from env import create_env, gen_agent_positions
+from scripted_agents import FLOOR_PITCH, INTERACT_ATTEMPTS, ScriptedHider, ScriptedSeeker, benchmark, heading_to
+from simulator import Simulator
+
+ITEM_GEN = {"blocks_inside": False, "blocks_outside": True, "stairs_inside": False, "stairs_outside": True}
+
+
+def facing_pose(cell, target):
+    pose = np.array([cell[0] + 0.5, 2.0, cell[1] + 0.5, 0.0, FLOOR_PITCH])
+    pose[3] = heading_to(pose, (target[0] + 0.5, target[1] + 0.5))
+    return pose
+
+
+def sealed_game(seed):
+    random.seed(seed)
+    _, play_arena, layout = create_env(10, True, "quadrant", ITEM_GEN, 4, 2)
+    spawns = gen_agent_positions(play_arena, 10, 2, 1, 1, layout)
+    sim = Simulator(play_arena, 2, use_jit=False)
+    for agent, (x, z) in enumerate(spawns):
+        sim.place_agent(agent, x + 0.5, z + 0.5)
+    hider = ScriptedHider()
+    hider.reset(play_arena, layout)
+    for _ in range(40):
+        hider.observe(sim.grid)
+        sim.step(np.stack([hider.act(sim.world_pose(0)), np.zeros(4)]), [True, False])
+    return play_arena, layout, sim
+
+
+def test_seeker_digs_until_the_map_shows_the_dirt_gone():
+    play_arena = np.zeros((5, 5), dtype=np.int8)
+    play_arena[2, 3] = 2
+    seeker = ScriptedSeeker()
+    seeker.reset(play_arena)
+    seeker.digging = (3, 2)
+    pose = facing_pose((2, 2), (3, 2))
+    for _ in range(INTERACT_ATTEMPTS):
+        assert seeker.act(pose)[3] > 0
+        assert seeker.field.grid[2, 3] == 2
+    # the attacks never showed up on the map, the map still has the dirt
+    assert seeker.act(pose)[3] < 0
+    assert seeker.digging is None and seeker.field.grid[2, 3] == 2
+
+    seeker.digging = (3, 2)
+    assert seeker.act(pose)[3] > 0
+    dug = play_arena.copy()
+    dug[2, 3] = 0
+    seeker.observe(dug)
+    seeker.act(pose)
+    assert seeker.digging is None and seeker.field.passable[2, 3]
+
+
+def test_seeker_forgets_dirt_it_only_ran_into():
+    seeker = ScriptedSeeker()
+    seeker.reset(np.zeros((5, 5), dtype=np.int8))
+    seeker.set_cell(3, 2, 2)
+    seeker.digging = (3, 2)
+    pose = facing_pose((2, 2), (3, 2))
+    for _ in range(INTERACT_ATTEMPTS + 1):
+        seeker.act(pose)
+    assert seeker.digging is None and seeker.field.passable[2, 3]
+
+
+def test_hider_retries_a_door_until_the_map_shows_it_sealed():
+    random.seed(0)
+    _, play_arena, layout = create_env(10, True, "quadrant", ITEM_GEN, 4, 2)
+    hider = ScriptedHider()
+    hider.reset(play_arena, layout)
+    stand, door = hider.doors[0]
+    pose = facing_pose(stand, door)
+    for _ in range(INTERACT_ATTEMPTS):
+        assert hider.act(pose)[3] > 0
+        assert hider.field.passable[door[1], door[0]]
+        assert hider.doors[0] == (stand, door)
+
+    sealed = np.array(play_arena)
+    sealed[door[1], door[0]] = 2
+    hider.observe(sealed)
+    hider.act(pose)
+    assert not hider.field.passable[door[1], door[0]]
+    assert (stand, door) not in hider.doors
+
+
+def test_agents_seal_and_dig_on_the_simulator():
+    num_doors = num_sealed = 0
+    for seed in range(10):
+        play_arena, layout, sim = sealed_game(seed)
+        doors = [(col, row) for row, col in layout.doors]
+        num_doors += len(doors)
+        num_sealed += sum(int(sim.grid[z, x] == 2) for x, z in doors)
+
+        seeker = ScriptedSeeker()
+        seeker.reset(play_arena, layout)
+        for _ in range(60):
+            seeker.observe(sim.grid)
+            sim.step(np.stack([np.zeros(4), seeker.act(sim.world_pose(1))]), [True, False])
+            if any(sim.grid[z, x] == 0 for x, z in doors):
+                break
+        else:
+            raise AssertionError(f"the seeker never dug a door open in game {seed}")
+    assert num_sealed >= 0.9 * num_doors
+
+
+def test_benchmark_plays_games():
+    result = benchmark(num_games=2, use_jit=False)
+    assert result["agent_steps_per_second"] > 0
+    assert 0.0 <= result["seeker_win_rate"] <= 1.0
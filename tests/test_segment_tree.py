@@ -0,0 +1,48 @@
+import numpy as np
+
+from segment_tree import MinSegmentTree, SumSegmentTree
+
+
+def test_sum_and_min_match_numpy():
+    rng = np.random.default_rng(0)
+    for capacity in (1, 5, 8, 13, 100):
+        sum_tree = SumSegmentTree(capacity)
+        min_tree = MinSegmentTree(capacity)
+        values = np.zeros(capacity)
+        written = np.zeros(capacity, dtype=bool)
+        for _ in range(30):
+            indices = rng.choice(capacity, rng.integers(1, capacity + 1), replace=False)
+            priorities = rng.uniform(0.01, 10.0, len(indices))
+            sum_tree.update(indices, priorities)
+            min_tree.update(indices, priorities)
+            values[indices] = priorities
+            written[indices] = True
+            assert np.isclose(sum_tree.reduce(), values.sum())
+            assert min_tree.reduce() == values[written].min()
+            assert np.array_equal(sum_tree[np.arange(capacity)], values)
+
+
+def test_prefixsum_index_matches_searchsorted():
+    rng = np.random.default_rng(1)
+    for capacity in (1, 6, 16, 37):
+        tree = SumSegmentTree(capacity)
+        # whole numbers keep every partial sum exact, zero priority leaves must never be found
+        priorities = rng.integers(0, 5, capacity).astype(np.float64)
+        priorities[0] = max(priorities[0], 1.0)
+        tree.update(np.arange(capacity), priorities)
+        cumulative = np.cumsum(priorities)
+        prefixsums = np.concatenate([rng.uniform(0, tree.reduce(), 200), cumulative, [0.0]])
+        leaves = tree.find_prefixsum_index(prefixsums)
+        assert np.array_equal(leaves, np.searchsorted(cumulative, prefixsums, side="left"))
+        assert (priorities[leaves[prefixsums > 0]] > 0).all()
+
+
+def test_sampling_follows_priorities():
+    rng = np.random.default_rng(2)
+    priorities = rng.uniform(0.1, 5.0, 20)
+    tree = SumSegmentTree(len(priorities))
+    tree.update(np.arange(len(priorities)), priorities)
+    num_samples = 200000
+    leaves = tree.find_prefixsum_index(rng.uniform(0, tree.reduce(), num_samples))
+    frequencies = np.bincount(leaves, minlength=len(priorities)) / num_samples
+    assert np.allclose(frequencies, priorities / priorities.sum(), atol=0.005)
@@ -0,0 +1,23 @@
+import pytest
+
+import sim_kernels
+
+
+def test_references_are_pure_python():
+    # numba dispatchers carry the original function as py_func, the references must not be dispatchers
+    for kernel in (sim_kernels.move_agents_py, sim_kernels.cast_rays_py, sim_kernels.segments_clear_py):
+        assert not hasattr(kernel, "py_func")
+
+
+def test_python_segments_match_numpy_line_of_sight():
+    worst = sim_kernels.check_equivalence(num_arenas=5)
+    assert worst["segments_vs_numpy"] == 0
+
+
+@pytest.mark.skipif(not sim_kernels.HAVE_NUMBA, reason="numba is not installed")
+def test_compiled_kernels_match_python():
+    worst = sim_kernels.check_equivalence()
+    assert worst["move"] < 1e-9
+    assert worst["rays"] == 0
+    assert worst["ray_distance"] < 1e-9
+    assert worst["segments"] == 0
@@ -0,0 +1,38 @@
+import random
+import re
+
+import numpy as np
+
+from env import agent_placement, create_env, gen_agent_positions
+from visibility_index import get_visibility_index
+
+ITEM_GEN = {"blocks_inside": False, "blocks_outside": True, "stairs_inside": False, "stairs_outside": True}
+
+
+def placement_cell(placement, offset=(0, 0)):
+    x, z = (int(re.search(rf'\b{axis}="(-?\d+)"', placement).group(1)) for axis in "xz")
+    return x - offset[0], z - offset[1]
+
+
+def test_agents_are_placed_on_the_checked_cells():
+    for seed in range(30):
+        random.seed(seed)
+        _, env_map, layout = create_env(10, True, "quadrant", ITEM_GEN, 4, 2)
+        items = np.isin(env_map, (2, 3))
+        offset = (17, -3)
+        spawns = gen_agent_positions(env_map, 10, 4, 2, 1, layout)
+        visibility = get_visibility_index(env_map)
+        open_cells = np.asarray(env_map) != 1
+        hiders_see = np.zeros(open_cells.shape, dtype=bool)
+        for x, z in spawns[:2]:
+            hiders_see |= visibility.visible_from(x, z)
+
+        for i, spawn in enumerate(spawns):
+            # env.py draws x as the column and z as the row of the map
+            x, z = placement_cell(agent_placement(spawn, offset), offset)
+            assert env_map[z][x] == 4
+            assert (z, x) not in layout.chokepoints
+            if i >= 2 and not hiders_see[open_cells].all():
+                assert not hiders_see[z, x]
+        # spawns never replace the blocks and stairs of the arena
+        assert np.array_equal(np.isin(env_map, (2, 3)), items)
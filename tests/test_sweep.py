@@ -0,0 +1,16 @@
+import pytest
+
+from sweep import Sweep, grid, ports_needed
+
+
+def test_ports_needed_counts_every_agent_and_the_observer():
+    assert ports_needed({}) == 3
+    assert ports_needed({"num_arenas": 4, "num_hiders": 2, "num_seekers": 1}) == 13
+
+
+def test_port_stride_must_cover_every_trial(tmp_path):
+    configs = grid(num_arenas=[1, 6], learning_starts=[10])
+    with pytest.raises(ValueError, match="port_stride 10"):
+        Sweep(configs, out_dir=str(tmp_path), port_stride=10)
+    sweep = Sweep(configs, out_dir=str(tmp_path), port_stride=13)
+    assert sweep.port_stride == 13
@@ -0,0 +1,49 @@
+import random
+import re
+
+import numpy as np
+
+from env import arena_region, create_env, create_tiled_env, offset_drawing, tile_offsets, tiled_region
+
+ITEM_GEN = {"blocks_inside": False, "blocks_outside": True, "stairs_inside": False, "stairs_outside": True}
+
+
+def wall_cells(env):
+    return {
+        (int(x), int(z))
+        for x, z in re.findall(r"<DrawBlock x='(-?\d+)'\s+y='2' z='(-?\d+)' type='cobblestone'/>", env)
+    }
+
+
+def test_tiled_reset_regions_never_overlap():
+    for num_arenas in range(1, 11):
+        for arena_size in (6, 10):
+            offsets = tile_offsets(num_arenas, arena_size)
+            assert offsets[0] == (0, 0)
+            regions = [arena_region(arena_size).shift(dx, dz) for dx, dz in offsets]
+            for i, a in enumerate(regions):
+                for b in regions[i + 1:]:
+                    assert a.x2 < b.x1 or b.x2 < a.x1 or a.z2 < b.z1 or b.z2 < a.z1
+            covering = tiled_region(arena_size, offsets)
+            assert all(covering.union(region) == covering for region in regions)
+
+
+def test_offset_drawing_moves_only_x_and_z():
+    drawing = """<DrawCuboid x1='-1' x2='5' y1='2' y2='3' z1='0' z2='4' type='air'/><DrawBlock x="3" y="2" z="-2" type="dirt"/>"""
+    moved = offset_drawing(drawing, 10, -7)
+    assert moved == """<DrawCuboid x1='9' x2='15' y1='2' y2='3' z1='-7' z2='-3' type='air'/><DrawBlock x="13" y="2" z="-9" type="dirt"/>"""
+
+
+def test_every_arena_is_drawn_at_its_offset():
+    random.seed(0)
+    arenas = [create_env(8, True, "quadrant", ITEM_GEN, 2, 1) for _ in range(4)]
+    offsets = tile_offsets(len(arenas), 8)
+    tiled = create_tiled_env([env for env, _, _ in arenas], offsets)
+    walls = wall_cells(tiled)
+    expected = set()
+    for (_, env_map, _), (dx, dz) in zip(arenas, offsets):
+        for z, x in zip(*np.nonzero(np.asarray(env_map) == 1)):
+            expected.add((int(x) + dx, int(z) + dz))
+    assert len(expected) > 0
+    assert walls == expected
+    assert tiled.count("<DrawingDecorator>") == 1
@@ -0,0 +1,56 @@
+import numpy as np
+
+from line_of_sight import segment_clear
+from visibility_index import VisibilityIndex
+
+
+def random_grid(rng, height, width, density=0.25):
+    return np.where(rng.random((height, width)) < density, rng.choice([1, 2], (height, width)), 0).astype(np.int8)
+
+
+def all_pairs(index):
+    i, j = np.divmod(np.arange(index.num_cells ** 2), index.num_cells)
+    return index.centres[i], index.centres[j]
+
+
+def visibility_matrix(index):
+    cells = np.stack(np.divmod(np.arange(index.num_cells), index.width)[::-1], axis=-1)
+    return index.can_see_many(cells[:, np.newaxis], cells[np.newaxis, :])
+
+
+def test_index_matches_line_of_sight():
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        grid = random_grid(rng, *rng.integers(3, 8, 2))
+        index = VisibilityIndex(grid)
+        starts, ends = all_pairs(index)
+        expected = segment_clear(grid, 0, starts, ends).reshape(index.num_cells, index.num_cells)
+        assert np.array_equal(visibility_matrix(index), expected)
+        for z, x in zip(*np.nonzero(np.ones_like(grid))):
+            assert np.array_equal(index.visible_from(x, z).ravel(), expected[index.cell_index(x, z)])
+
+
+def test_set_cell_matches_rebuilt_index():
+    rng = np.random.default_rng(1)
+    for _ in range(10):
+        height, width = rng.integers(3, 8, 2)
+        grid = random_grid(rng, height, width)
+        index = VisibilityIndex(grid)
+        for _ in range(10):
+            x, z = int(rng.integers(width)), int(rng.integers(height))
+            value = int(rng.choice([0, 1, 2]))
+            grid[z, x] = value
+            index.set_cell(x, z, value)
+            assert np.array_equal(index.bits, VisibilityIndex(grid).bits)
+
+
+def test_copy_is_independent():
+    rng = np.random.default_rng(2)
+    grid = random_grid(rng, 6, 6, density=0.0)
+    index = VisibilityIndex(grid)
+    bits = index.bits.copy()
+    patched = index.copy()
+    patched.place_block(3, 3)
+    assert np.array_equal(index.bits, bits)
+    assert index.grid[3, 3] == 0
+    assert not np.array_equal(patched.bits, bits)